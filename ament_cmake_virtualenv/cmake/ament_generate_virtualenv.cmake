@@ -13,7 +13,8 @@
 # limitations under the License.
 
 function(ament_generate_virtualenv)
-  set(oneValueArgs PYTHON_VERSION PYTHON_VERSION_MAJOR USE_SYSTEM_PACKAGES ISOLATE_REQUIREMENTS)
+  set(oneValueArgs PYTHON_VERSION PYTHON_VERSION_MAJOR USE_SYSTEM_PACKAGES ISOLATE_REQUIREMENTS
+    LOCK_REQUIREMENTS SKIP_INAPPLICABLE_REQUIREMENTS BYTECODE)
   set(multiValueArgs EXTRA_PIP_ARGS)
   cmake_parse_arguments(ARG "${options}" "${oneValueArgs}" "${multiValueArgs}" ${ARGN})
 
@@ -43,6 +44,14 @@ function(ament_generate_virtualenv)
     set(ARG_ISOLATE_REQUIREMENTS FALSE)
   endif()
 
+  if(NOT DEFINED ARG_LOCK_REQUIREMENTS)
+    set(ARG_LOCK_REQUIREMENTS FALSE)
+  endif()
+
+  if(NOT DEFINED ARG_SKIP_INAPPLICABLE_REQUIREMENTS)
+    set(ARG_SKIP_INAPPLICABLE_REQUIREMENTS FALSE)
+  endif()
+
   if(NOT DEFINED ARG_EXTRA_PIP_ARGS)
     set(ARG_EXTRA_PIP_ARGS "-qq")
   endif()
@@ -51,6 +60,11 @@ function(ament_generate_virtualenv)
   # Double-escape needed to get quote down through cmake->make->shell layering
   set(processed_pip_args \\\"${processed_pip_args}\\\")
 
+  # Caches of ament_virtualenv tools, which may be shared by all packages of a workspace
+  if(NOT DEFINED AMENT_VIRTUALENV_CACHE_DIR)
+    set(AMENT_VIRTUALENV_CACHE_DIR ${CMAKE_BINARY_DIR}/ament_virtualenv)
+  endif()
+
   set(venv_dir "venv")
 
   set(venv_install_dir ${CMAKE_INSTALL_PREFIX}/share/${PROJECT_NAME}/${venv_dir})
@@ -62,18 +76,49 @@ function(ament_generate_virtualenv)
     set(glob_args "--no-deps")
   endif()
 
-  # Collect all exported pip requirements files, from this package and all dependencies
-  find_program(glob_requirements_BIN NAMES "glob_requirements"
-    PATHS "${CMAKE_INSTALL_PREFIX}/../ament_virtualenv/bin/")
-  if(NOT glob_requirements_BIN)
-    message(FATAL_ERROR "could not find program 'glob_requirements'")
-  endif()
-  execute_process(
-    COMMAND ${glob_requirements_BIN}
-      --package-name ${PROJECT_NAME} --source-dir ${CMAKE_CURRENT_SOURCE_DIR} ${glob_args}
-    OUTPUT_VARIABLE requirements_list
-    OUTPUT_STRIP_TRAILING_WHITESPACE
-  )
+  # Collect all exported pip requirements files, from this package and all dependencies.
+  # A map written by 'glob_requirements --source-tree <src> --output-json <map>' for the
+  # whole workspace can be passed in AMENT_VIRTUALENV_REQUIREMENTS_MAP (CMake or
+  # environment variable) to avoid spawning glob_requirements for every package.
+  if(NOT DEFINED AMENT_VIRTUALENV_REQUIREMENTS_MAP AND DEFINED ENV{AMENT_VIRTUALENV_REQUIREMENTS_MAP})
+    set(AMENT_VIRTUALENV_REQUIREMENTS_MAP $ENV{AMENT_VIRTUALENV_REQUIREMENTS_MAP})
+  endif()
+  set(requirements_from_map FALSE)
+  if(AMENT_VIRTUALENV_REQUIREMENTS_MAP AND NOT ARG_ISOLATE_REQUIREMENTS
+     AND EXISTS "${AMENT_VIRTUALENV_REQUIREMENTS_MAP}" AND NOT CMAKE_VERSION VERSION_LESS 3.19)
+    file(READ "${AMENT_VIRTUALENV_REQUIREMENTS_MAP}" requirements_map)
+    string(JSON requirements_count ERROR_VARIABLE requirements_map_error
+      LENGTH "${requirements_map}" ${PROJECT_NAME})
+    if(NOT requirements_map_error)
+      message(STATUS "Using requirements from ${AMENT_VIRTUALENV_REQUIREMENTS_MAP}")
+      set(requirements_from_map TRUE)
+      set(requirements_list "")
+      if(requirements_count GREATER 0)
+        math(EXPR requirements_last "${requirements_count} - 1")
+        foreach(requirements_index RANGE ${requirements_last})
+          string(JSON requirements_txt GET "${requirements_map}" ${PROJECT_NAME} ${requirements_index})
+          list(APPEND requirements_list ${requirements_txt})
+        endforeach()
+      endif()
+      # Trigger a re-configure if the map is regenerated
+      stamp(${AMENT_VIRTUALENV_REQUIREMENTS_MAP})
+    endif()
+  endif()
+
+  if(NOT requirements_from_map)
+    find_program(glob_requirements_BIN NAMES "glob_requirements"
+      PATHS "${CMAKE_INSTALL_PREFIX}/../ament_virtualenv/bin/")
+    if(NOT glob_requirements_BIN)
+      message(FATAL_ERROR "could not find program 'glob_requirements'")
+    endif()
+    execute_process(
+      COMMAND ${glob_requirements_BIN}
+        --package-name ${PROJECT_NAME} --source-dir ${CMAKE_CURRENT_SOURCE_DIR} ${glob_args}
+        --cache-dir ${AMENT_VIRTUALENV_CACHE_DIR}
+      OUTPUT_VARIABLE requirements_list
+      OUTPUT_STRIP_TRAILING_WHITESPACE
+    )
+  endif()
 
   # Include common requirements that ROS makes available in system environment for py2
   list(APPEND requirements_list ${ament_cmake_virtualenv_DIR}/common_requirements.txt)
@@ -90,9 +135,15 @@ function(ament_generate_virtualenv)
   if(NOT combine_requirements_BIN)
     message(FATAL_ERROR "could not find program 'combine_requirements'")
   endif()
+  set(combine_args "")
+  if(${ARG_SKIP_INAPPLICABLE_REQUIREMENTS})
+    set(combine_args "--skip-inapplicable")
+  endif()
   add_custom_command(OUTPUT ${generated_requirements}
     COMMAND ${combine_requirements_BIN}
       --requirements-list ${requirements_list} --output-file ${generated_requirements}
+      --cache-dir ${AMENT_VIRTUALENV_CACHE_DIR} --python-version ${ARG_PYTHON_VERSION}
+      ${combine_args}
     DEPENDS ${requirements_list}
   )
 
@@ -101,6 +152,19 @@ function(ament_generate_virtualenv)
     set(venv_args "--use-system-packages")
   endif()
 
+  set(venv_byproducts "")
+  if(${ARG_LOCK_REQUIREMENTS})
+    # Resolved once, then reused by every build until the requirements change
+    set(generated_requirements_lock ${CMAKE_BINARY_DIR}/generated_requirements.lock.txt)
+    list(APPEND venv_args "--lockfile" ${generated_requirements_lock})
+    # Written by build_venv, so that generators know which rule creates it
+    list(APPEND venv_byproducts ${generated_requirements_lock})
+  endif()
+
+  if(DEFINED ARG_BYTECODE)
+    list(APPEND venv_args "--bytecode" ${ARG_BYTECODE})
+  endif()
+
   # Generate a virtualenv, fixing up paths for install-space
   find_program(build_venv_BIN NAMES "build_venv"
     PATHS "${CMAKE_INSTALL_PREFIX}/../ament_virtualenv/bin/")
@@ -112,6 +176,7 @@ function(ament_generate_virtualenv)
       --root-dir ${venv_install_dir} --requirements ${generated_requirements} --retries 3
       --python-version ${ARG_PYTHON_VERSION} ${venv_args} --extra-pip-args ${processed_pip_args}
     DEPENDS ${generated_requirements}
+    BYPRODUCTS ${venv_byproducts}
   )
 
   # Per-package virtualenv target
@@ -129,6 +194,12 @@ function(ament_generate_virtualenv)
     DESTINATION share/${PROJECT_NAME}
   )
 
+  if(${ARG_LOCK_REQUIREMENTS})
+    install(FILES ${generated_requirements_lock}
+      DESTINATION share/${PROJECT_NAME}
+    )
+  endif()
+
 
   macro(ament_python_install_module)
     # Override the ament_python_install_module macro to wrap modules
@@ -0,0 +1,162 @@
+#
+# Copyright 2026 ament_virtualenv contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# \file      build_envs.py
+# \authors   ament_virtualenv contributors
+# \copyright Copyright (c) (2026), ament_virtualenv contributors
+#
+"""
+Pool of reusable build environments for source distributions.
+
+For every source distribution it builds, pip creates an isolated build
+environment and installs the build backend, e.g. setuptools and wheel,
+into it. Instead, source distributions are built with
+--no-build-isolation in a virtualenv from a pool, which is keyed by the
+build requirements from pyproject.toml, and set up once.
+"""
+from __future__ import print_function
+
+import fcntl
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import tarfile
+import zipfile
+
+try:
+    import tomllib
+except ImportError:
+    try:
+        import tomli as tomllib
+    except ImportError:
+        tomllib = None
+
+POOL_DIR_ENV_KEY = 'AMENT_VIRTUALENV_BUILD_ENV_POOL'
+
+# What pip builds projects without a pyproject.toml, or without build requirements, with
+DEFAULT_BUILD_REQUIRES = ['setuptools>=40.8.0', 'wheel']
+
+COMPLETE_FILENAME = '.complete'
+
+
+def _read_pyproject(sdist):
+    """Read the top-level pyproject.toml of a source distribution, if it has one."""
+    if sdist.endswith('.zip'):
+        with zipfile.ZipFile(sdist) as archive:
+            for name in archive.namelist():
+                if name.count('/') == 1 and name.endswith('/pyproject.toml'):
+                    return archive.read(name)
+        return None
+    with tarfile.open(sdist) as archive:
+        for member in archive:
+            if member.name.count('/') == 1 and member.name.endswith('/pyproject.toml'):
+                return archive.extractfile(member).read()
+    return None
+
+
+def build_requires(sdist):
+    """
+    Get the build requirements of a source distribution.
+
+    Returns None if they cannot be read, e.g. without a TOML parser.
+    """
+    try:
+        pyproject = _read_pyproject(sdist)
+    except (OSError, tarfile.TarError, zipfile.BadZipFile):
+        return None
+    if pyproject is None:
+        return DEFAULT_BUILD_REQUIRES
+    if tomllib is None:
+        return None
+    try:
+        build_system = tomllib.loads(pyproject.decode('utf-8')).get('build-system', {})
+    except (UnicodeDecodeError, tomllib.TOMLDecodeError):
+        return None
+    requires = set(build_system.get('requires', []))
+    if 'build-backend' not in build_system:
+        # pip falls back to the setuptools legacy backend
+        requires |= set(DEFAULT_BUILD_REQUIRES)
+    elif build_system['build-backend'].startswith('setuptools.'):
+        # What setuptools asks for when building a wheel, which pip's isolation
+        # would install
+        requires.add('wheel')
+    return sorted(requires)
+
+
+class BuildEnvPool(object):
+    def __init__(self, pool_dir, python, pip_args=[]):
+        """
+        Create a pool of build environments for a python interpreter.
+
+        The build requirements are installed into them with pip_args, e.g.
+        the index options of the virtualenv being built.
+        """
+        self.pool_dir = os.path.abspath(pool_dir)
+        self.python = python
+        self.pip_args = [arg for arg in pip_args if arg]
+
+    def env_dir(self, requires):
+        digest = hashlib.sha256(
+            json.dumps(sorted(requires)).encode('utf-8')).hexdigest()
+        return os.path.join(self.pool_dir, digest[:16])
+
+    def env(self, requires):
+        """Get the python executable of the build environment for build requirements."""
+        env_dir = self.env_dir(requires)
+        python = os.path.join(env_dir, 'bin', 'python')
+        if os.path.exists(os.path.join(env_dir, COMPLETE_FILENAME)):
+            return python
+        os.makedirs(self.pool_dir, exist_ok=True)
+        with open(env_dir + '.lock', 'a') as lock:
+            # Another build may be setting up the same environment
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+            if not os.path.exists(os.path.join(env_dir, COMPLETE_FILENAME)):
+                print('Setting up build environment {} for {}'.format(
+                    os.path.basename(env_dir), ' '.join(requires)))
+                subprocess.check_call([self.python, '-m', 'venv', '--clear', env_dir])
+                if requires:
+                    subprocess.check_call(
+                        [python, '-m', 'pip', 'install', *self.pip_args, *requires])
+                with open(os.path.join(env_dir, 'requires.json'), 'w') as f:
+                    json.dump(sorted(requires), f)
+                open(os.path.join(env_dir, COMPLETE_FILENAME), 'w').close()
+        return python
+
+    def build_wheel(self, sdist, wheel_dir):
+        """
+        Build a source distribution into wheel_dir, in a pooled build environment.
+
+        Returns whether it was built, as opposed to needing pip's isolated
+        build, e.g. because its build requirements cannot be determined.
+        """
+        requires = build_requires(sdist)
+        if requires is None:
+            return False
+        command = [self.env(requires), '-m', 'pip', 'wheel', '--no-deps',
+                   '--no-build-isolation', '--wheel-dir', wheel_dir]
+        command += self.pip_args + [sdist]
+        print(' '.join(command))
+        try:
+            subprocess.check_call(command)
+        except subprocess.CalledProcessError:
+            # e.g. the backend asks for more requirements at build time
+            print("[WARNING] ament_virtualenv could not build {} in a pooled "
+                  "environment, building it in isolation".format(
+                      os.path.basename(sdist)), file=sys.stderr)
+            return False
+        return True
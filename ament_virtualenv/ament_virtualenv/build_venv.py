@@ -24,30 +24,30 @@ from __future__ import print_function
 
 import argparse
 import os
-import re
 import shutil
 import subprocess
 import sys
+import time
 
+from ament_virtualenv import daemon
 from ament_virtualenv.deployment import Deployment
-from distutils.spawn import find_executable
+from ament_virtualenv.build_envs import POOL_DIR_ENV_KEY
+from ament_virtualenv.incremental import INCREMENTAL_ENV_KEY, installed_lines, update, \
+    write_state
+from ament_virtualenv.installers import INSTALLER_ENV_KEY, INSTALLERS
+from ament_virtualenv.interpreter import find_python, interpreter_abi, \
+    marker_environment
+from ament_virtualenv.relocate import BYTECODE_ENV_KEY, BYTECODE_MODES, Relocator, \
+    compile_bytecode, format_counts
+from ament_virtualenv.vcs_wheels import CACHE_DIR_ENV_KEY as VCS_WHEEL_CACHE_ENV_KEY, \
+    requirement_commits
+from ament_virtualenv.venv_cache import VenvCache, venv_key
+from ament_virtualenv.wheelhouse import OFFLINE_ENV_KEY, WHEELHOUSE_ENV_KEY, abi_dir
+from functools import lru_cache
 
-
-_BYTECODE_REGEX = re.compile('.*.py[co]')
-
-
-def delete_bytecode(directory):
-    for root, _, files in os.walk(directory):
-        for f in files:
-            if _BYTECODE_REGEX.match(f):
-                os.remove(os.path.join(root, f))
-
-
-def find_python(version):
-    python_executable = find_executable('python' + version)
-    if not python_executable:
-        raise RuntimeError("Unable to find python executable 'python{}''".format(version))
-    return python_executable
+# Seconds to wait before retrying a failed stage, doubling with every retry
+RETRY_BACKOFF = 2
+RETRY_BACKOFF_MAX = 60
 
 
 def check_module(python_executable, module):
@@ -63,6 +63,55 @@ def check_module(python_executable, module):
         return False
 
 
+@lru_cache(maxsize=None)
+def _probe_python(python_version):
+    python_executable = find_python(python_version)
+    return (
+        python_executable,
+        check_module(python_executable, 'venv'),
+        check_module(python_executable, 'pip')
+    )
+
+
+def probe_python(python_version):
+    """
+    Find the python executable and whether it provides the venv and pip modules.
+
+    Probing spawns the interpreter twice, so the results are taken from the
+    ament_virtualenv daemon when it is running.
+    """
+    probe = daemon.probe_python(python_version)
+    if probe is None:
+        probe = _probe_python(python_version)
+    return probe
+
+
+def run_stages(stages, retries=0):
+    """
+    Run the stages of a build in order, resuming from the failed stage on retries.
+
+    The stages which completed are checkpoints, which are not run again, and
+    a failed stage is retried after an exponential backoff, e.g. to ride out
+    a flaky index. Wheels downloaded before the failure are reused from the
+    pip cache or the wheelhouse.
+    """
+    attempt = 0
+    for name, stage in stages:
+        while True:
+            try:
+                stage()
+                break
+            except Exception as e:
+                retries -= 1
+                if retries < 0:
+                    raise
+                delay = min(RETRY_BACKOFF * 2 ** attempt, RETRY_BACKOFF_MAX)
+                attempt += 1
+                print("Error in stage '{}', retrying it in {}s: {}".format(
+                    name, delay, e), file=sys.stderr)
+                time.sleep(delay)
+
+
 def main(argv=sys.argv[1:]):
     parser = argparse.ArgumentParser(
         description=(
@@ -88,7 +137,7 @@ def main(argv=sys.argv[1:]):
         '--retries',
         type=int,
         default=0,
-        help="Number of times to retry buiding virtualenv."
+        help="Number of times to retry a failed stage of building the virtualenv."
     )
     parser.add_argument(
         '--use-system-packages',
@@ -101,14 +150,95 @@ def main(argv=sys.argv[1:]):
         type=str,
         help="Extra pip args for install."
     )
-    args, unknown = parser.parse_known_args()
+    parser.add_argument(
+        '--lockfile',
+        help=("Install the exact versions pinned in this lockfile, without resolving "
+              "dependencies. It is (re-)generated whenever the requirements change.")
+    )
+    parser.add_argument(
+        '--venv-cache-dir',
+        help=("Reuse identical virtualenvs built before, from this cache directory "
+              "(default: $AMENT_VIRTUALENV_VENV_CACHE, if set).")
+    )
+    parser.add_argument(
+        '--venv-cache-size',
+        help=("Evict the least recently used virtualenvs once the cache outgrows "
+              "this size, e.g. 500M (default: $AMENT_VIRTUALENV_VENV_CACHE_SIZE, "
+              "or 10G).")
+    )
+    parser.add_argument(
+        '--remote-cache',
+        help=("URL of an HTTP cache server backing the virtualenv cache "
+              "(default: $AMENT_VIRTUALENV_REMOTE_CACHE, if set).")
+    )
+    parser.add_argument(
+        '--wheelhouse',
+        default=os.environ.get(WHEELHOUSE_ENV_KEY),
+        help=("Build and download wheels into this shared wheelhouse, and install "
+              "them from it (default: ${}, if set).".format(WHEELHOUSE_ENV_KEY))
+    )
+    parser.add_argument(
+        '--offline',
+        action='store_true',
+        default=os.environ.get(OFFLINE_ENV_KEY) == '1',
+        help=("Install from the wheelhouse alone, as filled by prefetch_wheels "
+              "(default: ${}=1).".format(OFFLINE_ENV_KEY))
+    )
+    parser.add_argument(
+        '--vcs-wheel-cache',
+        default=os.environ.get(VCS_WHEEL_CACHE_ENV_KEY),
+        help=("Build git requirements into wheels cached in this directory, by commit "
+              "(default: ${}, if set).".format(VCS_WHEEL_CACHE_ENV_KEY))
+    )
+    parser.add_argument(
+        '--build-env-pool',
+        default=os.environ.get(POOL_DIR_ENV_KEY),
+        help=("Build source distributions for the wheelhouse in build environments "
+              "reused from this directory (default: ${}, if set).".format(
+                  POOL_DIR_ENV_KEY))
+    )
+    parser.add_argument(
+        '--installer',
+        choices=sorted(INSTALLERS),
+        default=os.environ.get(INSTALLER_ENV_KEY),
+        help=("Backend installing the requirements: pip, or wheel to unpack local "
+              "wheels in parallel (default: ${}, or pip).".format(INSTALLER_ENV_KEY))
+    )
+    parser.add_argument(
+        '--bytecode',
+        choices=BYTECODE_MODES,
+        default=os.environ.get(BYTECODE_ENV_KEY, 'delete'),
+        help=("Delete the .pyc files, since they embed the build paths, or compile "
+              "them for the root directory (default: ${}, or delete).".format(
+                  BYTECODE_ENV_KEY))
+    )
+    parser.add_argument(
+        '--incremental',
+        action='store_true',
+        default=os.environ.get(INCREMENTAL_ENV_KEY) == '1',
+        help=("Update an existing virtualenv, installing and uninstalling only what "
+              "changed in the requirements, instead of rebuilding it "
+              "(default: ${}=1).".format(INCREMENTAL_ENV_KEY))
+    )
+    args, unknown = parser.parse_known_args(argv)
     return build_venv(
         root_dir=args.root_dir,
         python_version=args.python_version,
         requirements_filename=args.requirements,
         use_system_packages=args.use_system_packages,
         extra_pip_args=args.extra_pip_args[1:-1],
-        retries=args.retries
+        retries=args.retries,
+        lockfile=args.lockfile,
+        venv_cache_dir=args.venv_cache_dir,
+        venv_cache_size=args.venv_cache_size,
+        remote_cache=args.remote_cache,
+        wheelhouse=args.wheelhouse,
+        offline=args.offline,
+        vcs_wheel_cache=args.vcs_wheel_cache,
+        build_env_pool=args.build_env_pool,
+        installer=args.installer,
+        bytecode=args.bytecode,
+        incremental=args.incremental
     )
 
 
@@ -117,9 +247,20 @@ def build_venv(root_dir,
                requirements_filename,
                use_system_packages=False,
                extra_pip_args="",
-               retries=0):
+               retries=0,
+               lockfile=None,
+               venv_cache_dir=None,
+               venv_cache_size=None,
+               remote_cache=None,
+               wheelhouse=None,
+               offline=False,
+               vcs_wheel_cache=None,
+               build_env_pool=None,
+               installer=None,
+               bytecode='delete',
+               incremental=False):
     root_dir = os.path.realpath(root_dir)
-    python_executable = find_python(python_version)
+    python_executable, builtin_venv, builtin_pip = probe_python(python_version)
     os.environ['DH_VIRTUALENV_INSTALL_ROOT'] = os.path.dirname(root_dir)
 
     deploy = Deployment(
@@ -130,44 +271,113 @@ def build_venv(root_dir,
         python=python_executable,
         extra_pip_arg=extra_pip_args.split(' '),
         log_file=None,
-        builtin_venv=check_module(python_executable, 'venv'),
-        builtin_pip=check_module(python_executable, 'pip'),
-        pip_version=None  # (pbovbel) known working version
+        builtin_venv=builtin_venv,
+        builtin_pip=builtin_pip,
+        pip_version=None,  # (pbovbel) known working version
+        lockfile=os.path.abspath(lockfile) if lockfile else None,
+        wheelhouse=(abi_dir(wheelhouse, interpreter_abi(python_executable))
+                    if wheelhouse else None),
+        offline=offline,
+        vcs_wheel_cache_dir=vcs_wheel_cache,
+        python_abi=interpreter_abi(python_executable) if vcs_wheel_cache else None,
+        marker_environment=(marker_environment(python_version)
+                            if vcs_wheel_cache else None),
+        build_env_pool_dir=(abi_dir(build_env_pool, interpreter_abi(python_executable))
+                            if wheelhouse and build_env_pool else None),
+        installer=installer
     )
 
-    while True:
+    # What an existing virtualenv must have been built with, to be updated incrementally
+    environment = {
+        'abi': interpreter_abi(python_executable),
+        'pip_args': deploy.pip_args,
+        'use_system_packages': bool(use_system_packages),
+        'locked': deploy.lockfile is not None,
+        'bytecode': bytecode,
+    }
+
+    cache = VenvCache.from_environment(venv_cache_dir, venv_cache_size, remote_cache)
+    key = None
+    vcs_commits = None
+    if cache is not None and os.path.exists(requirements_filename):
+        vcs_commits = requirement_commits(
+            requirements_filename, marker_environment(python_version))
+        if vcs_commits is None:
+            print("Not caching the virtualenv: its VCS requirements cannot be resolved "
+                  "to commits", file=sys.stderr)
+    if vcs_commits is not None:
+        key = venv_key(
+            interpreter_abi(python_executable), requirements_filename,
+            deploy.pip_args, use_system_packages, deploy.lockfile is not None,
+            install_dir=root_dir if bytecode == 'compile' else None,
+            vcs_commits=vcs_commits)
+        try:
+            python = interpreter_abi(python_executable)['executable']
+            if cache.fetch(key, root_dir, deploy.lockfile, python):
+                print('Using cached virtualenv {} in {}'.format(key, root_dir))
+                return 0
+        except OSError as e:
+            print("Error, building virtualenv instead of using the cache: {}".format(e),
+                  file=sys.stderr)
+            shutil.rmtree(root_dir, ignore_errors=True)
+
+    if incremental and os.path.exists(root_dir):
+        try:
+            changed = update(deploy, root_dir, environment, requirements_filename)
+        except Exception as e:
+            print("Error, rebuilding virtualenv instead of updating it: {}".format(e),
+                  file=sys.stderr)
+            changed = None
+        if changed is not None:
+            # Only the files installed now need to be relocated, or compiled
+            relocator = Relocator(root_dir, deploy.virtualenv_install_dir)
+            counts = relocator.relocate(changed)
+            print('Relocated virtualenv: {}'.format(format_counts(counts)))
+            if bytecode == 'compile':
+                compile_bytecode(root_dir, deploy.virtualenv_install_dir, changed)
+            return 0
+        shutil.rmtree(root_dir, ignore_errors=True)
+
+    def create():
+        print('Generating virtualenv in {}'.format(deploy.package_dir))
         try:
-            print('Generating virtualenv in {}'.format(deploy.package_dir))
             deploy.create_virtualenv()
+        except Exception:
+            # Start over from an empty directory
+            shutil.rmtree(root_dir, ignore_errors=True)
+            raise
 
-            print('Installing requirements from {}'.format(deploy.requirements_filename))
-            deploy.install_dependencies()
+    def preinstall():
+        deploy.install_preinstall()
 
-            print('Fixing virtualenv root to {}'.format(deploy.virtualenv_install_dir))
-            deploy.fix_activate_path()
-            deploy.fix_shebangs()
-            deploy.fix_local_symlinks()
+    def requirements():
+        # pip skips the requirements installed before a retry
+        print('Installing requirements from {}'.format(deploy.requirements_filename))
+        deploy.install_requirements()
 
-            # Remove all .py[co] files since they embed absolute paths
-            delete_bytecode(deploy.package_dir)
+    def relocate():
+        print('Fixing virtualenv root to {}'.format(deploy.virtualenv_install_dir))
+        # Also removes all .py[co] files, since they embed absolute paths
+        counts = Relocator(root_dir, deploy.virtualenv_install_dir).relocate()
+        print('Relocated virtualenv: {}'.format(format_counts(counts)))
+        if bytecode == 'compile':
+            compile_bytecode(root_dir, deploy.virtualenv_install_dir)
 
-            local_dir = os.path.join(deploy.package_dir, 'local')
-            if os.path.exists(local_dir):
-                # Remove local folder
-                shutil.rmtree(local_dir)
-        except Exception as e:
-            retries -= 1
-            if retries >= 0:
-                print("Error, clearing virtualenv and retrying: {}".format(e), file=sys.stderr)
-                try:
-                    shutil.rmtree(root_dir)
-                except OSError:
-                    pass
-                continue
-            else:
-                raise
-        break
+        local_dir = os.path.join(deploy.package_dir, 'local')
+        if os.path.exists(local_dir):
+            # Remove local folder
+            shutil.rmtree(local_dir)
+
+    run_stages([
+        ('create', create),
+        ('preinstall', preinstall),
+        ('requirements', requirements),
+        ('relocate', relocate),
+    ], retries)
 
+    write_state(root_dir, environment, installed_lines(deploy, requirements_filename))
+    if key is not None:
+        cache.store(key, root_dir, deploy.lockfile, keep_bytecode=bytecode == 'compile')
     return 0
 #
 
@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+#
+# Copyright 2026 ament_virtualenv contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# \file      cache_server.py
+# \authors   ament_virtualenv contributors
+# \copyright Copyright (c) (2026), ament_virtualenv contributors
+#
+"""
+Reference server for the remote virtualenv cache.
+
+The protocol is that of bazel-remote and similar HTTP caches: artifacts are
+uploaded with PUT and downloaded with GET, at any path. A missing artifact
+is a 404. Any HTTP server which stores the bodies of PUT requests, e.g.
+nginx with WebDAV, or an object store, can serve as remote cache as well.
+
+This server keeps the artifacts as files in a directory, and is meant for
+testing only: anyone who can connect to it can upload artifacts, without
+authentication, so it listens on localhost by default. Share a cache
+between machines through a server which authenticates uploads instead.
+"""
+from __future__ import print_function
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class CacheRequestHandler(BaseHTTPRequestHandler):
+    def artifact_path(self):
+        path = self.path.split('?', 1)[0].strip('/')
+        parts = path.split('/')
+        if not path or any(part in ('', '.', '..') for part in parts):
+            return None
+        return os.path.join(self.server.directory, *parts)
+
+    def do_HEAD(self):
+        self.do_GET(body=False)
+
+    def do_GET(self, body=True):
+        path = self.artifact_path()
+        if path is None or not os.path.isfile(path):
+            self.send_error(404)
+            return
+        with open(path, 'rb') as f:
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/octet-stream')
+            self.send_header('Content-Length', str(os.fstat(f.fileno()).st_size))
+            self.end_headers()
+            if body:
+                shutil.copyfileobj(f, self.wfile)
+
+    def do_PUT(self):
+        path = self.artifact_path()
+        length = self.headers.get('Content-Length')
+        if path is None or length is None:
+            self.send_error(400)
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Artifacts are written atomically, so concurrent GETs see all or nothing
+        fd, tmp_filename = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                remaining = int(length)
+                while remaining > 0:
+                    chunk = self.rfile.read(min(remaining, 1 << 16))
+                    if not chunk:
+                        raise OSError("Connection closed during upload")
+                    f.write(chunk)
+                    remaining -= len(chunk)
+            os.chmod(tmp_filename, 0o644)
+            os.replace(tmp_filename, path)
+        except BaseException:
+            os.unlink(tmp_filename)
+            raise
+        self.send_response(201)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+class CacheServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, directory, quiet=False):
+        super().__init__(address, CacheRequestHandler)
+        self.directory = os.path.abspath(directory)
+        self.quiet = quiet
+
+
+def main(argv=sys.argv[1:]):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        '--directory',
+        required=True,
+        help="Directory in which to store the artifacts."
+    )
+    parser.add_argument(
+        '--host',
+        default='127.0.0.1',
+        help="Address to listen on (default: 127.0.0.1). Uploads are not authenticated."
+    )
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--quiet', action='store_true', help="Do not log requests.")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.directory, exist_ok=True)
+    server = CacheServer((args.host, args.port), args.directory, args.quiet)
+    print("Serving the virtualenv cache in {} on http://{}:{}/".format(
+        server.directory, *server.server_address[:2]))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+#
+
+
+if __name__ == "__main__":
+    sys.exit(main())
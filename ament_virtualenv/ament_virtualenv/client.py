@@ -0,0 +1,55 @@
+#
+# Copyright 2026 ament_virtualenv contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# \file      client.py
+# \authors   ament_virtualenv contributors
+# \copyright Copyright (c) (2026), ament_virtualenv contributors
+#
+"""
+Thin console script entry points.
+
+Each script is forwarded to the ament_virtualenv daemon when it is running,
+and otherwise imports and runs the real implementation in-process.
+"""
+import importlib
+import sys
+
+from ament_virtualenv import daemon
+
+
+def _run(command, forward=True):
+    argv = sys.argv[1:]
+    returncode = daemon.run_command(command, argv) if forward else None
+    if returncode is None:
+        returncode = importlib.import_module(daemon.COMMANDS[command]).main(argv)
+    return returncode
+
+
+def glob_requirements():
+    # Watch mode runs until it is interrupted, it must not take over the daemon
+    return _run('glob_requirements', forward='--watch' not in sys.argv[1:])
+
+
+def combine_requirements():
+    return _run('combine_requirements')
+
+
+def wrap_module():
+    return _run('wrap_module')
+
+
+def wrap_package():
+    return _run('wrap_package')
@@ -23,72 +23,520 @@
 from __future__ import print_function
 
 import argparse
+import copy
+import hashlib
+import io
+import json
+import os
 import re
+import shutil
 import sys
+import tempfile
 
-from typing import List, Dict
+from typing import List, Dict, Union
 from io import TextIOWrapper
-from collections import namedtuple
+from collections import namedtuple, OrderedDict
+from functools import lru_cache
 from packaging.requirements import Requirement, InvalidRequirement
+from packaging.markers import InvalidMarker, Marker
+from packaging.specifiers import InvalidSpecifier, SpecifierSet
+from packaging.utils import canonicalize_name
+from packaging.version import InvalidVersion, Version
 
 try:
+    from ament_virtualenv.interpreter import marker_environment
     from ament_virtualenv.requirements import VcsRequirement
 except ImportError:
     try:
+        from interpreter import marker_environment
         from requirements import VcsRequirement
     except ImportError:
+        from .interpreter import marker_environment
         from .requirements import VcsRequirement
 
 comment_regex = re.compile(r'\s*#\s.*$', flags=re.MULTILINE)
 
-CombinedRequirement = namedtuple("CombinedRequirement", "requirement source suppressed_set")
+include_regex = re.compile(
+    r'^\s*(-r|--requirement|-c|--constraint)(?:\s*=\s*|\s+)(\S+)\s*$')
+INCLUDE_OPTIONS = {'-r': '-r', '--requirement': '-r', '-c': '-c', '--constraint': '-c'}
+
+DIGEST_HEADER = "# ament_virtualenv digest: sha256:{}\n"
+digest_regex = re.compile(r'^# ament_virtualenv digest: sha256:([0-9a-f]+)$')
+
+# Bump whenever the parsed representation changes, to invalidate on-disk entries
+REQUIREMENTS_CACHE_VERSION = 3
+
+# Process-wide cache of parsed requirements files, keyed by absolute path
+_PARSED_FILES = {}
+
+CombinedRequirement = namedtuple(
+    "CombinedRequirement", "requirement source suppressed_set skipped_set")
 SuppressedRequirement = namedtuple("SuppressedRequirement", "requirement source")
+# The requirements of a file, its -r/-c includes as (option, path) tuples,
+# and the hash of its content without comments
+RequirementsFile = namedtuple("RequirementsFile", "requirements includes sha256")
+
+
+def _bounds(specifier):
+    """
+    Get the version range allowed by a single specifier.
+
+    Returns a (lower, upper) tuple, where each bound is a (version, inclusive)
+    tuple, or None if the specifier does not bound the version on that side.
+    """
+    operator, version = specifier.operator, specifier.version
+    try:
+        if operator == '==' and version.endswith('.*'):
+            lower = Version(version[:-2])
+            release = lower.release
+            upper = Version('.'.join(
+                str(part) for part in release[:-1] + (release[-1] + 1,)))
+            return (lower, True), (upper, False)
+        if operator in ('==', '==='):
+            return (Version(version), True), (Version(version), True)
+        if operator == '~=':
+            lower = Version(version)
+            release = lower.release[:-1]
+            upper = Version('.'.join(
+                str(part) for part in release[:-1] + (release[-1] + 1,)))
+            return (lower, True), (upper, False)
+        if operator == '>=':
+            return (Version(version), True), None
+        if operator == '>':
+            return (Version(version), False), None
+        if operator == '<=':
+            return None, (Version(version), True)
+        if operator == '<':
+            return None, (Version(version), False)
+    except InvalidVersion:
+        # e.g. an arbitrary equality (===) string
+        pass
+    return None, None
+
+
+def is_satisfiable(specifier_set):
+    """
+    Check whether any version can satisfy all the specifiers of a set.
+
+    This is a heuristic: the tightest lower and upper bounds must not cross,
+    and every exact pin must satisfy the whole set.
+    """
+    lower = upper = None
+    for specifier in specifier_set:
+        low, high = _bounds(specifier)
+        # On a tie, an exclusive bound is the tighter one
+        if low and (lower is None or (low[0], not low[1]) > (lower[0], not lower[1])):
+            lower = low
+        if high and (upper is None or high < upper):
+            upper = high
+        if specifier.operator in ('==', '===') and low and low == high:
+            if not specifier_set.contains(low[0], prereleases=True):
+                return False
+    if lower and upper:
+        if lower[0] > upper[0] or lower[0] == upper[0] and not (lower[1] and upper[1]):
+            return False
+    return True
+
+
+def _applies(requirement, environment):
+    marker = getattr(requirement, 'marker', None)
+    return marker is None or marker.evaluate(environment)
+
+
+def merge_requirements(requirements, environment, skip_inapplicable=False):
+    """
+    Merge all the requirements on one project into a single requirement.
+
+    Requirements whose markers do not apply to the target environment are
+    suppressed, the specifiers of the others are intersected and their
+    extras united. VCS and URL requirements cannot be merged, so the first
+    one wins.
+
+    With skip_inapplicable, requirements whose markers do not apply are
+    skipped instead, so pip never sees them. If none applies, the combined
+    requirement is None.
+
+    Returns a CombinedRequirement, and whether the requirements conflict,
+    i.e. no version satisfies the merged specifiers.
+    """
+    applicable = [entry for entry in requirements
+                  if _applies(entry.requirement, environment)]
+
+    if skip_inapplicable:
+        skipped_set = set(entry for entry in requirements if entry not in applicable)
+        if not applicable:
+            return CombinedRequirement(None, None, set(), skipped_set), False
+        entry, conflict = merge_requirements(applicable, environment)
+        return entry._replace(skipped_set=skipped_set), conflict
+
+    def first_wins(winner):
+        return CombinedRequirement(
+            requirement=winner.requirement,
+            source=winner.source,
+            suppressed_set=set(entry for entry in requirements if entry is not winner),
+            skipped_set=set()
+        )
+
+    if not applicable or len(requirements) == 1:
+        # Nothing to merge (the common case), or pip is going to skip the
+        # requirement anyway
+        return first_wins(requirements[0]), False
+    if any(isinstance(entry.requirement, VcsRequirement) or entry.requirement.url
+           for entry in requirements):
+        return first_wins(requirements[0]), False
+
+    specifier = SpecifierSet()
+    extras = set()
+    for entry in applicable:
+        specifier &= entry.requirement.specifier
+        extras |= entry.requirement.extras
+    if not is_satisfiable(specifier):
+        return first_wins(applicable[0]), True
+
+    requirement = copy.copy(applicable[0].requirement)
+    requirement.specifier = specifier
+    requirement.extras = extras
+    if len(set(str(entry.requirement.marker) for entry in applicable)) != 1:
+        # Every marker applies to the target environment
+        requirement.marker = None
+    return CombinedRequirement(
+        requirement=requirement,
+        source=', '.join(OrderedDict.fromkeys(entry.source for entry in applicable)),
+        suppressed_set=set(entry for entry in requirements if entry not in applicable),
+        skipped_set=set()
+    ), False
+
+
+@lru_cache(maxsize=None)
+def parse_requirement(requirement_string):
+    # First try to match a SemVer requirement then a VCS requirement.
+    try:
+        return Requirement(requirement_string)
+    except InvalidRequirement as semver_err:
+        try:
+            return VcsRequirement(requirement_string)
+        except InvalidRequirement as vcs_err:
+            raise RuntimeError(
+                "Could not match requirement {} for VCS ({}) or SemVer ({})".format(
+                    requirement_string, str(vcs_err), str(semver_err)))
+
+
+def parse_requirements(contents):
+    """Parse the contents of a requirements file into a RequirementsFile."""
+    # Filter out any 'comment' lines
+    contents = comment_regex.sub('', contents)
+
+    requirements = []
+    includes = []
+    for requirement_string in contents.splitlines():
+        if requirement_string and not requirement_string.isspace():
+            match = include_regex.match(requirement_string)
+            if match:
+                includes.append((INCLUDE_OPTIONS[match.group(1)], match.group(2)))
+            else:
+                requirements.append(parse_requirement(requirement_string))
+    return RequirementsFile(
+        requirements=requirements,
+        includes=includes,
+        sha256=hashlib.sha256(contents.encode('utf-8')).hexdigest()
+    )
+
+
+def _cache_filename(cache_dir, path):
+    digest = hashlib.sha1(path.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(cache_dir, 'requirements', digest + '.json')
+
+
+@lru_cache(maxsize=None)
+def _specifier_set(specifiers):
+    return SpecifierSet(specifiers)
+
+
+@lru_cache(maxsize=None)
+def _marker(marker):
+    return Marker(marker)
+
+
+def _dump_requirement(requirement):
+    # Store the parts of a Requirement rather than its string, which would
+    # have to be parsed as a whole again; few of them (e.g. markers) are distinct.
+    if isinstance(requirement, VcsRequirement):
+        return str(requirement)
+    return [requirement.name, requirement.url, sorted(requirement.extras),
+            str(requirement.specifier),
+            str(requirement.marker) if requirement.marker else None]
+
+
+def _load_requirement(data):
+    if isinstance(data, str):
+        return VcsRequirement(data)
+    name, url, extras, specifier, marker = data
+    if not isinstance(name, str) or not (url is None or isinstance(url, str)):
+        raise ValueError("Invalid cached requirement {!r}".format(data))
+    # Parsed from the name only, which is cheap, then filled in through the public
+    # attributes, as when merging requirements
+    requirement = Requirement(name)
+    requirement.url = url
+    requirement.extras = set(extras)
+    requirement.specifier = _specifier_set(specifier)
+    requirement.marker = _marker(marker) if marker else None
+    return requirement
+
+
+def _load_cached(filename):
+    try:
+        with open(filename, 'r') as f:
+            entry = json.load(f)
+        if entry.get('version') != REQUIREMENTS_CACHE_VERSION:
+            return None
+        if not isinstance(entry['mtime_ns'], int) or not isinstance(entry['size'], int):
+            return None
+        requirements, includes, sha256 = entry['parsed']
+        entry['parsed'] = RequirementsFile(
+            [_load_requirement(data) for data in requirements],
+            [(option, path) for option, path in includes], sha256)
+    except (OSError, AttributeError, InvalidRequirement, InvalidSpecifier,
+            InvalidMarker, KeyError, TypeError, ValueError):
+        return None
+    return entry
+
+
+def _save_cached(filename, entry):
+    parsed = entry['parsed']
+    requirements = [_dump_requirement(r) for r in parsed.requirements]
+    entry = dict(entry, parsed=(requirements, parsed.includes, parsed.sha256))
+    directory = os.path.dirname(filename)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_filename = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(entry, f)
+        os.replace(tmp_filename, filename)
+    except OSError:
+        # The cache is only an optimization, never fail the build because of it
+        pass
+
+
+def load_requirements_file(requirements_file, cache_dir=None):
+    """
+    Read and parse the requirements of an open requirements file.
+
+    Parsed files are kept in memory and, if a cache_dir is given, on disk.
+    A cached entry is used as is while the file keeps its mtime and size,
+    and otherwise only if the hash of the content still matches. Files
+    shared by many packages (e.g. common_requirements.txt) are therefore
+    parsed once, not once per package.
+    """
+    try:
+        stat = os.fstat(requirements_file.fileno())
+    except (AttributeError, OSError, ValueError, io.UnsupportedOperation):
+        # Not a file on disk, e.g. a StringIO
+        return parse_requirements(requirements_file.read())
+
+    path = os.path.abspath(requirements_file.name)
+    filename = _cache_filename(cache_dir, path) if cache_dir else None
+    entry = _PARSED_FILES.get(path)
+    if entry is None and filename:
+        entry = _load_cached(filename)
+    if entry is not None and (
+            entry['mtime_ns'] == stat.st_mtime_ns and entry['size'] == stat.st_size):
+        _PARSED_FILES[path] = entry
+        return entry['parsed']
+
+    contents = requirements_file.read()
+    digest = hashlib.sha256(comment_regex.sub('', contents).encode('utf-8')).hexdigest()
+    if entry is None or entry['parsed'].sha256 != digest:
+        entry = {
+            'version': REQUIREMENTS_CACHE_VERSION,
+            'parsed': parse_requirements(contents),
+        }
+    # Touched but unchanged files get their new mtime recorded, too
+    entry.update(mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+    _PARSED_FILES[path] = entry
+    if filename:
+        _save_cached(filename, entry)
+    return entry['parsed']
+
+
+def _resolve_include(requirements_file, include, stack):
+    # Like pip, resolve relative paths from the directory of the including file
+    path = os.path.normpath(os.path.join(
+        os.path.dirname(os.path.abspath(requirements_file.name)), include))
+    if path in stack:
+        raise RuntimeError("Cyclic include of requirements files: {}".format(
+            ' -> '.join(stack[stack.index(path):] + [path])))
+    if not os.path.isfile(path):
+        raise RuntimeError(
+            "Requirements file {} includes {}, which cannot be found".format(
+                requirements_file.name, include))
+    return path
+
+
+def read_requirements(requirements_file, cache_dir, project_requirements, constraints,
+                      seen, stack=()):
+    """
+    Collect the requirements of a requirements file and the files it includes.
+
+    Requirements are added to project_requirements, by canonical project
+    name. Constraints files (-c) are not read for requirements: they are
+    added to constraints, mapped to the file including them.
+    """
+    stack = list(stack) + [os.path.abspath(requirements_file.name)]
+    parsed = load_requirements_file(requirements_file, cache_dir)
+    for requirement in parsed.requirements:
+        project_requirements.setdefault(canonicalize_name(requirement.name), []).append(
+            SuppressedRequirement(
+                requirement=requirement, source=requirements_file.name))
+
+    for option, include in parsed.includes:
+        path = _resolve_include(requirements_file, include, stack)
+        if option == '-c':
+            constraints.setdefault(path, requirements_file.name)
+        elif path not in seen:
+            seen.add(path)
+            with open(path, 'r') as f:
+                read_requirements(
+                    f, cache_dir, project_requirements, constraints, seen, stack)
+
+
+def constraints_digests(path, cache_dir, digests, stack=()):
+    """
+    Hash a constraints file and every file it includes.
+
+    pip reads the constraints files itself, so only their content needs to
+    be tracked, for the digest of the combined requirements.
+    """
+    stack = list(stack) + [path]
+    with open(path, 'r') as f:
+        parsed = load_requirements_file(f, cache_dir)
+        digests[path] = parsed.sha256
+        for _, include in parsed.includes:
+            include_path = _resolve_include(f, include, stack)
+            if include_path not in digests:
+                constraints_digests(include_path, cache_dir, digests, stack)
+
+
+def _by_source(entry):
+    return entry.source, str(entry.requirement)
 
 
 def combine_requirements(
-    requirements_list: List[TextIOWrapper], output_file: TextIOWrapper
+    requirements_list: List[TextIOWrapper], output_file: Union[str, TextIOWrapper],
+    python_version: str = None, cache_dir: str = None, skip_inapplicable: bool = False
 ) -> int:
-    combined_requirements: Dict[str, Requirement] = {}
+    environment = marker_environment(python_version)
+    # Canonical project name -> requirements on it, in the order they were found
+    project_requirements: Dict[str, List[SuppressedRequirement]] = OrderedDict()
+    # Constraints file -> the file including it
+    constraints: Dict[str, str] = {}
+    seen = set()
     for requirements_file in requirements_list:
-        contents = requirements_file.read()
-
-        # Filter out any 'comment' lines
-        contents = comment_regex.sub('', contents)
-
-        for requirement_string in contents.splitlines():
-            if requirement_string and not requirement_string.isspace():
-                # First try to match a SemVer requirement then a VCS requirement.
-                try:
-                    requirement = Requirement(requirement_string)
-                except InvalidRequirement as semver_err:
-                    try:
-                        requirement = VcsRequirement(requirement_string)
-                    except InvalidRequirement as vcs_err:
-                        raise RuntimeError(
-                            "Could not match requirement {} for VCS ({}) or SemVer ({})".format(
-                                requirement_string, str(vcs_err), str(semver_err)))
-
-                if requirement.name not in combined_requirements:
-                    combined_requirements[requirement.name] = CombinedRequirement(
-                        requirement=requirement,
-                        source=requirements_file.name,
-                        suppressed_set=set()
-                    )
-                else:
-                    combined_requirements[requirement.name].suppressed_set.add(
-                        SuppressedRequirement(requirement=requirement,
-                                              source=requirements_file.name))
-
-    for entry in combined_requirements.values():
-        output_file.write("{} # from {}\n".format(entry.requirement, entry.source))
-        for suppressed in entry.suppressed_set:
-            output_file.write(
-                "# suppressed {} from {}\n".format(suppressed.requirement, suppressed.source)
+        path = os.path.abspath(requirements_file.name)
+        if path not in seen:
+            seen.add(path)
+            read_requirements(
+                requirements_file, cache_dir, project_requirements, constraints, seen)
+
+    requirement_lines = []
+    output_lines = []
+    # Passed on to pip, which constrains the versions it resolves to them
+    # without installing anything they list
+    constraint_digests: Dict[str, str] = {}
+    for path, source in sorted(constraints.items()):
+        constraints_digests(path, cache_dir, constraint_digests)
+        requirement_lines.append("-c {}".format(path))
+        output_lines.append("-c {} # from {}".format(path, source))
+    requirement_lines.extend(
+        "# constraints {} sha256:{}".format(path, digest)
+        for path, digest in sorted(constraint_digests.items()))
+
+    conflicts = []
+    # Sorted by project, so the output does not depend on the order of the inputs
+    for _, requirements in sorted(project_requirements.items()):
+        entry, conflict = merge_requirements(
+            requirements, environment, skip_inapplicable)
+        for skipped in sorted(entry.skipped_set, key=_by_source):
+            output_lines.append(
+                "# skipped {} from {}: markers do not apply to python {}".format(
+                    skipped.requirement, skipped.source,
+                    environment['python_full_version'])
             )
+        if entry.requirement is None:
+            continue
+        if conflict:
+            conflicts.append(requirements)
+            continue
+        requirement_lines.append(str(entry.requirement))
+        output_lines.append("{} # from {}".format(entry.requirement, entry.source))
+        for suppressed in sorted(entry.suppressed_set, key=_by_source):
+            output_lines.append("# suppressed {} from {}".format(
+                suppressed.requirement, suppressed.source))
 
+    if conflicts:
+        # No version satisfies them all, so installing any one of them would
+        # break the others
+        for requirements in conflicts:
+            print(
+                "[ERROR] ament_virtualenv conflicting requirements: {}".format(
+                    ', '.join('{} from {}'.format(r.requirement, r.source)
+                              for r in requirements)),
+                file=sys.stderr
+            )
+        return 1
+    write_requirements(
+        output_file, output_lines, requirements_digest(requirement_lines))
     return 0
 
 
+def requirements_digest(requirement_lines):
+    """
+    Hash what pip gets to install, leaving out the comments about where it came from.
+
+    The lines given for the constraints files include the hash of their
+    content, which pip reads when installing.
+    """
+    return hashlib.sha256('\n'.join(requirement_lines).encode('utf-8')).hexdigest()
+
+
+def read_digest(filename):
+    try:
+        with open(filename, 'r') as f:
+            match = digest_regex.match(f.readline())
+    except OSError:
+        return None
+    return match.group(1) if match else None
+
+
+def write_requirements(output_file, lines, digest):
+    """
+    Write the combined requirements, headed by their digest.
+
+    If output_file is a path, the file is only replaced, atomically, when
+    the digest changed. Its mtime then only changes along with its content,
+    so the virtualenv which depends on it is not rebuilt needlessly.
+    """
+    contents = DIGEST_HEADER.format(digest) + ''.join(line + '\n' for line in lines)
+    if not isinstance(output_file, str):
+        output_file.write(contents)
+        return
+
+    if read_digest(output_file) == digest:
+        return
+    directory = os.path.dirname(os.path.abspath(output_file))
+    fd, tmp_filename = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(contents)
+        if os.path.exists(output_file):
+            shutil.copymode(output_file, tmp_filename)
+        else:
+            os.chmod(tmp_filename, 0o644)
+        os.replace(tmp_filename, output_file)
+    except BaseException:
+        os.unlink(tmp_filename)
+        raise
+
+
 def main(argv=sys.argv[1:]):
     parser = argparse.ArgumentParser()
     parser.add_argument(
@@ -97,8 +545,28 @@ def main(argv=sys.argv[1:]):
         nargs='*',
         required=True
     )
-    parser.add_argument('--output-file', type=argparse.FileType('w'), required=True)
-    args, unknown = parser.parse_known_args()
+    parser.add_argument(
+        '--output-file',
+        required=True,
+        help="Only replaced when the combined requirements change."
+    )
+    parser.add_argument(
+        '--python-version',
+        help=("Evaluate requirement markers for the python executable of this version, "
+              "as selected by build_venv (default: the running interpreter).")
+    )
+    parser.add_argument(
+        '--cache-dir',
+        type=str,
+        help="Directory in which to persist the parsed requirements files."
+    )
+    parser.add_argument(
+        '--skip-inapplicable',
+        action='store_true',
+        help=("Leave out requirements whose markers do not apply to the python "
+              "executable, so pip neither resolves nor fetches them.")
+    )
+    args, unknown = parser.parse_known_args(argv)
 
     return combine_requirements(**vars(args))
 #
@@ -0,0 +1,397 @@
+#!/usr/bin/env python
+#
+# Copyright 2026 ament_virtualenv contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+#
+# \file      daemon
+# \authors   ament_virtualenv contributors
+# \copyright Copyright (c) (2026), ament_virtualenv contributors
+#
+"""
+Optional long-running server for the ament_virtualenv console scripts.
+
+A colcon build of a large workspace runs glob_requirements, combine_requirements,
+wrap_module and wrap_package once per package, each time paying for interpreter
+startup, imports and rebuilding the same indexes. The daemon keeps one warm
+interpreter with the workspace indexes, parsed manifests and python interpreter
+probes in memory, and serves requests over a Unix socket. The console scripts
+are thin clients (see the client module) which run in-process when the daemon
+is not running.
+
+Only the standard library may be imported at module level, since clients
+import this module on every invocation.
+"""
+from __future__ import print_function
+
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import os
+import socket
+import socketserver
+import stat
+import struct
+import sys
+import threading
+import time
+import traceback
+
+SOCKET_ENV_KEY = 'AMENT_VIRTUALENV_DAEMON_SOCKET'
+DISABLE_ENV_KEY = 'AMENT_VIRTUALENV_NO_DAEMON'
+
+# Console scripts served by the daemon: name -> module implementing main(argv)
+COMMANDS = {
+    'glob_requirements': 'ament_virtualenv.glob_requirements',
+    'combine_requirements': 'ament_virtualenv.combine_requirements',
+    'wrap_module': 'ament_virtualenv.wrap_module',
+    'wrap_package': 'ament_virtualenv.wrap_package',
+}
+
+# Set in the daemon process itself, which must never send requests to itself
+_SERVING = False
+
+
+def private_dir(path, create=False):
+    """
+    Check that a directory belongs to the current user, and only to them.
+
+    Raises OSError if it does not, e.g. if another user created it first.
+    """
+    if create:
+        try:
+            os.mkdir(path, 0o700)
+        except FileExistsError:
+            pass
+    st = os.lstat(path)
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid() or st.st_mode & 0o077:
+        raise OSError("{} is not a directory private to user {}".format(
+            path, os.getuid()))
+    return path
+
+
+def socket_path(create=False):
+    """
+    Get the socket of the daemon, by default in a directory only the user can access.
+
+    That is $XDG_RUNTIME_DIR, or otherwise a directory of the user in /tmp,
+    which is created if create is set.
+    """
+    path = os.environ.get(SOCKET_ENV_KEY)
+    if path:
+        return path
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+    if not runtime_dir or not os.path.isdir(runtime_dir):
+        runtime_dir = private_dir(
+            os.path.join('/tmp', 'ament_virtualenv-{}'.format(os.getuid())), create)
+    return os.path.join(runtime_dir, 'ament_virtualenv.sock')
+
+
+def peer_uid(sock):
+    """Get the user id of the process at the other end of a Unix socket."""
+    credentials = sock.getsockopt(
+        socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize('3i'))
+    _, uid, _ = struct.unpack('3i', credentials)
+    return uid
+
+
+def request(message, path=None):
+    """
+    Send a request to the daemon and return its response.
+
+    Returns None when the daemon is disabled or not running, in which case
+    the caller is expected to do the work itself. Requests carry the
+    environment of the client, so they are only sent to a daemon run by
+    the same user.
+    """
+    if _SERVING or os.environ.get(DISABLE_ENV_KEY):
+        return None
+    if not hasattr(socket, 'SO_PEERCRED'):
+        return None
+    try:
+        path = path or socket_path()
+        if os.stat(path).st_uid != os.getuid():
+            return None
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(path)
+            if peer_uid(sock) != os.getuid():
+                return None
+            sock.sendall(json.dumps(message).encode('utf-8') + b'\n')
+            sock.shutdown(socket.SHUT_WR)
+            with sock.makefile('rb') as f:
+                response = f.readline()
+    except OSError:
+        return None
+    if not response:
+        return None
+    return json.loads(response.decode('utf-8'))
+
+
+def run_command(command, argv):
+    """Run a console script through the daemon, or return None if it is not running."""
+    response = request({
+        'command': command,
+        'argv': argv,
+        'cwd': os.getcwd(),
+        'env': dict(os.environ),
+    })
+    if response is None or 'returncode' not in response:
+        return None
+    sys.stdout.write(response['stdout'])
+    sys.stderr.write(response['stderr'])
+    return response['returncode']
+
+
+def probe_python(python_version):
+    """Get the cached build_venv interpreter probe from the daemon, if it is running."""
+    response = request({
+        'command': 'probe_python',
+        'python_version': python_version,
+        'env': dict(os.environ),
+    })
+    if response is None or 'probe' not in response:
+        return None
+    return tuple(response['probe'])
+
+
+@contextlib.contextmanager
+def _client_context(cwd, env):
+    """Temporarily take over the working directory and environment of a client."""
+    saved_cwd = os.getcwd()
+    saved_env = dict(os.environ)
+    try:
+        os.environ.clear()
+        os.environ.update(env)
+        os.chdir(cwd)
+        yield
+    finally:
+        os.chdir(saved_cwd)
+        os.environ.clear()
+        os.environ.update(saved_env)
+
+
+class DaemonServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path):
+        # Commands change the process' working directory, environment and
+        # standard streams, so they are run one at a time
+        self.command_lock = threading.Lock()
+        # workspace -> watch.IndexWatcher, or None where inotify is not usable
+        self.watchers = {}
+        socketserver.UnixStreamServer.__init__(self, path, DaemonRequestHandler)
+        os.chmod(path, 0o600)
+        threading.Thread(target=self.watch_indexes, daemon=True).start()
+
+    def handle_message(self, message):
+        command = message.get('command')
+        if command == 'ping':
+            return {'pid': os.getpid()}
+        if command == 'shutdown':
+            threading.Thread(target=self.shutdown).start()
+            return {}
+        if command == 'probe_python':
+            from ament_virtualenv.build_venv import _probe_python
+            with self.command_lock, _client_context(os.getcwd(), message['env']):
+                return {'probe': _probe_python(message['python_version'])}
+        if command in COMMANDS:
+            with self.command_lock, _client_context(message['cwd'], message['env']):
+                response = self.run_main(command, message['argv'])
+                self.add_watchers()
+                return response
+        return {'error': 'Unknown command {}'.format(command)}
+
+    def add_watchers(self):
+        """Watch the workspace indexes loaded by the last command."""
+        from ament_virtualenv import watch, workspace_index
+        for workspace, index in list(workspace_index._INDEXES.items()):
+            if workspace in self.watchers:
+                watcher = self.watchers[workspace]
+                if watcher is None or watcher.index is index:
+                    continue
+                # The index was rebuilt while it was not watched
+                watcher.close()
+            try:
+                self.watchers[workspace] = watch.IndexWatcher(index)
+            except OSError as e:
+                print("Not watching {}: {}".format(workspace, e), file=sys.stderr)
+                self.watchers[workspace] = None
+
+    def watch_indexes(self):
+        from ament_virtualenv import watch
+        while True:
+            watchers = [watcher for watcher in list(self.watchers.values())
+                        if watcher and watcher.fd is not None]
+            try:
+                # Time out now and then to pick up watchers added in the meantime
+                ready = watch.wait(watchers, timeout=1.0)
+            except (OSError, TypeError, ValueError):
+                # A watcher was closed while waiting
+                continue
+            for watcher in ready:
+                with self.command_lock:
+                    if watcher.fd is not None:
+                        watcher.process_events()
+            if not watchers:
+                time.sleep(1.0)
+
+    def process_pending_events(self):
+        """
+        Apply the changes to watched workspaces which the watcher thread has not yet.
+
+        Called with the command lock held, which the watcher thread waits for,
+        so that commands never see an index older than the source tree.
+        """
+        for watcher in list(self.watchers.values()):
+            if watcher is not None and watcher.fd is not None:
+                watcher.process_events()
+
+    def run_main(self, command, argv):
+        from ament_virtualenv import workspace_index
+        self.process_pending_events()
+        workspace_index.revalidate()
+
+        stdout = io.StringIO()
+        stderr = io.StringIO()
+        if command == 'glob_requirements':
+            # Forking worker processes from the threads of the daemon is unsafe
+            argv = argv + ['--jobs', '1']
+        saved_argv = sys.argv
+        # argparse takes the program name for its messages from sys.argv
+        sys.argv = [command] + argv
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            try:
+                returncode = importlib.import_module(COMMANDS[command]).main(argv)
+            except SystemExit as e:
+                returncode = e.code
+                if returncode is not None and not isinstance(returncode, int):
+                    print(returncode, file=sys.stderr)
+                    returncode = 1
+            except Exception:
+                traceback.print_exc()
+                returncode = 1
+            finally:
+                sys.argv = saved_argv
+        return {
+            'returncode': returncode or 0,
+            'stdout': stdout.getvalue(),
+            'stderr': stderr.getvalue(),
+        }
+
+
+class DaemonRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        if peer_uid(self.connection) != os.getuid():
+            return
+        line = self.rfile.readline()
+        if not line:
+            return
+        try:
+            response = self.server.handle_message(json.loads(line.decode('utf-8')))
+        except Exception as e:
+            response = {'error': str(e)}
+        self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+
+
+def serve(path):
+    global _SERVING
+    if os.path.exists(path):
+        if request({'command': 'ping'}, path) is not None:
+            print("ament_virtualenv daemon is already running on {}".format(path),
+                  file=sys.stderr)
+            return 1
+        # Left over from a daemon that did not shut down cleanly
+        os.unlink(path)
+
+    # Import everything up front, so the first requests are served warm
+    for module_name in COMMANDS.values():
+        importlib.import_module(module_name)
+
+    _SERVING = True
+    server = DaemonServer(path)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if os.path.exists(path):
+            os.unlink(path)
+    return 0
+
+
+def _detach(log_file):
+    if os.fork() > 0:
+        os._exit(0)
+    os.setsid()
+    if os.fork() > 0:
+        os._exit(0)
+    with open(os.devnull, 'r') as devnull:
+        os.dup2(devnull.fileno(), sys.stdin.fileno())
+    with open(log_file or os.devnull, 'a') as log:
+        os.dup2(log.fileno(), sys.stdout.fileno())
+        os.dup2(log.fileno(), sys.stderr.fileno())
+
+
+def main(argv=sys.argv[1:]):
+    parser = argparse.ArgumentParser(
+        description=("Serve the ament_virtualenv console scripts from a warm "
+                     "interpreter.")
+    )
+    parser.add_argument('action', choices=['start', 'stop', 'status'])
+    parser.add_argument(
+        '--socket',
+        default=None,
+        help="Unix socket to listen on (default: ${} or a per-user path).".format(
+            SOCKET_ENV_KEY)
+    )
+    parser.add_argument(
+        '--detach',
+        action="store_true",
+        help="Run the daemon in the background."
+    )
+    parser.add_argument(
+        '--log-file',
+        help="When detached, write the daemon output to this file."
+    )
+    args, unknown = parser.parse_known_args(argv)
+    try:
+        path = args.socket or socket_path(create=args.action == 'start')
+    except OSError as e:
+        print("ament_virtualenv daemon: {}".format(e), file=sys.stderr)
+        return 1
+
+    if args.action == 'status':
+        response = request({'command': 'ping'}, path)
+        if response is None:
+            print("ament_virtualenv daemon is not running")
+            return 1
+        print("ament_virtualenv daemon is running on {} (pid {})".format(
+            path, response['pid']))
+        return 0
+
+    if args.action == 'stop':
+        if request({'command': 'shutdown'}, path) is None:
+            print("ament_virtualenv daemon is not running")
+            return 1
+        return 0
+
+    if args.detach:
+        _detach(args.log_file)
+    return serve(path)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
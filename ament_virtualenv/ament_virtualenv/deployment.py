@@ -23,15 +23,55 @@ from __future__ import print_function
 
 
 import os
-import re
 import shutil
 import subprocess
+import sys
 import tempfile
 
+from contextlib import contextmanager
+
+try:
+    from ament_virtualenv.build_envs import BuildEnvPool
+except ImportError:
+    try:
+        from build_envs import BuildEnvPool
+    except ImportError:
+        from .build_envs import BuildEnvPool
+
+try:
+    from ament_virtualenv.installers import get_installer
+except ImportError:
+    try:
+        from installers import get_installer
+    except ImportError:
+        from .installers import get_installer
+
+try:
+    from ament_virtualenv import lock
+except ImportError:
+    try:
+        import lock
+    except ImportError:
+        from . import lock
+
+try:
+    from ament_virtualenv import wheelhouse
+except ImportError:
+    try:
+        import wheelhouse
+    except ImportError:
+        from . import wheelhouse
+
+try:
+    from ament_virtualenv.vcs_wheels import VcsWheelCache
+except ImportError:
+    try:
+        from vcs_wheels import VcsWheelCache
+    except ImportError:
+        from .vcs_wheels import VcsWheelCache
+
 ROOT_ENV_KEY = 'DH_VIRTUALENV_INSTALL_ROOT'
 DEFAULT_INSTALL_DIR = '/opt/venvs/'
-PYTHON_INTERPRETERS = ['python', 'pypy', 'ipy', 'jython']
-_PYTHON_INTERPRETERS_REGEX = r'\(' + r'\|'.join(PYTHON_INTERPRETERS) + r'\)'
 
 
 # (pbovbel) Log subprocess calls
@@ -61,7 +101,15 @@ class Deployment(object):
                  install_suffix=None,
                  log_file=tempfile.NamedTemporaryFile().name,  # (pbovbel): addition
                  pip_version=None,  # (pbovbel): addition
-                 requirements_filename='requirements.txt'):
+                 requirements_filename='requirements.txt',
+                 lockfile=None,
+                 wheelhouse=None,
+                 offline=False,
+                 vcs_wheel_cache_dir=None,
+                 python_abi=None,
+                 marker_environment=None,
+                 build_env_pool_dir=None,
+                 installer=None):
 
         self.package = package
 
@@ -95,6 +143,14 @@ class Deployment(object):
         self.use_system_packages = use_system_packages
         self.skip_install = skip_install
         self.requirements_filename = requirements_filename
+        self.lockfile = lockfile
+        self.wheelhouse = wheelhouse
+        self.offline = offline
+        self.installer = get_installer(installer)
+        self.vcs_wheel_cache = None
+        if vcs_wheel_cache_dir:
+            self.vcs_wheel_cache = VcsWheelCache(
+                vcs_wheel_cache_dir, python_abi, self.build_wheel, marker_environment)
 
         # We need to prefix the pip run with the location of python
         # executable. Otherwise it would just blow up due to too long
@@ -133,6 +189,11 @@ class Deployment(object):
         # (pbovbel) Set pip_upgrade_args here to keep flags like -q, disregard L111 above.
         self.pip_upgrade_args = self.pip_args
 
+        self.build_env_pool = None
+        if build_env_pool_dir:
+            self.build_env_pool = BuildEnvPool(
+                build_env_pool_dir, self.python, self.pip_args[1:])
+
     @classmethod
     def from_options(cls, package, options):
         verbose = options.verbose or os.environ.get('DH_VERBOSE') == '1'
@@ -203,7 +264,42 @@ class Deployment(object):
     def pip(self, *args):
         return self.pip_prefix + self.pip_args + list(args)
 
-    def install_dependencies(self):
+    def pip_wheel(self, wheel_dir, *args):
+        return self.pip_prefix + ['wheel'] + self.pip_args[1:] + \
+            wheelhouse.wheel_args(self.wheelhouse, wheel_dir) + list(args)
+
+    def prefetch(self, *args):
+        """Fill the wheelhouse with the wheels of the requirements."""
+        with wheelhouse.filling(self.wheelhouse) as wheel_dir:
+            if self.build_env_pool is None:
+                check_call(self.pip_wheel(wheel_dir, *args))
+                return
+            # Build the source distributions in pooled build environments, rather than
+            # letting pip wheel set up an isolated one for each of them
+            download_dir = tempfile.mkdtemp()
+            try:
+                check_call([
+                    *self.pip_prefix, 'download', *self.pip_args[1:],
+                    '--dest', download_dir, '--find-links', self.wheelhouse, *args])
+                for name in sorted(os.listdir(download_dir)):
+                    path = os.path.join(download_dir, name)
+                    if name.endswith('.whl'):
+                        shutil.move(path, wheel_dir)
+                    elif not self.build_env_pool.build_wheel(path, wheel_dir):
+                        check_call(self.pip_wheel(wheel_dir, '--no-deps', path))
+            finally:
+                shutil.rmtree(download_dir)
+
+    def build_wheel(self, requirement, wheel_dir):
+        check_call([*self.pip_prefix, 'wheel', *self.pip_args[1:],
+                    '--no-deps', '--wheel-dir', wheel_dir, requirement])
+
+    def index_args(self):
+        if self.offline and self.wheelhouse:
+            return wheelhouse.find_links_args(self.wheelhouse)
+        return []
+
+    def install_preinstall(self):
         # Install preinstall stage packages. This is handy if you need
         # a custom package to install dependencies (think something
         # along lines of setuptools), but that does not get installed
@@ -216,9 +312,101 @@ class Deployment(object):
         if self.preinstall:
             check_call(self.pip_preinstall(*self.preinstall))
 
+    def install_requirements(self):
         requirements_path = os.path.join(self.sourcedirectory, self.requirements_filename)
-        if os.path.exists(requirements_path):
-            check_call(self.pip('-r', requirements_path))
+        if not os.path.exists(requirements_path):
+            return
+        with self.rewritten_requirements(requirements_path) as requirements_path:
+            if self.lockfile:
+                self.lock_requirements(requirements_path)
+                self.install_locked(self.lockfile)
+            else:
+                self.install_unlocked(requirements_path)
+
+    @contextmanager
+    def rewritten_requirements(self, requirements_path):
+        """Refer to cached wheels instead of cloning and building VCS requirements."""
+        if self.vcs_wheel_cache is None:
+            yield requirements_path
+            return
+        rewritten_dir = tempfile.mkdtemp()
+        try:
+            rewritten = os.path.join(rewritten_dir, os.path.basename(requirements_path))
+            if self.vcs_wheel_cache.rewrite_requirements(requirements_path, rewritten):
+                requirements_path = rewritten
+            yield requirements_path
+        finally:
+            shutil.rmtree(rewritten_dir)
+
+    def install_locked(self, lockfile):
+        # Everything is pinned already, skip resolving the dependencies
+        lock_args = ['--require-hashes'] if lock.is_hashed(lockfile) else []
+        install_args = ['--no-deps'] + lock_args + ['-r', lockfile]
+        if self.wheelhouse is None:
+            self.installer.install(self, install_args)
+            return
+        if self.offline:
+            # pip verifies the wheels in the wheelhouse against the hashes
+            self.install_offline_locked(install_args, lockfile)
+            return
+        # pip verified the hashes of what it downloaded just now, to fill the wheelhouse
+        self.prefetch(*install_args)
+        stripped_dir = tempfile.mkdtemp()
+        try:
+            stripped = os.path.join(stripped_dir, 'requirements.txt')
+            wheelhouse.strip_hashes(lockfile, stripped)
+            self.install_from_wheelhouse('--no-deps', '-r', stripped)
+        finally:
+            shutil.rmtree(stripped_dir)
+
+    def install_offline_locked(self, install_args, lockfile):
+        try:
+            self.install_from_wheelhouse(*install_args)
+        except subprocess.CalledProcessError:
+            if lock.is_hashed(lockfile):
+                print("[ERROR] ament_virtualenv could not install {} offline. If "
+                      "the wheels in the wheelhouse do not match the locked hashes "
+                      "because they were built from source distributions, lock the "
+                      "requirements from the wheelhouse, by removing the lockfile, or "
+                      "build online".format(lockfile), file=sys.stderr)
+            raise
+
+    def install_unlocked(self, requirements_path):
+        install_args = ['-r', requirements_path]
+        if self.wheelhouse is None:
+            self.installer.install(self, install_args)
+            return
+        if not self.offline:
+            self.prefetch(*install_args)
+        self.install_from_wheelhouse(*install_args)
+
+    def install_from_wheelhouse(self, *args):
+        find_links = wheelhouse.find_links_args(self.wheelhouse)
+        self.installer.install(self, find_links + list(args))
+
+    def uninstall(self, *projects):
+        check_call(self.pip_prefix + ['uninstall', '--yes'] + list(projects))
+
+    def lock_requirements(self, requirements_path):
+        """Re-generate the lockfile, unless it was resolved from these requirements."""
+        if not lock.is_current(self.lockfile, requirements_path):
+            self.lock_dependencies(requirements_path)
+
+    def lock_dependencies(self, requirements_path):
+        """Resolve the requirements in the virtualenv, and pin them in the lockfile."""
+        report_dir = tempfile.mkdtemp()
+        try:
+            report = os.path.join(report_dir, 'report.json')
+            # The distributions provided by the system are not locked. Without
+            # them, resolve everything, not only what an existing virtualenv lacks
+            resolve_args = ['--dry-run', '--report', report]
+            if not self.use_system_packages:
+                resolve_args.append('--ignore-installed')
+            check_call(self.pip(
+                *self.index_args(), *resolve_args, '-r', requirements_path))
+            lock.write_lockfile(self.lockfile, report, requirements_path)
+        finally:
+            shutil.rmtree(report_dir)
 
     def run_tests(self):
         python = self.venv_bin('python')
@@ -226,96 +414,6 @@ class Deployment(object):
         if os.path.exists(setup_py):
             check_call([python, 'setup.py', 'test'], cwd=self.sourcedirectory)
 
-    def find_script_files(self):
-        """Find list of files containing python shebangs in the bin directory."""
-        command = ['grep', '-l', '-r',
-                   '-e', r'^#!.*bin/\(env \)\?{0}'.format(_PYTHON_INTERPRETERS_REGEX),
-                   '-e', r"^'''exec.*bin/{0}".format(_PYTHON_INTERPRETERS_REGEX),
-                   self.bin_dir]
-        grep_proc = subprocess.Popen(command, stdout=subprocess.PIPE)
-        files, stderr = grep_proc.communicate()
-        return set(f for f in files.decode('utf-8').strip().split('\n') if f)
-
-    def fix_shebangs(self):
-        """
-        Translate /usr/bin/python and /usr/bin/env python shebang.
-
-        Translate /usr/bin/python and /usr/bin/env python shebang
-        lines to point to our virtualenv python.
-        """
-        pythonpath = os.path.join(self.virtualenv_install_dir, 'bin/python')
-        for f in self.find_script_files():
-            regex = (
-                r's-^#!.*bin/\(env \)\?{names}\"\?-#!{pythonpath}-;'
-                r"s-^'''exec'.*bin/{names}-'''exec' {pythonpath}-"
-            ).format(names=_PYTHON_INTERPRETERS_REGEX, pythonpath=re.escape(pythonpath))
-            check_call(['sed', '-i', regex, f])
-
-    def fix_activate_path(self):
-        """
-        Replace the `VIRTUAL_ENV` path in bin/activate.
-
-        Replace the `VIRTUAL_ENV` path in bin/activate to reflect the
-        post-install path of the virtualenv.
-        """
-        activate_settings = [
-            [
-                'VIRTUAL_ENV="{0}"'.format(self.virtualenv_install_dir),
-                r'^VIRTUAL_ENV=.*$',
-                "activate"
-            ],
-            [
-                'setenv VIRTUAL_ENV "{0}"'.format(self.virtualenv_install_dir),
-                r'^setenv VIRTUAL_ENV.*$',
-                "activate.csh"
-            ],
-            [
-                'set -gx VIRTUAL_ENV "{0}"'.format(self.virtualenv_install_dir),
-                r'^set -gx VIRTUAL_ENV.*$',
-                "activate.fish"
-            ],
-        ]
-
-        for activate_args in activate_settings:
-            virtualenv_path = activate_args[0]
-            pattern = re.compile(activate_args[1], flags=re.M)
-            activate_file = activate_args[2]
-
-            with open(self.venv_bin(activate_file), 'r+') as fh:
-                content = pattern.sub(virtualenv_path, fh.read())
-                fh.seek(0)
-                fh.truncate()
-                fh.write(content)
-
     def install_package(self):
         if not self.skip_install:
             check_call(self.pip('.'), cwd=os.path.abspath(self.sourcedirectory))
-
-    def fix_local_symlinks(self):
-        # The virtualenv might end up with a local folder that points outside the package
-        # Specifically it might point at the build environment that created it!
-        # Make those links relative
-        # See https://github.com/pypa/virtualenv/commit/5cb7cd652953441a6696c15bdac3c4f9746dfaa1
-        local_dir = os.path.join(self.package_dir, "local")
-        if not os.path.isdir(local_dir):
-            return
-        elif os.path.samefile(self.package_dir, local_dir):
-            # "local" points directly to its containing directory
-            os.unlink(local_dir)
-            os.symlink(".", local_dir)
-            return
-
-        for d in os.listdir(local_dir):
-            path = os.path.join(local_dir, d)
-            if not os.path.islink(path):
-                continue
-
-            existing_target = os.readlink(path)
-            if not os.path.isabs(existing_target):
-                # If the symlink is already relative, we don't
-                # want to touch it.
-                continue
-
-            new_target = os.path.relpath(existing_target, local_dir)
-            os.unlink(path)
-            os.symlink(new_target, path)
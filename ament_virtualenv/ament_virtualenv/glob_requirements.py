@@ -23,37 +23,72 @@
 from __future__ import print_function
 
 import argparse
+import json
+import multiprocessing
 import sys
 import os
+import time
 
+from collections import deque, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
 from typing import List
-from catkin_pkg.package import Package
-from ament_index_python.packages import get_package_share_directory, PackageNotFoundError
 
 try:
-    from ament_virtualenv.package import parse_package
+    from ament_virtualenv.manifest import MANIFEST_READERS, Manifest, load_manifest
+    from ament_virtualenv.tracing import Tracer
+    from ament_virtualenv.watch import IndexWatcher, wait
+    from ament_virtualenv.workspace_index import (
+        get_ament_packages, get_workspace_index, is_known_package, is_loaded,
+        revalidate)
 except ImportError:
     try:
-        from package import parse_package
+        from manifest import MANIFEST_READERS, Manifest, load_manifest
+        from tracing import Tracer
+        from watch import IndexWatcher, wait
+        from workspace_index import (
+            get_ament_packages, get_workspace_index, is_known_package, is_loaded,
+            revalidate)
     except ImportError:
-        from .package import parse_package
+        from .manifest import MANIFEST_READERS, Manifest, load_manifest
+        from .tracing import Tracer
+        from .watch import IndexWatcher, wait
+        from .workspace_index import (
+            get_ament_packages, get_workspace_index, is_known_package, is_loaded,
+            revalidate)
 
-try:
-    from queue import Queue
-except ImportError:
-    from Queue import Queue
+# Lookups made by find_in_workspaces for the package being traced, if any
+_LOOKUPS = None
+
+
+def find_in_workspaces(project, file, workspaces=[], cache_dir=None):
+    if _LOOKUPS is None:
+        return _find_in_workspaces(project, file, workspaces, cache_dir)[0]
 
+    start = time.perf_counter()
+    path, method = _find_in_workspaces(project, file, workspaces, cache_dir)
+    _LOOKUPS.append(OrderedDict([
+        ('file', file),
+        ('method', method),
+        ('path', path),
+        ('size', os.path.getsize(path) if path else None),
+        ('time', time.perf_counter() - start),
+    ]))
+    return path
 
-def find_in_workspaces(project, file, workspaces=[]):
+
+def _find_in_workspaces(project, file, workspaces, cache_dir):
+    # type: (...) -> (str, str)
+    """Find a file of a package, returning it with the lookup method (see tracing)."""
     # A source directory should be passed within 'workspaces' (i.e. a local workspace),
     # but if not try and get the package path from ament. This will handle packages
     # that aren't in the local workspace.
-    try:
-        path = get_package_share_directory(project)
-        workspaces.append(path)
-    except PackageNotFoundError:
-        pass
+    ament_workspace = None
+    prefix = get_ament_packages().get(project)
+    if prefix:
+        ament_workspace = os.path.join(prefix, 'share', project)
+        workspaces.append(ament_workspace)
 
     if len(workspaces) == 0:
         raise RuntimeError(
@@ -70,41 +105,44 @@ def find_in_workspaces(project, file, workspaces=[]):
     # directories it will ignore that folder since it doesn't exist. To fix this we
     # need to resolve the paths so they point to valid directories, ignoring the dir
     # of the packages we're building which may not exist.
+    if ament_workspace:
+        ament_workspace = str(Path(ament_workspace).resolve())
     workspaces = [str(Path(path).resolve()) for path in workspaces]
 
     for workspace in (workspaces or []):
         # Shortcut so we don't have to search the entire install tree
         if os.path.exists(f"{workspace}/{project}/share/{project}/{file}"):
-            return f"{workspace}/{project}/share/{project}/{file}"
+            return f"{workspace}/{project}/share/{project}/{file}", 'shortcut'
 
-    # Now search the workspaces. Since this may point to the distro root which
-    # will contain ignore files we need to ignore that directory i.e. d != workspace.
+    # Now search the workspaces, using an index built with a single walk of each
+    # workspace (and persisted under cache_dir) instead of walking per lookup.
     for workspace in (workspaces or []):
-        for d, dirs, files in os.walk(workspace, topdown=True, followlinks=True):
-            if (('CATKIN_IGNORE' in files) or
-               ('COLCON_IGNORE' in files) or
-               ('AMENT_IGNORE' in files)) and d != workspace:
-                del dirs[:]
-                continue
-            dirname = os.path.basename(d)
-            if dirname == project and file in files:
-                return os.path.join(workspace, d, file)
+        loaded = is_loaded(workspace)
+        index = get_workspace_index(workspace, cache_dir)
+        path = index.find(project, file)
+        if path:
+            if workspace == ament_workspace:
+                return path, 'ament'
+            return path, 'index' if loaded or not index.walked else 'walk'
     # none found:
-    return None
+    return None, 'miss'
 #
 
 
 AMENT_VIRTUALENV_TAGNAME = "pip_requirements"
 
 
-def parse_exported_requirements(package: Package, source_dir: str) -> List[str]:
+def parse_exported_requirements(
+    package: Manifest, source_dir: str, cache_dir: str = None
+) -> List[str]:
     requirements_list = []
     for export in package.exports:
         if export.tagname == AMENT_VIRTUALENV_TAGNAME:
             requirements_path = find_in_workspaces(
                 project=package.name,
                 file=export.content,
-                workspaces=[source_dir]
+                workspaces=[source_dir],
+                cache_dir=cache_dir
             )
             if not requirements_path:
                 print(
@@ -122,16 +160,23 @@ def parse_exported_requirements(package: Package, source_dir: str) -> List[str]:
     return requirements_list
 
 
-def process_package(package_name, source_dir=None, soft_fail=True):
+def process_package(package_name, source_dir=None, soft_fail=True, cache_dir=None,
+                    manifest_reader='dom'):
     # type: (str) -> List[str], List[str]
     workspaces = []
     if source_dir:
         workspaces.append(source_dir)
 
+    resolved_workspaces = [str(Path(path).resolve()) for path in workspaces]
+    if soft_fail and not is_known_package(package_name, resolved_workspaces, cache_dir):
+        # Neither in the ament resource index nor in the workspace (e.g. a rosdep key)
+        return [], []
+
     package_path = find_in_workspaces(
         project=package_name,
         file="package.xml",
-        workspaces=workspaces
+        workspaces=workspaces,
+        cache_dir=cache_dir
     )
     if not package_path:
         if not soft_fail:
@@ -141,41 +186,274 @@ def process_package(package_name, source_dir=None, soft_fail=True):
             # This is not an ament dependency
             return [], []
     else:
-        package = parse_package(package_path)
+        package = load_manifest(package_path, cache_dir, reader=manifest_reader)
         dependencies = package.build_depends + package.test_depends
-        return parse_exported_requirements(package, source_dir), dependencies
+        return parse_exported_requirements(package, source_dir, cache_dir), dependencies
 
 
-def glob_requirements(package_name, source_dir, no_deps):
-    # type: (str) -> int
-    package_queue = Queue()
-    package_queue.put(package_name)
-    processed_packages = set()
+def _process_queued_package(queued_package, root_packages, source_dir, cache_dir,
+                            manifest_reader, trace=False):
+    def process():
+        return process_package(
+            package_name=queued_package, source_dir=source_dir,
+            soft_fail=(queued_package not in root_packages), cache_dir=cache_dir,
+            manifest_reader=manifest_reader)
+
+    if not trace:
+        return process()
+
+    # Returned along with the result, so that tracing works in worker processes too
+    global _LOOKUPS
+    _LOOKUPS = []
+    try:
+        start = time.perf_counter()
+        result = process()
+        return result, time.perf_counter() - start, _LOOKUPS
+    finally:
+        _LOOKUPS = None
+
+
+def resolve_dependency_graph(package_names, source_dir, no_deps, cache_dir=None, jobs=1,
+                             manifest_reader='dom', tracer=None):
+    """
+    Process every package reachable from package_names exactly once.
+
+    Returns a dict mapping each visited package to its exported requirements
+    and dependencies, shared between all the requested packages. If a
+    tracing.Tracer is given, every visited package is recorded in it.
+    """
+    process = partial(
+        _process_queued_package, root_packages=frozenset(package_names),
+        source_dir=source_dir, cache_dir=cache_dir, manifest_reader=manifest_reader,
+        trace=tracer is not None)
+
+    # Breadth-first traversal, one level of the dependency graph at a time. Each
+    # level is resolved and parsed concurrently when jobs > 1.
+    package_queue = list(OrderedDict.fromkeys(package_names))
+    queued_packages = set(package_queue)
+    graph = {}
+
+    executor = None
+    if jobs > 1:
+        # Load the indexes before forking, so that every worker inherits them,
+        # whichever start method multiprocessing defaults to
+        get_ament_packages()
+        if source_dir:
+            get_workspace_index(str(Path(source_dir).resolve()), cache_dir)
+        executor = ProcessPoolExecutor(
+            max_workers=jobs, mp_context=multiprocessing.get_context('fork'))
+    try:
+        while package_queue:
+            if executor:
+                results = executor.map(
+                    process, package_queue,
+                    chunksize=max(1, len(package_queue) // (jobs * 4)))
+            else:
+                results = map(process, package_queue)
+
+            next_queue = []
+            for queued_package, result in zip(package_queue, results):
+                if tracer is not None:
+                    result, elapsed, lookups = result
+                    tracer.add_node(queued_package, elapsed, lookups, result[0],
+                                    [dependency.name for dependency in result[1]])
+                requirements, dependencies = result
+                graph[queued_package] = (requirements, dependencies)
+
+                if not no_deps:
+                    for dependency in dependencies:
+                        if dependency.name not in queued_packages:
+                            queued_packages.add(dependency.name)
+                            next_queue.append(dependency.name)
+            package_queue = next_queue
+    finally:
+        if executor:
+            executor.shutdown()
+    return graph
+
+
+def collect_requirements(package_name, graph, no_deps):
+    # Consume the graph in breadth-first queue order, so the output is the same as
+    # processing the packages one at a time
+    package_queue = deque([package_name])
+    processed_packages = set(package_queue)
     requirements_list = []
 
-    while not package_queue.empty():
-        queued_package = package_queue.get()
+    while package_queue:
+        requirements, dependencies = graph[package_queue.popleft()]
+        requirements_list.extend(requirements)
+
+        if not no_deps:
+            for dependency in dependencies:
+                if dependency.name not in processed_packages:
+                    processed_packages.add(dependency.name)
+                    package_queue.append(dependency.name)
+    return requirements_list
+
+
+def glob_requirements(package_name, source_dir, no_deps, cache_dir=None, jobs=1,
+                      manifest_reader='dom', tracer=None):
+    # type: (str) -> int
+    graph = resolve_dependency_graph(
+        [package_name], source_dir, no_deps, cache_dir, jobs, manifest_reader, tracer)
+    return ';'.join(collect_requirements(package_name, graph, no_deps))
+
 
-        if queued_package not in processed_packages:
-            processed_packages.add(queued_package)
-            requirements, dependencies = process_package(
-                package_name=queued_package, source_dir=source_dir, soft_fail=(queued_package != package_name))
-            requirements_list = requirements_list + requirements
+def find_source_packages(source_tree, cache_dir=None, manifest_reader='dom'):
+    """Get the names of the packages below a source tree, except *_IGNORE'd ones."""
+    index = get_workspace_index(str(Path(source_tree).resolve()), cache_dir)
+    package_names = set()
+    for entries in index.packages.values():
+        for package_dir, files in entries:
+            package_names.add(load_manifest(
+                os.path.join(package_dir, 'package.xml'), cache_dir,
+                reader=manifest_reader).name)
+    return sorted(package_names)
 
-            if not no_deps:
-                for dependency in dependencies:
-                    package_queue.put(dependency.name)
-    return ';'.join(requirements_list)
+
+def glob_requirements_batch(package_names, source_dir, no_deps, cache_dir=None, jobs=1,
+                            manifest_reader='dom', tracer=None):
+    """
+    Glob the requirements of many packages in one pass over a shared dependency graph.
+
+    Returns an ordered dict mapping each package to its ordered list of
+    requirements files, as glob_requirements would for each one of them.
+    """
+    graph = resolve_dependency_graph(
+        package_names, source_dir, no_deps, cache_dir, jobs, manifest_reader, tracer)
+    return OrderedDict(
+        (package_name, collect_requirements(package_name, graph, no_deps))
+        for package_name in package_names
+    )
 
 
 def main(argv=sys.argv[1:]):
     parser = argparse.ArgumentParser()
-    parser.add_argument('--package-name', type=str, required=True)
+    packages = parser.add_mutually_exclusive_group(required=True)
+    packages.add_argument('--package-name', type=str)
+    packages.add_argument(
+        '--package-names',
+        type=str,
+        nargs='+',
+        help="Glob the requirements of several packages at once (batch mode)."
+    )
+    packages.add_argument(
+        '--source-tree',
+        type=str,
+        help="Glob the requirements of every package below this directory (batch mode)."
+    )
     parser.add_argument('--source-dir', type=str)
     parser.add_argument('--no-deps', action="store_true")
-    args, unknown = parser.parse_known_args()
-    print(glob_requirements(**vars(args)))
+    parser.add_argument(
+        '--cache-dir',
+        type=str,
+        help="Directory in which to persist the workspace package index."
+    )
+    parser.add_argument(
+        '--jobs', '-j',
+        type=int,
+        default=1,
+        help="Number of packages to resolve and parse in parallel."
+    )
+    parser.add_argument(
+        '--manifest-reader',
+        choices=MANIFEST_READERS,
+        default='dom',
+        help=("How to read package.xml files: 'dom' fully parses and validates them, "
+              "'expat' only streams the dependency and export tags and evaluates "
+              "their conditions.")
+    )
+    parser.add_argument(
+        '--output-json',
+        type=str,
+        help=("In batch mode, write the map of package to requirements files to this "
+              "file.")
+    )
+    parser.add_argument(
+        '--watch',
+        action="store_true",
+        help=("Keep running, and glob the requirements again whenever packages or "
+              "requirements files are added to or removed from the source directory.")
+    )
+    parser.add_argument(
+        '--trace-json',
+        type=str,
+        help=("Write the traversed dependency graph to this file, with the lookup "
+              "method, time and file sizes of every package.")
+    )
+    parser.add_argument(
+        '--trace-dot',
+        type=str,
+        help="Write the traversed dependency graph to this file in Graphviz DOT format."
+    )
+    args, unknown = parser.parse_known_args(argv)
+    source_dir = args.source_dir or args.source_tree
+    if args.watch and not source_dir:
+        parser.error("--watch requires --source-dir or --source-tree")
+
+    options = dict(
+        no_deps=args.no_deps,
+        cache_dir=args.cache_dir,
+        jobs=args.jobs,
+        manifest_reader=args.manifest_reader
+    )
+
+    def output():
+        tracer = Tracer() if args.trace_json or args.trace_dot else None
+        if args.package_name:
+            print(glob_requirements(
+                package_name=args.package_name, source_dir=source_dir, tracer=tracer,
+                **options))
+        else:
+            output_batch(tracer)
+        if args.trace_json:
+            tracer.write_json(args.trace_json)
+        if args.trace_dot:
+            tracer.write_dot(args.trace_dot)
+
+    def output_batch(tracer):
+        if args.source_tree:
+            package_names = find_source_packages(
+                args.source_tree, args.cache_dir, args.manifest_reader)
+        else:
+            package_names = args.package_names
+        requirements_map = glob_requirements_batch(
+            package_names=package_names, source_dir=source_dir, tracer=tracer,
+            **options)
+
+        if args.output_json:
+            with open(args.output_json, 'w') as f:
+                json.dump(requirements_map, f, indent=2)
+        else:
+            print(json.dumps(requirements_map, indent=2))
+
+    output()
+    if args.watch:
+        watch(source_dir, args.cache_dir, output)
     return 0
+
+
+def watch(source_dir, cache_dir, callback, settle_time=0.2):
+    """Call callback whenever the index of source_dir changes, until interrupted."""
+    index = get_workspace_index(str(Path(source_dir).resolve()), cache_dir)
+    watcher = IndexWatcher(index)
+    try:
+        while True:
+            wait([watcher])
+            # Let editors and version control finish a burst of changes
+            time.sleep(settle_time)
+            if watcher.process_events():
+                revalidate()
+                try:
+                    callback()
+                except Exception as e:
+                    # e.g. a manifest that is being edited, wait for the next change
+                    print("[ERROR] ament_virtualenv {}".format(e), file=sys.stderr)
+                sys.stdout.flush()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
 #
 
 
@@ -0,0 +1,299 @@
+#
+# Copyright 2026 ament_virtualenv contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# \file      incremental.py
+# \authors   ament_virtualenv contributors
+# \copyright Copyright (c) (2026), ament_virtualenv contributors
+#
+"""
+Incremental update of an existing virtualenv to changed requirements.
+
+Every virtualenv records the requirements it was installed from, or the
+lockfile, in its state file. When the requirements change, only the
+projects whose requirement lines changed are installed or upgraded, and the
+projects no longer required are uninstalled. Without a state file, e.g. for
+virtualenvs built before, the requirements are compared with the
+distributions installed in the virtualenv instead, as importlib.metadata
+finds them.
+
+Without a lockfile, the dependencies of uninstalled projects are left in
+the virtualenv, as pip cannot tell whether anything else needs them. With
+system site packages, a lockfile is only regenerated in a new virtualenv,
+where everything that is installed comes from the system.
+"""
+from __future__ import print_function
+
+import csv
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+
+from collections import namedtuple
+
+from packaging.requirements import Requirement
+from packaging.utils import canonicalize_name
+
+try:
+    from ament_virtualenv.combine_requirements import (
+        INCLUDE_OPTIONS, comment_regex, constraints_digests, include_regex,
+        parse_requirement)
+    from ament_virtualenv.lock import is_current
+    from ament_virtualenv.wheelhouse import hash_option_regex
+except ImportError:
+    try:
+        from combine_requirements import (
+            INCLUDE_OPTIONS, comment_regex, constraints_digests, include_regex,
+            parse_requirement)
+        from lock import is_current
+        from wheelhouse import hash_option_regex
+    except ImportError:
+        from .combine_requirements import (
+            INCLUDE_OPTIONS, comment_regex, constraints_digests, include_regex,
+            parse_requirement)
+        from .lock import is_current
+        from .wheelhouse import hash_option_regex
+
+INCREMENTAL_ENV_KEY = 'AMENT_VIRTUALENV_INCREMENTAL'
+STATE_FILENAME = 'ament_virtualenv_state.json'
+
+# Installed into virtualenvs by venv when they are created, rather than from the
+# requirements
+SEED_PROJECTS = {'pip', 'setuptools'}
+
+# Prints the site-packages and the distributions installed there, from the python
+# of a virtualenv
+_DISTRIBUTIONS_SCRIPT = """
+import importlib.metadata, json, sys, sysconfig
+site_dirs = sorted(set(sysconfig.get_paths()[key] for key in ('purelib', 'platlib')))
+print(json.dumps({
+    'cache_tag': sys.implementation.cache_tag,
+    'site_dirs': site_dirs,
+    'distributions': [
+        [dist.metadata['Name'], dist.version, dist.read_text('REQUESTED') is not None]
+        for dist in importlib.metadata.distributions(path=site_dirs)],
+}))
+"""
+
+Delta = namedtuple('Delta', 'install uninstall')
+
+
+def requirement_lines(filename):
+    """Read the lines of a requirements file which pip acts on."""
+    with open(filename, 'r') as f:
+        contents = comment_regex.sub('', f.read())
+    return [line.strip() for line in contents.splitlines() if line.strip()]
+
+
+def _project(line):
+    """Get the canonical project name of a requirement line, or None for an option."""
+    if line.startswith('-'):
+        return None
+    return canonicalize_name(parse_requirement(hash_option_regex.sub('', line)).name)
+
+
+def options_digest(lines):
+    """Digest the option lines, and the constraints files they refer to."""
+    digests = {}
+    for line in lines:
+        match = include_regex.match(line)
+        if match is not None and INCLUDE_OPTIONS[match.group(1)] == '-c':
+            constraints_digests(match.group(2), None, digests)
+    options = [line for line in lines if line.startswith('-')]
+    return hashlib.sha256(
+        json.dumps([options, sorted(digests.items())]).encode('utf-8')).hexdigest()
+
+
+def diff(installed_lines, lines):
+    """Compare the requirement lines installed with the new ones, by project."""
+    installed = {
+        _project(line): line for line in installed_lines if not line.startswith('-')}
+    required = {_project(line): line for line in lines if not line.startswith('-')}
+    return Delta(
+        install=[line for project, line in required.items()
+                 if installed.get(project) != line],
+        uninstall=sorted(project for project in installed
+                         if project not in required and project not in SEED_PROJECTS)
+    )
+
+
+def diff_installed(distributions, lines, locked):
+    """
+    Compare the distributions installed with the new requirement lines.
+
+    Requirements not satisfied by the installed version are installed. The
+    distributions no longer required are uninstalled: with a lockfile, any
+    of them, and otherwise, those which were requested rather than installed
+    as dependencies.
+    """
+    versions = {canonicalize_name(name): version for name, version, _ in distributions}
+    required = set()
+    install = []
+    for line in lines:
+        if line.startswith('-'):
+            continue
+        requirement = parse_requirement(hash_option_regex.sub('', line))
+        project = canonicalize_name(requirement.name)
+        required.add(project)
+        if not _satisfied(requirement, versions.get(project)):
+            install.append(line)
+    keep = required | SEED_PROJECTS
+    uninstall = sorted(set(
+        canonicalize_name(name) for name, _, requested in distributions
+        if (locked or requested) and canonicalize_name(name) not in keep))
+    return Delta(install, uninstall)
+
+
+def _satisfied(requirement, version):
+    """Check whether the installed version of a project satisfies a requirement."""
+    if version is None or not isinstance(requirement, Requirement) or requirement.url:
+        return False
+    return requirement.specifier.contains(version, prereleases=True)
+
+
+def installed_distributions(python):
+    output = subprocess.check_output([python, '-c', _DISTRIBUTIONS_SCRIPT])
+    return json.loads(output.decode())
+
+
+def _dist_info_dirs(site_dirs):
+    """Map the .dist-info directories in site_dirs to the mtime of their RECORD."""
+    dist_info_dirs = {}
+    for site_dir in site_dirs:
+        if not os.path.isdir(site_dir):
+            continue
+        for name in os.listdir(site_dir):
+            if name.endswith('.dist-info'):
+                path = os.path.join(site_dir, name)
+                try:
+                    record = os.path.join(path, 'RECORD')
+                    dist_info_dirs[path] = os.stat(record).st_mtime_ns
+                except OSError:
+                    dist_info_dirs[path] = None
+    return dist_info_dirs
+
+
+def _recorded_paths(dist_info_dir):
+    """Get the absolute paths of the files a distribution installed, from its RECORD."""
+    site_dir = os.path.dirname(dist_info_dir)
+    try:
+        with open(os.path.join(dist_info_dir, 'RECORD'), 'r', newline='') as f:
+            return [os.path.normpath(os.path.join(site_dir, row[0]))
+                    for row in csv.reader(f) if row]
+    except OSError:
+        return []
+
+
+def read_state(venv_dir):
+    try:
+        with open(os.path.join(venv_dir, STATE_FILENAME), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_state(venv_dir, environment, lines):
+    """Record the environment and requirement lines a virtualenv was installed with."""
+    state = {
+        'environment': environment,
+        'options': options_digest(lines),
+        'requirements': lines,
+    }
+    fd, tmp_filename = tempfile.mkstemp(dir=venv_dir, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(state, f, indent=2, sort_keys=True)
+        os.chmod(tmp_filename, 0o644)
+        os.replace(tmp_filename, os.path.join(venv_dir, STATE_FILENAME))
+    except BaseException:
+        os.unlink(tmp_filename)
+        raise
+
+
+def installed_lines(deployment, requirements_path):
+    """Get the requirement lines a deployment installs, from its lockfile if any."""
+    if deployment.lockfile:
+        return requirement_lines(deployment.lockfile)
+    if os.path.exists(requirements_path):
+        return requirement_lines(requirements_path)
+    return []
+
+
+def update(deployment, venv_dir, environment, requirements_path):
+    """
+    Update the existing virtualenv of a deployment to its requirements.
+
+    Returns the paths of the files installed, relative to venv_dir, or None
+    if the virtualenv has to be rebuilt instead, e.g. because it was built
+    for another interpreter or with other constraints.
+    """
+    python = deployment.venv_bin('python')
+    state = read_state(venv_dir)
+    if not os.path.exists(python) or not os.path.exists(requirements_path) or \
+            (state is not None and state['environment'] != environment):
+        return None
+    site = installed_distributions(python)
+    if site['cache_tag'] != environment['abi']['cache_tag']:
+        return None
+
+    if deployment.lockfile:
+        with deployment.rewritten_requirements(requirements_path) as rewritten_path:
+            if deployment.use_system_packages and \
+                    not is_current(deployment.lockfile, rewritten_path):
+                # The lockfile would leave out what the virtualenv has installed
+                return None
+            deployment.lock_requirements(rewritten_path)
+    lines = installed_lines(deployment, requirements_path)
+    if state is None:
+        delta = diff_installed(
+            site['distributions'], lines, deployment.lockfile is not None)
+    elif state['options'] != options_digest(lines):
+        return None
+    else:
+        delta = diff(state['requirements'], lines)
+    print('Updating virtualenv: {} to install, {} to uninstall'.format(
+        len(delta.install), len(delta.uninstall)))
+
+    before = _dist_info_dirs(site['site_dirs'])
+    if delta.uninstall:
+        deployment.uninstall(*delta.uninstall)
+    if delta.install:
+        delta_dir = tempfile.mkdtemp()
+        try:
+            delta_path = os.path.join(delta_dir, os.path.basename(requirements_path))
+            with open(delta_path, 'w') as f:
+                # The options, e.g. constraints, apply to the changed requirements
+                # as well
+                f.writelines(line + '\n' for line in lines if line.startswith('-'))
+                f.writelines(line + '\n' for line in delta.install)
+            if deployment.lockfile:
+                deployment.install_locked(delta_path)
+            else:
+                with deployment.rewritten_requirements(delta_path) as rewritten_path:
+                    deployment.install_unlocked(rewritten_path)
+        finally:
+            shutil.rmtree(delta_dir)
+
+    write_state(venv_dir, environment, lines)
+    # Installed or reinstalled distributions, even of the same version, have a new
+    # RECORD
+    after = _dist_info_dirs(site['site_dirs'])
+    return sorted(
+        os.path.relpath(path, venv_dir)
+        for dist_info_dir, mtime in after.items() if before.get(dist_info_dir) != mtime
+        for path in _recorded_paths(dist_info_dir))
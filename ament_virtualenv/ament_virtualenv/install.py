@@ -129,14 +129,12 @@ def install_venv(
         requirements_files = []
         for requirements_file in requirements_list.split(';'):
             requirements_files.append(open(requirements_file, 'r'))
-        generated_requirements_file = open(generated_requirements, 'w')
         combine_requirements(
             requirements_list=requirements_files,
-            output_file=generated_requirements_file
+            output_file=generated_requirements
         )
         for requirements_file in requirements_files:
             requirements_file.close()
-        generated_requirements_file.close()
     # ^ combine_requirements
     #
     if ament_virtualenv_import_failed:
@@ -253,7 +251,7 @@ def main(argv=sys.argv[1:]):
     parser.add_argument('--install-base', required=True)
     parser.add_argument('--package-name', required=True)
     parser.add_argument('--python-version', required=True)
-    args, unknown = parser.parse_known_args()
+    args, unknown = parser.parse_known_args(argv)
     return install_venv(
         install_base=args.install_base,
         package_name=args.package_name,
@@ -0,0 +1,281 @@
+#
+# Copyright 2026 ament_virtualenv contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# \file      installers.py
+# \authors   ament_virtualenv contributors
+# \copyright Copyright (c) (2026), ament_virtualenv contributors
+#
+"""
+Backends installing the requirements into a virtualenv.
+
+  pip    hands the requirements to `pip install` (the default)
+  wheel  lets pip resolve the requirements, and if they all resolve to
+         local wheels, e.g. in the wheelhouse, unpacks those in parallel
+         processes, instead of one after the other as pip does
+"""
+from __future__ import print_function
+
+import base64
+import configparser
+import csv
+import hashlib
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import zipfile
+
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import unquote, urlparse
+
+from packaging.utils import canonicalize_name
+
+INSTALLER_ENV_KEY = 'AMENT_VIRTUALENV_INSTALLER'
+INSTALLER_NAME = 'ament_virtualenv'
+
+# Prints the installation scheme of the interpreter running it
+_SCHEME_SCRIPT = "import json, sysconfig; print(json.dumps(sysconfig.get_paths()))"
+
+# The console script launcher pip writes
+_LAUNCHER = """#!{python}
+# -*- coding: utf-8 -*-
+import re
+import sys
+from {module} import {import_name}
+if __name__ == '__main__':
+    sys.argv[0] = re.sub(r'(-script\\.pyw|\\.exe)?$', '', sys.argv[0])
+    sys.exit({function}())
+"""
+
+
+# As in the deployment module, log subprocess calls
+def check_call(cmd, *args, **kwargs):
+    print(' '.join(cmd))
+    return subprocess.check_call(cmd, *args, **kwargs)
+
+
+class PipInstaller(object):
+    name = 'pip'
+
+    def install(self, deployment, args):
+        check_call(deployment.pip(*args))
+
+
+class ParallelWheelInstaller(object):
+    name = 'wheel'
+
+    def __init__(self, jobs=None):
+        self.jobs = jobs or os.cpu_count()
+
+    def install(self, deployment, args):
+        # Without local wheels, e.g. no wheelhouse, pip has to download or build them
+        # anyway
+        wheels = None
+        if _find_links(deployment.pip(*args)):
+            wheels = self.resolve(deployment, args)
+        if wheels is None:
+            PipInstaller().install(deployment, args)
+            return
+        python = deployment.venv_bin('python')
+        output = subprocess.check_output([python, '-c', _SCHEME_SCRIPT])
+        scheme = json.loads(output.decode())
+        print('Installing {} wheels in {} processes'.format(len(wheels), self.jobs))
+        with ProcessPoolExecutor(max_workers=self.jobs) as executor:
+            futures = [executor.submit(install_wheel, wheel, scheme, python, requested)
+                       for wheel, requested in wheels]
+            for future in futures:
+                future.result()
+
+    def resolve(self, deployment, args):
+        """
+        Resolve the requirements with pip, without installing anything.
+
+        Returns the paths of the wheels to install, with whether they were
+        requested rather than dependencies, or None if any of them is not a
+        local wheel.
+        """
+        report_dir = tempfile.mkdtemp()
+        try:
+            report_file = os.path.join(report_dir, 'report.json')
+            try:
+                check_call(deployment.pip(
+                    '--dry-run', '--report', report_file, '--quiet', *args))
+            except subprocess.CalledProcessError:
+                # e.g. pip < 22.2, without installation reports
+                return None
+            with open(report_file, 'r') as f:
+                report = json.load(f)
+        finally:
+            shutil.rmtree(report_dir)
+        wheels = []
+        for item in report['install']:
+            url = urlparse(item['download_info']['url'])
+            if url.scheme != 'file' or not url.path.endswith('.whl'):
+                return None
+            wheels.append((unquote(url.path), item.get('requested', False)))
+        return wheels
+
+
+def _find_links(args):
+    """Whether a pip command line points pip at local wheels, with --find-links."""
+    return any(arg == '-f' or arg.startswith('--find-links') for arg in args)
+
+
+INSTALLERS = {
+    installer.name: installer for installer in (PipInstaller, ParallelWheelInstaller)}
+
+
+def get_installer(name=None):
+    """Get an installer backend by name, by default from the environment, or pip."""
+    name = name or os.environ.get(INSTALLER_ENV_KEY) or PipInstaller.name
+    try:
+        return INSTALLERS[name]()
+    except KeyError:
+        raise RuntimeError("Unknown installer '{}', expected one of: {}".format(
+            name, ', '.join(sorted(INSTALLERS))))
+
+
+def _record_hash(content):
+    digest = base64.urlsafe_b64encode(hashlib.sha256(content).digest()).rstrip(b'=')
+    return 'sha256=' + digest.decode('ascii')
+
+
+def _dist_info_dir(names):
+    dist_info = set(name.split('/', 1)[0] for name in names
+                    if name.split('/', 1)[0].endswith('.dist-info'))
+    if len(dist_info) != 1:
+        raise RuntimeError(
+            "Expected a single .dist-info directory, found {}".format(dist_info))
+    return dist_info.pop()
+
+
+def _uninstall(site_packages, project_name):
+    """Remove an installed distribution of a project, by its RECORD."""
+    if not os.path.isdir(site_packages):
+        return
+    for name in os.listdir(site_packages):
+        if not name.endswith('.dist-info'):
+            continue
+        distribution = name[:-len('.dist-info')].rsplit('-', 1)[0]
+        if canonicalize_name(distribution) != project_name:
+            continue
+        dist_info = os.path.join(site_packages, name)
+        with open(os.path.join(dist_info, 'RECORD'), 'r', newline='') as f:
+            for row in csv.reader(f):
+                path = os.path.normpath(os.path.join(site_packages, row[0]))
+                if os.path.isfile(path) or os.path.islink(path):
+                    os.unlink(path)
+        shutil.rmtree(dist_info, ignore_errors=True)
+
+
+def _launchers(archive, dist_info, names, python, wheel):
+    """Get the launchers of the console and GUI scripts of a wheel, by script."""
+    entry_points = configparser.ConfigParser(delimiters=('=',), interpolation=None)
+    entry_points.optionxform = str
+    if dist_info + '/entry_points.txt' in names:
+        entry_points.read_string(archive.read(dist_info + '/entry_points.txt').decode())
+    launchers = []
+    for section in ('console_scripts', 'gui_scripts'):
+        if not entry_points.has_section(section):
+            continue
+        for script, reference in entry_points.items(section):
+            module, _, attr = reference.split('[', 1)[0].strip().partition(':')
+            if not module.strip() or not attr.strip():
+                # As pip, which requires a callable to launch
+                raise RuntimeError(
+                    "Invalid script entry point '{} = {}' in {}, expected "
+                    "'module:callable'".format(script, reference, wheel))
+            launchers.append((script, _LAUNCHER.format(
+                python=python, module=module.strip(),
+                import_name=attr.split('.')[0].strip(),
+                function=attr.strip()).encode('utf-8')))
+    return launchers
+
+
+def install_wheel(wheel, scheme, python, requested=False):
+    """
+    Install a wheel into the scheme of a virtualenv, as pip would.
+
+    Writes the RECORD, INSTALLER and REQUESTED metadata, and launchers for
+    the console and GUI scripts of its entry points. Bytecode is not compiled.
+    """
+    with zipfile.ZipFile(wheel) as archive:
+        names = archive.namelist()
+        for name in names:
+            if name.startswith('/') or '..' in name.split('/'):
+                raise RuntimeError("Refusing to install {} from {}".format(name, wheel))
+        dist_info = _dist_info_dir(names)
+        distribution = dist_info[:-len('.dist-info')]
+        data_dir = distribution + '.data'
+        wheel_metadata = archive.read(dist_info + '/WHEEL').decode('utf-8')
+        root_is_purelib = any(
+            line.split(':', 1)[1].strip().lower() == 'true'
+            for line in wheel_metadata.splitlines()
+            if line.lower().startswith('root-is-purelib:'))
+        site_packages = scheme['purelib' if root_is_purelib else 'platlib']
+        # Checked before anything is installed
+        launchers = _launchers(archive, dist_info, names, python, wheel)
+        _uninstall(site_packages, canonicalize_name(distribution.rsplit('-', 1)[0]))
+
+        records = []
+
+        def write(path, content, mode=None):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if os.path.lexists(path):
+                # Never write through a hardlink, e.g. into the virtualenv cache
+                os.unlink(path)
+            with open(path, 'wb') as f:
+                f.write(content)
+            if mode:
+                os.chmod(path, mode)
+            records.append((os.path.relpath(path, site_packages), _record_hash(content),
+                            str(len(content))))
+
+        for info in archive.infolist():
+            name = info.filename
+            if name.endswith('/') or name == dist_info + '/RECORD':
+                continue
+            parts = name.split('/')
+            content = archive.read(info)
+            # Keep the executable bits of the files in the wheel
+            mode = (info.external_attr >> 16) & 0o777 or None
+            if parts[0] == data_dir:
+                if parts[1] == 'scripts':
+                    if content.startswith(b'#!python'):
+                        content = b'#!' + python.encode() + content[len(b'#!python'):]
+                    mode = 0o755
+                key = {'headers': 'include'}.get(parts[1], parts[1])
+                target = os.path.join(scheme[key], *parts[2:])
+            else:
+                target = os.path.join(site_packages, *parts)
+            write(target, content, mode)
+
+        for script, launcher in launchers:
+            write(os.path.join(scheme['scripts'], script), launcher, 0o755)
+
+        write(os.path.join(site_packages, dist_info, 'INSTALLER'),
+              (INSTALLER_NAME + '\n').encode('utf-8'))
+        if requested:
+            write(os.path.join(site_packages, dist_info, 'REQUESTED'), b'')
+        records.append((dist_info + '/RECORD', '', ''))
+        record = io.StringIO()
+        csv.writer(record, lineterminator='\n').writerows(records)
+        with open(os.path.join(site_packages, dist_info, 'RECORD'), 'w') as f:
+            f.write(record.getvalue())
+    print('Installed {}'.format(os.path.basename(wheel)), file=sys.stderr)
@@ -0,0 +1,103 @@
+#
+# Copyright 2026 ament_virtualenv contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# \file      interpreter.py
+# \authors   ament_virtualenv contributors
+# \copyright Copyright (c) (2026), ament_virtualenv contributors
+#
+import json
+import os
+import shutil
+import subprocess
+
+from functools import lru_cache
+
+from packaging.markers import default_environment
+
+# Prints the PEP 508 marker environment of the interpreter running it, the
+# same way as packaging.markers.default_environment, which the target
+# interpreter may not have installed.
+_MARKER_ENVIRONMENT_SCRIPT = """
+import json, os, platform, sys
+info = sys.implementation.version
+version = '{0.major}.{0.minor}.{0.micro}'.format(info)
+if info.releaselevel != 'final':
+    version += info.releaselevel[0] + str(info.serial)
+print(json.dumps({
+    'implementation_name': sys.implementation.name,
+    'implementation_version': version,
+    'os_name': os.name,
+    'platform_machine': platform.machine(),
+    'platform_release': platform.release(),
+    'platform_system': platform.system(),
+    'platform_version': platform.version(),
+    'python_full_version': platform.python_version(),
+    'platform_python_implementation': platform.python_implementation(),
+    'python_version': '.'.join(platform.python_version_tuple()[:2]),
+    'sys_platform': sys.platform,
+}))
+"""
+
+# Prints what makes the packages installed for the interpreter running it
+# incompatible with other interpreters.
+_ABI_SCRIPT = """
+import json, platform, sys, sysconfig
+print(json.dumps({
+    'version': sys.version,
+    'cache_tag': sys.implementation.cache_tag,
+    'soabi': sysconfig.get_config_var('SOABI'),
+    'platform': sysconfig.get_platform(),
+    'machine': platform.machine(),
+}))
+"""
+
+
+def find_python(version):
+    python_executable = shutil.which('python' + version)
+    if not python_executable:
+        raise RuntimeError(
+            "Unable to find python executable 'python{}''".format(version))
+    return python_executable
+
+
+def marker_environment(python_version=None):
+    """
+    Get the environment against which to evaluate requirement markers.
+
+    This is the environment of the interpreter that build_venv selects for
+    python_version, or of the running interpreter if no version is given.
+    The interpreter is looked up on every call, as the PATH may change, e.g.
+    in the daemon, which takes on the environment of each client.
+    """
+    if python_version is None:
+        return default_environment()
+    return _marker_environment(os.path.realpath(find_python(python_version)))
+
+
+@lru_cache(maxsize=None)
+def _marker_environment(python_executable):
+    output = subprocess.check_output(
+        [python_executable, '-c', _MARKER_ENVIRONMENT_SCRIPT])
+    return json.loads(output.decode('utf-8'))
+
+
+@lru_cache(maxsize=None)
+def interpreter_abi(python_executable):
+    """Identify the version and ABI of a python executable, e.g. to key its caches."""
+    output = subprocess.check_output([python_executable, '-c', _ABI_SCRIPT])
+    abi = json.loads(output.decode('utf-8'))
+    abi['executable'] = os.path.realpath(python_executable)
+    return abi
@@ -0,0 +1,140 @@
+#
+# Copyright 2026 ament_virtualenv contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# \file      lock.py
+# \authors   ament_virtualenv contributors
+# \copyright Copyright (c) (2026), ament_virtualenv contributors
+#
+"""
+Lock combined requirements to exact versions and hashes.
+
+pip resolves the combined requirements once, with `pip install --dry-run
+--report` (pip >= 22.2), and the resolved distributions are written to a
+lockfile. Installing from the lockfile with --no-deps skips resolution, and
+the lockfile is only resolved again once the combined requirements change.
+"""
+from __future__ import print_function
+
+import hashlib
+import json
+import os
+import re
+
+from packaging.utils import canonicalize_name
+
+try:
+    from ament_virtualenv.combine_requirements import (
+        read_digest, requirements_digest, write_requirements)
+except ImportError:
+    try:
+        from combine_requirements import (
+            read_digest, requirements_digest, write_requirements)
+    except ImportError:
+        from .combine_requirements import (
+            read_digest, requirements_digest, write_requirements)
+
+LOCKED_FROM = "# locked requirements sha256:{}"
+locked_from_regex = re.compile(r'^# locked requirements sha256:([0-9a-f]+)$')
+
+
+def lockfile_path(requirements_filename):
+    """Get the default lockfile of a requirements file, e.g. requirements.lock.txt."""
+    base, extension = os.path.splitext(requirements_filename)
+    return base + '.lock' + (extension or '.txt')
+
+
+def source_digest(requirements_filename):
+    # Combined requirements carry the digest of their content already
+    digest = read_digest(requirements_filename)
+    if digest is None:
+        with open(requirements_filename, 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+    return digest
+
+
+def is_current(lockfile, requirements_filename):
+    """Check whether a lockfile was resolved from the current requirements."""
+    try:
+        with open(lockfile, 'r') as f:
+            f.readline()
+            match = locked_from_regex.match(f.readline())
+    except OSError:
+        return False
+    return match is not None and match.group(1) == source_digest(requirements_filename)
+
+
+def is_hashed(lockfile):
+    with open(lockfile, 'r') as f:
+        return any('--hash=' in line for line in f)
+
+
+def _sha256(download_info):
+    archive_info = download_info.get('archive_info', {})
+    if 'sha256' in archive_info.get('hashes', {}):
+        return archive_info['hashes']['sha256']
+    # Reports before pip 23 only have a single "<algorithm>=<hash>" entry
+    algorithm, _, digest = archive_info.get('hash', '').partition('=')
+    return digest if algorithm == 'sha256' else None
+
+
+def locked_requirements(report):
+    """
+    Turn the 'install' list of a pip installation report into pinned requirements.
+
+    Returns the requirement lines, and whether they all carry a hash. pip
+    requires a hash for every requirement once any of them has one, which
+    is impossible for VCS and local directory requirements: with any of
+    those, no hashes are written.
+    """
+    entries = []
+    for item in report['install']:
+        name = item['metadata']['name']
+        info = item['download_info']
+        if 'vcs_info' in info:
+            vcs_info = info['vcs_info']
+            requirement = '{} @ {}+{}@{}'.format(
+                name, vcs_info['vcs'], info['url'], vcs_info['commit_id'])
+            sha256 = None
+        elif 'dir_info' in info:
+            requirement = '{} @ {}'.format(name, info['url'])
+            sha256 = None
+        else:
+            if item.get('is_direct'):
+                requirement = '{} @ {}'.format(name, info['url'])
+            else:
+                requirement = '{}=={}'.format(name, item['metadata']['version'])
+            sha256 = _sha256(info)
+        entries.append((canonicalize_name(name), requirement, sha256))
+
+    entries.sort()
+    hashed = all(sha256 for _, _, sha256 in entries)
+    lines = [
+        '{} --hash=sha256:{}'.format(requirement, sha256) if hashed else requirement
+        for _, requirement, sha256 in entries
+    ]
+    return lines, hashed
+
+
+def write_lockfile(lockfile, report_filename, requirements_filename):
+    """Write the lockfile from a pip installation report, if it changed."""
+    with open(report_filename, 'r') as f:
+        report = json.load(f)
+    lines, hashed = locked_requirements(report)
+    if not hashed:
+        lines.insert(
+            0, "# without hashes, because of VCS or local directory requirements")
+    lines.insert(0, LOCKED_FROM.format(source_digest(requirements_filename)))
+    write_requirements(lockfile, lines, requirements_digest(lines))
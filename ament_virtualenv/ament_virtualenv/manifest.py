@@ -0,0 +1,298 @@
+#
+# Copyright 2026 ament_virtualenv contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# \file      manifest.py
+# \authors   ament_virtualenv contributors
+# \copyright Copyright (c) (2026), ament_virtualenv contributors
+#
+from __future__ import print_function
+
+import hashlib
+import json
+import os
+import re
+import tempfile
+
+from collections import namedtuple
+from xml.parsers import expat
+
+try:
+    from ament_virtualenv.package import InvalidPackage, parse_package_string
+except ImportError:
+    try:
+        from package import InvalidPackage, parse_package_string
+    except ImportError:
+        from .package import InvalidPackage, parse_package_string
+
+# Bump whenever the content of a Manifest changes, to invalidate on-disk entries
+MANIFEST_CACHE_VERSION = 2
+
+# Readers for package.xml files: 'dom' fully parses and validates the manifest
+# with package.parse_package_string, 'expat' only streams the tags needed to
+# discover exported requirements and evaluates their conditions.
+MANIFEST_READERS = ('dom', 'expat')
+
+# The subset of a package.xml needed to discover exported requirements
+Manifest = namedtuple("Manifest", "name build_depends test_depends exports")
+Dependency = namedtuple("Dependency", "name condition")
+Export = namedtuple("Export", "tagname content condition")
+
+# Process-wide cache, keyed by the content hash of the package.xml
+_MANIFESTS = {}
+
+_CONDITION_TOKEN_REGEX = re.compile(
+    r'\s*("[^"]*"|\'[^\']*\'|\(|\)|==|!=|>=|<=|>|<|[^\s()=!<>]+)')
+
+
+def manifest_from_package(package):
+    return Manifest(
+        name=package.name,
+        build_depends=tuple(
+            Dependency(d.name, d.condition) for d in package.build_depends),
+        test_depends=tuple(
+            Dependency(d.name, d.condition) for d in package.test_depends),
+        exports=tuple(
+            Export(e.tagname, e.content, e.attributes.get('condition'))
+            for e in package.exports)
+    )
+
+
+def parse_manifest_string(data, filename=None):
+    """
+    Parse the dependency information from package.xml string contents.
+
+    Unlike package.parse_package_string no DOM is built and the manifest is
+    not validated: the expat parser streams through the file and only the
+    name, build_depend, test_depend, depend and export tags are collected.
+    """
+    state = {
+        'format': 1,
+        'name': None,
+        'build_depend': [],
+        'test_depend': [],
+        'depend': [],
+        'export': [],
+    }
+    stack = []
+    text = []
+
+    def start_element(tag, attributes):
+        stack.append((tag, attributes))
+        if len(stack) == 1:
+            state['format'] = int(attributes.get('format', 1))
+        elif len(stack) in (2, 3):
+            del text[:]
+
+    def end_element(tag):
+        _, attributes = stack.pop()
+        depth = len(stack) + 1
+        if depth == 2:
+            if tag == 'name':
+                state['name'] = ''.join(text).strip()
+            elif tag in ('build_depend', 'test_depend', 'depend'):
+                state[tag].append(
+                    Dependency(''.join(text).strip(), attributes.get('condition')))
+        elif depth == 3 and stack[-1][0] == 'export':
+            state['export'].append(
+                Export(tag, ''.join(text).strip(), attributes.get('condition')))
+
+    def character_data(data):
+        if len(stack) in (2, 3):
+            text.append(data)
+
+    parser = expat.ParserCreate()
+    parser.StartElementHandler = start_element
+    parser.EndElementHandler = end_element
+    parser.CharacterDataHandler = character_data
+    try:
+        parser.Parse(data if isinstance(data, bytes) else data.encode('utf-8'), True)
+    except expat.ExpatError as ex:
+        raise InvalidPackage('The manifest contains invalid XML:\n%s' % ex, filename)
+    if not state['name']:
+        raise InvalidPackage(
+            'The manifest must contain exactly one "name" tag', filename)
+
+    # Same merge order as parse_package_string: <depend> tags are appended to the
+    # build dependencies, unless there is an explicit <build_depend> on the package
+    build_depends = list(state['build_depend'])
+    if state['format'] != 1:
+        build_depend_names = set(d.name for d in build_depends)
+        build_depends += [
+            d for d in state['depend'] if d.name not in build_depend_names]
+    return Manifest(
+        name=state['name'],
+        build_depends=tuple(build_depends),
+        test_depends=tuple(state['test_depend']),
+        exports=tuple(state['export'])
+    )
+
+
+def evaluate_condition(condition, context):
+    """
+    Evaluate a REP 149 condition attribute, e.g. '$ROS_VERSION == 2 and $X != y'.
+
+    Variables are looked up in the context and evaluate to an empty string
+    when they are not set.
+    """
+    if not condition:
+        return True
+    tokens = _CONDITION_TOKEN_REGEX.findall(condition)
+    position = [0]
+
+    def peek():
+        return tokens[position[0]] if position[0] < len(tokens) else None
+
+    def take():
+        token = peek()
+        if token is None:
+            raise ValueError("Unexpected end of condition '%s'" % condition)
+        position[0] += 1
+        return token
+
+    def value():
+        token = take()
+        if token.startswith('$'):
+            return context.get(token[1:], '')
+        if token[0] in '"\'':
+            return token[1:-1]
+        return token
+
+    def comparison():
+        if peek() == '(':
+            take()
+            result = disjunction()
+            if take() != ')':
+                raise ValueError("Expected ')' in condition '%s'" % condition)
+            return result
+        left = value()
+        operator = take()
+        right = value()
+        if operator == '==':
+            return left == right
+        if operator == '!=':
+            return left != right
+        if operator == '>=':
+            return left >= right
+        if operator == '<=':
+            return left <= right
+        if operator == '>':
+            return left > right
+        if operator == '<':
+            return left < right
+        raise ValueError(
+            "Unknown operator '%s' in condition '%s'" % (operator, condition))
+
+    def conjunction():
+        result = comparison()
+        while peek() == 'and':
+            take()
+            result = comparison() and result
+        return result
+
+    def disjunction():
+        result = conjunction()
+        while peek() == 'or':
+            take()
+            result = conjunction() or result
+        return result
+
+    result = disjunction()
+    if peek() is not None:
+        raise ValueError("Unexpected '%s' in condition '%s'" % (peek(), condition))
+    return result
+
+
+def _evaluate_conditions(manifest, context):
+    def applies(item):
+        return evaluate_condition(item.condition, context)
+
+    return manifest._replace(
+        build_depends=tuple(filter(applies, manifest.build_depends)),
+        test_depends=tuple(filter(applies, manifest.test_depends)),
+        exports=tuple(filter(applies, manifest.exports))
+    )
+
+
+def _cache_filename(cache_dir, key):
+    return os.path.join(cache_dir, 'manifests', key + '.json')
+
+
+def _load_cached(filename):
+    try:
+        with open(filename, 'r') as f:
+            name, build_depends, test_depends, exports = json.load(f)
+        return Manifest(name,
+                        tuple(Dependency(*d) for d in build_depends),
+                        tuple(Dependency(*d) for d in test_depends),
+                        tuple(Export(*e) for e in exports))
+    except (OSError, ValueError, TypeError):
+        return None
+
+
+def _save_cached(filename, manifest):
+    directory = os.path.dirname(filename)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_filename = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(manifest, f, separators=(',', ':'))
+        os.replace(tmp_filename, filename)
+    except OSError:
+        # The cache is only an optimization, never fail the build because of it
+        pass
+
+
+def load_manifest(path, cache_dir=None, reader='dom'):
+    """
+    Load the dependency information of a package.xml.
+
+    Results are memoized in memory and, if a cache_dir is given, on disk,
+    keyed by the hash of the file content. Unchanged manifests of shared
+    packages are therefore parsed only once per workspace. With the 'expat'
+    reader, condition attributes are evaluated against the environment.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    hasher = hashlib.sha256(data)
+    hasher.update('{}:{}'.format(MANIFEST_CACHE_VERSION, reader).encode())
+    key = hasher.hexdigest()
+
+    manifest = _MANIFESTS.get(key)
+    if manifest is None:
+        manifest = _load_manifest(data, path, cache_dir, reader, key)
+        _MANIFESTS[key] = manifest
+
+    if reader == 'expat':
+        return _evaluate_conditions(manifest, os.environ)
+    return manifest
+
+
+def _load_manifest(data, path, cache_dir, reader, key):
+    manifest = None
+
+    filename = _cache_filename(cache_dir, key) if cache_dir else None
+    if filename:
+        manifest = _load_cached(filename)
+
+    if manifest is None:
+        if reader == 'expat':
+            manifest = parse_manifest_string(data, path)
+        else:
+            manifest = manifest_from_package(
+                parse_package_string(data.decode('utf-8'), path))
+        if filename:
+            _save_cached(filename, manifest)
+    return manifest
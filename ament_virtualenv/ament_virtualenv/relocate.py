@@ -0,0 +1,302 @@
+#!/usr/bin/env python
+#
+# Copyright 2026 ament_virtualenv contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# \file      relocate.py
+# \authors   ament_virtualenv contributors
+# \copyright Copyright (c) (2026), ament_virtualenv contributors
+#
+"""
+Rewrite the hardcoded paths of a virtualenv for its install directory.
+
+The virtualenv is walked once, and every file is handled by the first rule
+matching it, in a thread pool:
+
+  shebang     `#!.../bin/python` lines of scripts in bin, to the virtualenv python
+  trampoline  `'''exec' .../bin/python` lines of scripts in bin, likewise
+  activate    the VIRTUAL_ENV of bin/activate, activate.csh and activate.fish
+  pyvenv.cfg  paths into the directory the virtualenv was built in
+  pth         likewise, in the .pth files of site-packages
+  symlink     absolute symlinks into the virtualenv, made relative
+  bytecode    .pyc and .pyo files, removed since they embed absolute paths
+
+Files are rewritten as new files, rather than in place, so that files
+hardlinked from the virtualenv cache are left untouched.
+
+Instead of leaving the virtualenv without bytecode, to be compiled on every
+first import, or on every import from a read-only filesystem, it can be
+compiled for the install directory afterwards, with hash-based invalidation,
+which does not depend on the modification times of the installed files.
+"""
+from __future__ import print_function
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+import tempfile
+
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+BYTECODE_ENV_KEY = 'AMENT_VIRTUALENV_BYTECODE'
+BYTECODE_MODES = ['delete', 'compile']
+
+PYTHON_INTERPRETERS = ['python', 'pypy', 'ipy', 'jython']
+
+_NAMES = '(?:' + '|'.join(PYTHON_INTERPRETERS) + ')'
+_SHEBANG_REGEX = re.compile(
+    (r'^#!.*bin/(?:env )?' + _NAMES + r'"?').encode('ascii'), flags=re.M)
+_TRAMPOLINE_REGEX = re.compile(
+    (r"^'''exec' (\"?).*?bin/" + _NAMES).encode('ascii'), flags=re.M)
+
+_ACTIVATE_SETTINGS = {
+    'activate': ('VIRTUAL_ENV="{0}"', re.compile(r'^VIRTUAL_ENV=.*$', flags=re.M)),
+    'activate.csh': ('setenv VIRTUAL_ENV "{0}"',
+                     re.compile(r'^setenv VIRTUAL_ENV.*$', flags=re.M)),
+    'activate.fish': ('set -gx VIRTUAL_ENV "{0}"',
+                      re.compile(r'^set -gx VIRTUAL_ENV.*$', flags=re.M)),
+}
+
+_BIN_DIRS = ('bin', os.path.join('local', 'bin'))
+_BYTECODE_SUFFIXES = ('.pyc', '.pyo')
+
+RULES = [
+    'shebang', 'trampoline', 'activate', 'pyvenv.cfg', 'pth', 'symlink', 'bytecode']
+
+
+def _write_new(path, content):
+    """Replace a file with a new one, keeping its mode."""
+    mode = os.stat(path).st_mode & 0o7777
+    fd, tmp_filename = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.relocate')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        os.chmod(tmp_filename, mode)
+        os.replace(tmp_filename, path)
+    except BaseException:
+        os.unlink(tmp_filename)
+        raise
+
+
+class Relocator(object):
+    def __init__(self, venv_dir, install_dir=None, keep_bytecode=False, jobs=None):
+        """
+        Relocate the virtualenv in venv_dir to install_dir.
+
+        install_dir defaults to venv_dir, for a virtualenv built in place,
+        in which case the paths are normalized only.
+        """
+        self.venv_dir = os.path.realpath(venv_dir)
+        self.install_dir = install_dir or self.venv_dir
+        self.keep_bytecode = keep_bytecode
+        self.jobs = jobs or min(32, (os.cpu_count() or 1) + 4)
+        self.python = os.path.join(self.install_dir, 'bin', 'python')
+        self._old_root = self.venv_dir.encode('utf-8')
+        self._new_root = self.install_dir.encode('utf-8')
+
+    def rule(self, relative_path, is_symlink):
+        """Get the rule applying to a file or symlink in the virtualenv, if any."""
+        relative_dir, name = os.path.split(relative_path)
+        if is_symlink:
+            return 'symlink'
+        elif name.endswith(_BYTECODE_SUFFIXES):
+            return None if self.keep_bytecode else 'bytecode'
+        elif relative_dir in _BIN_DIRS:
+            return 'activate' if name in _ACTIVATE_SETTINGS else 'script'
+        elif relative_path == 'pyvenv.cfg':
+            return 'pyvenv.cfg'
+        elif name.endswith('.pth'):
+            return 'pth'
+        return None
+
+    def walk(self):
+        """Yield the path and rule of each entry of the virtualenv a rule applies to."""
+        stack = ['']
+        while stack:
+            relative_dir = stack.pop()
+            with os.scandir(os.path.join(self.venv_dir, relative_dir)) as entries:
+                for entry in entries:
+                    relative_path = os.path.join(relative_dir, entry.name)
+                    if not entry.is_symlink() and entry.is_dir():
+                        stack.append(relative_path)
+                        continue
+                    rule = self.rule(relative_path, entry.is_symlink())
+                    if rule is not None:
+                        yield entry.path, rule
+
+    def classify(self, paths):
+        """Yield the path and rule of the given paths a rule applies to."""
+        for path in paths:
+            path = os.path.join(self.venv_dir, path)
+            if os.path.islink(path) or os.path.isfile(path):
+                relative_path = os.path.relpath(path, self.venv_dir)
+                rule = self.rule(relative_path, os.path.islink(path))
+                if rule is not None:
+                    yield path, rule
+
+    def relocate(self, paths=None):
+        """
+        Apply the rules to the virtualenv, or only to some paths in it.
+
+        Returns how many files each rule rewrote.
+        """
+        work = self.walk() if paths is None else self.classify(paths)
+        counts = Counter({rule: 0 for rule in RULES})
+        with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            for rules in executor.map(lambda item: self.apply(*item), work):
+                counts.update(rules)
+        return counts
+
+    def apply(self, path, rule):
+        """Apply a rule to a path, returning the rules which changed it."""
+        if rule == 'symlink':
+            return self.fix_symlink(path)
+        if rule == 'bytecode':
+            os.unlink(path)
+            return ['bytecode']
+        with open(path, 'rb') as f:
+            content = f.read()
+        if rule == 'script':
+            if b'\0' in content[:1024]:
+                # e.g. a compiled executable
+                return []
+            content, rules = self.fix_script(content)
+        elif rule == 'activate':
+            content, rules = self.fix_activate(os.path.basename(path), content)
+        else:
+            content, rules = self.fix_root(content), [rule]
+        if rules and content is not None:
+            _write_new(path, content)
+            return rules
+        return []
+
+    def fix_script(self, content):
+        python = self.python.encode('utf-8')
+        rules = []
+        fixed = _SHEBANG_REGEX.sub(lambda match: b'#!' + python, content)
+        if fixed != content:
+            rules.append('shebang')
+        content = fixed
+        fixed = _TRAMPOLINE_REGEX.sub(
+            lambda match: b"'''exec' " + match.group(1) + python, content)
+        if fixed != content:
+            rules.append('trampoline')
+        return fixed, rules
+
+    def fix_activate(self, name, content):
+        setting, pattern = _ACTIVATE_SETTINGS[name]
+        text = content.decode('utf-8')
+        fixed = pattern.sub(setting.format(self.install_dir).replace('\\', r'\\'), text)
+        fixed = fixed.encode('utf-8')
+        fixed = self.fix_root(fixed) or fixed
+        return fixed, (['activate'] if fixed != content else [])
+
+    def fix_root(self, content):
+        """Replace the build directory of the virtualenv, or return None if absent."""
+        if self._old_root == self._new_root or self._old_root not in content:
+            return None
+        return content.replace(self._old_root, self._new_root)
+
+    def fix_symlink(self, path):
+        target = os.readlink(path)
+        if not os.path.isabs(target):
+            return []
+        for root in (self.venv_dir, self.install_dir):
+            if target == root or target.startswith(root + os.sep):
+                relative_target = os.path.relpath(
+                    os.path.join(self.venv_dir, os.path.relpath(target, root)),
+                    os.path.dirname(path))
+                tmp_path = '{}.relocate{}'.format(path, os.getpid())
+                os.symlink(relative_target, tmp_path)
+                os.replace(tmp_path, path)
+                return ['symlink']
+        return []
+
+
+def format_counts(counts):
+    return ', '.join('{} {}'.format(counts[rule], rule) for rule in RULES)
+
+
+def compile_bytecode(venv_dir, install_dir=None, paths=None):
+    """
+    Compile the modules of a virtualenv, as imported from its install directory.
+
+    Compiles in parallel processes, with the python of the virtualenv, into
+    unchecked-hash based .pyc files, which are used without checking the
+    source files. Only the modules among paths, relative to venv_dir, are
+    compiled if given. Returns whether every module compiled.
+    """
+    venv_dir = os.path.realpath(venv_dir)
+    command = [
+        os.path.join(venv_dir, 'bin', 'python'), '-m', 'compileall', '-q', '-j', '0',
+        '--invalidation-mode', 'unchecked-hash',
+        '-s', venv_dir, '-p', install_dir or venv_dir
+    ]
+    if paths is None:
+        command.append(os.path.join(venv_dir, 'lib'))
+        modules = None
+    else:
+        modules = [
+            os.path.join(venv_dir, path) for path in paths if path.endswith('.py')]
+        if not modules:
+            return True
+        # Read the list of modules from stdin
+        command.extend(['-i', '-'])
+    print(' '.join(command))
+    process = subprocess.Popen(command, stdin=subprocess.PIPE if modules else None)
+    if modules:
+        process.communicate(
+            ''.join(module + '\n' for module in modules).encode('utf-8'))
+    if process.wait() != 0:
+        # e.g. modules for other python versions, which pip does not compile either
+        print("[WARNING] ament_virtualenv could not compile all modules in {}".format(
+            venv_dir), file=sys.stderr)
+        return False
+    return True
+
+
+def main(argv=sys.argv[1:]):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        'venv_dir',
+        help="The virtualenv to relocate."
+    )
+    parser.add_argument(
+        '--install-dir',
+        help="The directory the virtualenv is installed to (default: where it is)."
+    )
+    parser.add_argument(
+        '--bytecode',
+        choices=BYTECODE_MODES + ['keep'],
+        default=os.environ.get(BYTECODE_ENV_KEY, 'delete'),
+        help=("Delete the .pyc files, compile them for the install directory, or keep "
+              "them (default: ${}, or delete).".format(BYTECODE_ENV_KEY))
+    )
+    args = parser.parse_args(argv)
+
+    relocator = Relocator(args.venv_dir, args.install_dir, args.bytecode == 'keep')
+    counts = relocator.relocate()
+    print('Relocated {}: {}'.format(args.venv_dir, format_counts(counts)))
+    if args.bytecode == 'compile':
+        compile_bytecode(args.venv_dir, args.install_dir)
+    return 0
+#
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -20,6 +20,7 @@
 #
 import re
 
+from packaging.markers import InvalidMarker, Marker
 from packaging.requirements import InvalidRequirement
 
 
@@ -28,6 +29,10 @@ class VcsRequirement(object):
     A non-semver requirement from a version control system.
 
     eg. svn+http://myrepo/svn/MyApp#egg=MyApp
+
+    Like for any URL requirement, an environment marker may follow after
+    whitespace and a semicolon, eg.
+    git+https://myrepo#egg=MyApp ; python_version < "3.8"
     """
 
     VCS_SCHEMES = [
@@ -61,10 +66,18 @@ class VcsRequirement(object):
         r'(#egg=(?P<name>[^&]+))?$'
     )
 
+    marker_separator_regex = re.compile(r'\s+;\s*')
+
     def __init__(self, string):
         self.string = string
 
-        match = self.name_regex.search(self.string)
+        parts = self.marker_separator_regex.split(self.string, 1)
+        try:
+            self.marker = Marker(parts[1]) if len(parts) > 1 else None
+        except InvalidMarker as e:
+            raise InvalidRequirement(str(e))
+
+        match = self.name_regex.search(parts[0])
         if match is None:
             raise InvalidRequirement("No match for {}".format(self.name_regex.pattern))
 
@@ -72,5 +85,15 @@ class VcsRequirement(object):
         if self.name is None:
             raise InvalidRequirement("No project name '#egg=<name>' was provided")
 
+        scheme = match.group('scheme')
+        self.vcs = scheme.split('+', 1)[0]
+        self.revision = match.group('revision')
+        # The repository, as the VCS itself addresses it, e.g. https://myrepo for
+        # git+https://myrepo
+        self.repository_url = '{}://{}{}'.format(
+            scheme.split('+')[-1],
+            match.group('login') + '@' if match.group('login') else '',
+            match.group('path'))
+
     def __str__(self):
         return self.string
@@ -0,0 +1,100 @@
+#
+# Copyright 2026 ament_virtualenv contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# \file      tracing.py
+# \authors   ament_virtualenv contributors
+# \copyright Copyright (c) (2026), ament_virtualenv contributors
+#
+"""
+Record the dependency graph traversed by glob_requirements.
+
+Every visited package becomes a node with the time spent processing it and
+the file lookups made for it. Each lookup records how find_in_workspaces
+resolved the file:
+
+  shortcut  <workspace>/<package>/share/<package>/<file> existed
+  index     found in an already loaded workspace index
+  walk      found in a workspace index built by walking the workspace
+  ament     found in the share directory of an installed ament package
+  miss      not found, or not an ament package at all (e.g. a rosdep key)
+"""
+from __future__ import print_function
+
+import json
+
+from collections import OrderedDict
+
+LOOKUP_METHODS = ('shortcut', 'index', 'walk', 'ament', 'miss')
+
+# Graphviz fill colors of the nodes, by the method used to find their package.xml
+_DOT_COLORS = {
+    'shortcut': 'palegreen',
+    'index': 'lightblue',
+    'walk': 'orange',
+    'ament': 'lightgrey',
+    'miss': 'white',
+}
+
+
+class Tracer(object):
+    """Collects the nodes and edges of a traversed dependency graph."""
+
+    def __init__(self):
+        self.nodes = OrderedDict()
+        self.edges = []
+
+    def add_node(self, name, elapsed, lookups, requirements, dependencies):
+        manifest_lookups = [
+            lookup for lookup in lookups if lookup['file'] == 'package.xml']
+        self.nodes[name] = OrderedDict([
+            ('name', name),
+            ('method', manifest_lookups[0]['method'] if manifest_lookups else 'miss'),
+            ('time', elapsed),
+            ('lookups', lookups),
+            ('requirements', list(requirements)),
+        ])
+        self.edges.extend((name, dependency) for dependency in dependencies)
+
+    def to_json(self):
+        return OrderedDict([
+            ('total_time', sum(node['time'] for node in self.nodes.values())),
+            ('nodes', list(self.nodes.values())),
+            ('edges', [list(edge) for edge in self.edges if edge[1] in self.nodes]),
+        ])
+
+    def write_json(self, filename):
+        with open(filename, 'w') as f:
+            json.dump(self.to_json(), f, indent=2)
+
+    def to_dot(self):
+        lines = ['digraph requirements {', '  node [shape=box, style=filled];']
+        for node in self.nodes.values():
+            label = '{}\\n{} {:.1f} ms'.format(
+                node['name'], node['method'], 1e3 * node['time'])
+            size = sum(lookup['size'] or 0 for lookup in node['lookups'])
+            if size:
+                label += '\\n{} bytes'.format(size)
+            lines.append('  "{}" [label="{}", fillcolor={}];'.format(
+                node['name'], label, _DOT_COLORS[node['method']]))
+        for source, target in self.edges:
+            if target in self.nodes:
+                lines.append('  "{}" -> "{}";'.format(source, target))
+        lines.append('}')
+        return '\n'.join(lines) + '\n'
+
+    def write_dot(self, filename):
+        with open(filename, 'w') as f:
+            f.write(self.to_dot())
@@ -0,0 +1,221 @@
+#
+# Copyright 2026 ament_virtualenv contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# \file      vcs_wheels.py
+# \authors   ament_virtualenv contributors
+# \copyright Copyright (c) (2026), ament_virtualenv contributors
+#
+"""
+Cache of the wheels built from VCS requirements.
+
+pip clones and builds a VCS requirement again for every virtualenv which
+includes it. Instead, the revision of a git requirement is resolved to a
+commit with `git ls-remote`, and the wheel built from that commit is cached
+under the digest of the repository, the commit and the interpreter ABI.
+The requirements given to pip then refer to the cached wheel, so that every
+commit is cloned and built once per machine.
+
+Requirements on other VCSs, or on revisions which cannot be resolved
+remotely, e.g. abbreviated commits, are left to pip.
+"""
+from __future__ import print_function
+
+import errno
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from functools import lru_cache
+from pathlib import Path
+
+try:
+    from ament_virtualenv.combine_requirements import comment_regex, parse_requirement
+    from ament_virtualenv.requirements import VcsRequirement
+except ImportError:
+    try:
+        from combine_requirements import comment_regex, parse_requirement
+        from requirements import VcsRequirement
+    except ImportError:
+        from .combine_requirements import comment_regex, parse_requirement
+        from .requirements import VcsRequirement
+
+CACHE_DIR_ENV_KEY = 'AMENT_VIRTUALENV_VCS_WHEEL_CACHE'
+
+_commit_regex = re.compile(r'^[0-9a-f]{40}$')
+_abbreviated_commit_regex = re.compile(r'^[0-9a-f]{7,40}$')
+
+
+@lru_cache(maxsize=None)
+def resolve_commit(repository_url, revision=None):
+    """
+    Resolve a git branch or tag, or HEAD, to the commit it points to.
+
+    Returns None if the revision cannot be resolved without cloning.
+    """
+    if revision is not None and _commit_regex.match(revision):
+        return revision
+    try:
+        patterns = ['HEAD'] if revision is None else [revision, revision + '^{}']
+        output = subprocess.check_output(
+            ['git', 'ls-remote', repository_url, *patterns],
+            env=dict(os.environ, GIT_TERMINAL_PROMPT='0')
+        ).decode('utf-8')
+    except (OSError, subprocess.CalledProcessError) as e:
+        print("[WARNING] ament_virtualenv could not resolve {}@{}: {}".format(
+            repository_url, revision or 'HEAD', e), file=sys.stderr)
+        return None
+    refs = {}
+    for line in output.splitlines():
+        commit, _, ref = line.partition('\t')
+        refs[ref] = commit
+    if not refs:
+        return None
+    # Prefer the commit an annotated tag points to over the tag object itself
+    for candidate in (revision or 'HEAD',
+                      'refs/tags/{}^{{}}'.format(revision),
+                      'refs/tags/{}'.format(revision),
+                      'refs/heads/{}'.format(revision)):
+        if candidate in refs:
+            return refs[candidate]
+    return None
+
+
+def requirement_commits(requirements_filename, environment=None):
+    """
+    Resolve the VCS requirements of a requirements file to the commits they refer to.
+
+    Returns a sorted list of (name, repository URL, commit) tuples, which
+    change whenever a branch or tag moves, or None if a revision cannot be
+    resolved, e.g. on a VCS other than git. Requirements whose markers do
+    not apply to the marker environment are left out.
+    """
+    with open(requirements_filename, 'r') as f:
+        contents = comment_regex.sub('', f.read())
+    commits = []
+    for line in contents.splitlines():
+        requirement_string = line.strip()
+        if not requirement_string or requirement_string.startswith('-'):
+            continue
+        requirement = parse_requirement(requirement_string)
+        if not isinstance(requirement, VcsRequirement):
+            continue
+        if requirement.marker is not None and environment is not None and \
+                not requirement.marker.evaluate(environment):
+            continue
+        if requirement.revision is not None and \
+                _abbreviated_commit_regex.match(requirement.revision):
+            commit = requirement.revision
+        elif requirement.vcs == 'git':
+            commit = resolve_commit(requirement.repository_url, requirement.revision)
+        else:
+            commit = None
+        if commit is None:
+            return None
+        commits.append((requirement.name, requirement.repository_url, commit))
+    return sorted(commits)
+
+
+def wheel_key(repository_url, commit, abi):
+    inputs = {'repository_url': repository_url, 'commit': commit, 'abi': abi}
+    return hashlib.sha256(
+        json.dumps(inputs, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class VcsWheelCache(object):
+    def __init__(self, cache_dir, abi, build_wheel, environment=None):
+        """
+        Create a cache of the wheels for the interpreter with the given ABI.
+
+        build_wheel(requirement, wheel_dir) builds the wheel of a requirement
+        string into wheel_dir, using that interpreter. Requirements whose
+        markers do not apply to its marker environment are left to pip,
+        which skips them.
+        """
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.abi = abi
+        self.build_wheel = build_wheel
+        self.environment = environment
+
+    def wheel(self, requirement):
+        """Get the cached wheel for a git requirement, building it if needed."""
+        if requirement.vcs != 'git':
+            return None
+        commit = resolve_commit(requirement.repository_url, requirement.revision)
+        if commit is None:
+            return None
+
+        entry_dir = os.path.join(
+            self.cache_dir, wheel_key(requirement.repository_url, commit, self.abi))
+        if not os.path.isdir(entry_dir):
+            print('Building wheel of {} at {}'.format(requirement.name, commit))
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_dir = tempfile.mkdtemp(dir=self.cache_dir, prefix='.tmp')
+            try:
+                self.build_wheel('{}+{}@{}#egg={}'.format(
+                    requirement.vcs, requirement.repository_url, commit,
+                    requirement.name), tmp_dir)
+                try:
+                    os.rename(tmp_dir, entry_dir)
+                except OSError as e:
+                    # Another build cached the same wheel in the meantime
+                    if e.errno not in (errno.EEXIST, errno.ENOTEMPTY):
+                        raise
+            finally:
+                if os.path.exists(tmp_dir):
+                    shutil.rmtree(tmp_dir)
+        wheels = [name for name in os.listdir(entry_dir) if name.endswith('.whl')]
+        if len(wheels) != 1:
+            raise RuntimeError("Expected a single wheel in {}, found {}".format(
+                entry_dir, wheels))
+        return os.path.join(entry_dir, wheels[0])
+
+    def rewrite_requirements(self, requirements_filename, output_filename):
+        """
+        Copy a requirements file, referring to cached wheels instead of git repos.
+
+        Each git requirement whose markers apply is replaced by the wheel built
+        from its resolved commit.
+
+        Returns whether any requirement was rewritten.
+        """
+        with open(requirements_filename, 'r') as f:
+            lines = f.read().splitlines()
+        rewritten = False
+        for i, line in enumerate(lines):
+            requirement_string = comment_regex.sub('', line).strip()
+            if not requirement_string or requirement_string.startswith('-'):
+                continue
+            requirement = parse_requirement(requirement_string)
+            if not isinstance(requirement, VcsRequirement):
+                continue
+            if requirement.marker is not None and \
+                    not requirement.marker.evaluate(self.environment):
+                continue
+            wheel = self.wheel(requirement)
+            if wheel is None:
+                continue
+            lines[i] = '{} @ {}'.format(requirement.name, Path(wheel).as_uri())
+            if requirement.marker is not None:
+                lines[i] += ' ; {}'.format(requirement.marker)
+            rewritten = True
+        with open(output_filename, 'w') as f:
+            f.writelines(line + '\n' for line in lines)
+        return rewritten
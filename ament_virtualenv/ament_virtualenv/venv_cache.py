@@ -0,0 +1,466 @@
+#
+# Copyright 2026 ament_virtualenv contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# \file      venv_cache.py
+# \authors   ament_virtualenv contributors
+# \copyright Copyright (c) (2026), ament_virtualenv contributors
+#
+"""
+Content-addressed cache of built virtualenvs.
+
+A virtualenv is stored under the digest of everything that goes into
+building it: the interpreter version and ABI, the combined requirements,
+the pip arguments and whether system site packages are used. Packages with
+the same inputs, in the same workspace or in later builds, get the cached
+virtualenv instead of building their own.
+
+Cached files are hardlinked (or reflinked, or copied, across filesystems)
+into place. The few files which embed the root directory of the virtualenv
+are rewritten for the new root instead, as new files, so that the cache is
+never modified through a link. Entries are evicted least recently used
+first once the cache outgrows its size limit.
+
+The local cache can be backed by a remote one shared between machines,
+over plain HTTP GET and PUT (see the cache_server module). Entries missing
+locally are downloaded from it, and newly built ones are uploaded to it
+by a detached process, so builds never wait for the upload.
+"""
+from __future__ import print_function
+
+import argparse
+import contextlib
+import errno
+import fcntl
+import hashlib
+import http.client
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+import zlib
+
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+try:
+    from ament_virtualenv.lock import source_digest
+except ImportError:
+    try:
+        from lock import source_digest
+    except ImportError:
+        from .lock import source_digest
+
+CACHE_DIR_ENV_KEY = 'AMENT_VIRTUALENV_VENV_CACHE'
+CACHE_SIZE_ENV_KEY = 'AMENT_VIRTUALENV_VENV_CACHE_SIZE'
+REMOTE_CACHE_ENV_KEY = 'AMENT_VIRTUALENV_REMOTE_CACHE'
+DEFAULT_CACHE_SIZE = '10G'
+
+# Bump whenever the layout of entries changes, to invalidate existing ones
+VENV_CACHE_VERSION = 2
+
+ENTRY_FILENAME = 'entry.json'
+LOCKFILE_FILENAME = 'lockfile.txt'
+VENV_DIRNAME = 'venv'
+
+# linux/fs.h: clone a whole file, for copy-on-write filesystems like btrfs and XFS
+_FICLONE = 0x40049409
+
+# The links of a virtualenv to its interpreter, e.g. bin/python3 -> /usr/bin/python3
+_interpreter_link_regex = re.compile(r'^bin/python[0-9.]*$')
+
+_size_regex = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*([KMGT]?)i?B?\s*$', re.IGNORECASE)
+_SIZE_UNITS = {'': 1, 'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30, 'T': 1 << 40}
+
+
+def parse_size(size):
+    """Parse a size in bytes, with an optional unit, e.g. 500M or 10G."""
+    match = _size_regex.match(str(size))
+    if match is None:
+        raise ValueError("Invalid size '{}'".format(size))
+    return int(float(match.group(1)) * _SIZE_UNITS[match.group(2).upper()])
+
+
+def venv_key(abi, requirements_filename, extra_pip_args, use_system_packages, locked,
+             install_dir=None, vcs_commits=()):
+    """
+    Digest the inputs of a virtualenv build.
+
+    Virtualenvs with compiled bytecode, which embeds their install_dir and
+    cannot be relocated, are only reused for the same install_dir. The
+    commits the VCS requirements resolve to are included as well, since
+    the requirements only name a branch or tag.
+    """
+    inputs = {
+        'version': VENV_CACHE_VERSION,
+        'abi': abi,
+        'requirements': source_digest(requirements_filename),
+        'extra_pip_args': [arg for arg in extra_pip_args if arg],
+        'use_system_packages': bool(use_system_packages),
+        'locked': bool(locked),
+        'vcs_commits': [list(commit) for commit in vcs_commits],
+    }
+    if install_dir is not None:
+        inputs['install_dir'] = install_dir
+    return hashlib.sha256(
+        json.dumps(inputs, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def _link_or_copy(src, dst):
+    try:
+        os.link(src, dst)
+        return
+    except OSError as e:
+        if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK):
+            raise
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        try:
+            fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+        except OSError:
+            shutil.copyfileobj(fsrc, fdst)
+    shutil.copystat(src, dst)
+
+
+class RemoteCache(object):
+    """A cache server storing the compressed entries at {url}/venvs/{key}.tar.gz."""
+
+    def __init__(self, url, timeout=60):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+
+    def artifact_url(self, key):
+        return '{}/venvs/{}.tar.gz'.format(self.url, key)
+
+    def download(self, key, filename):
+        """Download an artifact to filename, returning whether the server has it."""
+        try:
+            with urlopen(self.artifact_url(key), timeout=self.timeout) as response, \
+                    open(filename, 'wb') as f:
+                shutil.copyfileobj(response, f)
+        except HTTPError as e:
+            if e.code == 404:
+                return False
+            raise
+        return True
+
+    def upload(self, key, filename):
+        with open(filename, 'rb') as f:
+            request = Request(self.artifact_url(key), data=f, method='PUT', headers={
+                'Content-Length': str(os.fstat(f.fileno()).st_size),
+                'Content-Type': 'application/gzip',
+            })
+            urlopen(request, timeout=self.timeout).close()
+
+
+class VenvCache(object):
+    def __init__(self, cache_dir, max_size=DEFAULT_CACHE_SIZE, remote_url=None):
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.max_size = parse_size(max_size)
+        self.entries_dir = os.path.join(self.cache_dir, 'venvs')
+        self.remote = RemoteCache(remote_url) if remote_url else None
+        if self.remote is not None and not hasattr(tarfile, 'data_filter'):
+            # Archives from the remote cache cannot be extracted safely
+            print("[WARNING] ament_virtualenv remote cache disabled: python {}.{}.{} "
+                  "cannot filter tar archives".format(*sys.version_info[:3]),
+                  file=sys.stderr)
+            self.remote = None
+
+    @classmethod
+    def from_environment(cls, cache_dir=None, max_size=None, remote_url=None):
+        """Get the cache configured by arguments or the environment, if any."""
+        cache_dir = cache_dir or os.environ.get(CACHE_DIR_ENV_KEY)
+        if not cache_dir:
+            return None
+        return cls(
+            cache_dir,
+            max_size or os.environ.get(CACHE_SIZE_ENV_KEY, DEFAULT_CACHE_SIZE),
+            remote_url or os.environ.get(REMOTE_CACHE_ENV_KEY)
+        )
+
+    def entry_dir(self, key):
+        return os.path.join(self.entries_dir, key)
+
+    @contextlib.contextmanager
+    def _locked(self, exclusive):
+        """Keep entries from being evicted while read, or read while evicting."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with open(os.path.join(self.cache_dir, 'lock'), 'a') as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def fetch(self, key, root_dir, lockfile=None, python=None):
+        """
+        Materialize a cached virtualenv in root_dir, replacing what is there.
+
+        Entries are only downloaded from the remote cache given the python
+        executable the virtualenv is for, to link it to. Returns whether the
+        key was found in the local or the remote cache.
+        """
+        entry_dir = self.entry_dir(key)
+        if self.remote is not None and python is not None and \
+                not os.path.exists(entry_dir):
+            self.fetch_remote(key, python)
+        with self._locked(exclusive=False):
+            try:
+                with open(os.path.join(entry_dir, ENTRY_FILENAME), 'r') as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                return False
+            if os.path.lexists(root_dir):
+                shutil.rmtree(root_dir)
+            _materialize(
+                os.path.join(entry_dir, VENV_DIRNAME), root_dir,
+                entry['root_dir'], root_dir, set(entry['relocate']))
+            if lockfile and os.path.exists(os.path.join(entry_dir, LOCKFILE_FILENAME)):
+                shutil.copyfile(os.path.join(entry_dir, LOCKFILE_FILENAME), lockfile)
+            # The modification time of the entry tracks when it was last used
+            os.utime(os.path.join(entry_dir, ENTRY_FILENAME))
+        return True
+
+    def store(self, key, root_dir, lockfile=None, keep_bytecode=False):
+        """
+        Add a built virtualenv to the cache, then evict entries over the size limit.
+
+        Bytecode is only kept if the key includes the install directory.
+        """
+        os.makedirs(self.entries_dir, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(dir=self.entries_dir, prefix='.tmp')
+        try:
+            relocate, interpreter_links, size = _store(
+                root_dir, os.path.join(tmp_dir, VENV_DIRNAME), keep_bytecode)
+            if lockfile and os.path.exists(lockfile):
+                shutil.copyfile(lockfile, os.path.join(tmp_dir, LOCKFILE_FILENAME))
+            with open(os.path.join(tmp_dir, ENTRY_FILENAME), 'w') as f:
+                json.dump({
+                    'root_dir': root_dir,
+                    'relocate': sorted(relocate),
+                    'interpreter_links': sorted(interpreter_links),
+                    'size': size,
+                    'created': time.time(),
+                }, f)
+            try:
+                os.rename(tmp_dir, self.entry_dir(key))
+            except OSError as e:
+                # Another build stored the same virtualenv in the meantime
+                if e.errno not in (errno.EEXIST, errno.ENOTEMPTY):
+                    raise
+        finally:
+            if os.path.exists(tmp_dir):
+                shutil.rmtree(tmp_dir)
+        if self.remote is not None:
+            self.upload_async(key)
+        self.evict()
+
+    def fetch_remote(self, key, python):
+        """
+        Download an entry from the remote cache into the local one, if it is there.
+
+        Archives are not trusted: they are extracted with the 'data' filter,
+        which rejects links and files outside of the entry, and special
+        files. The links of the virtualenv to its interpreter, left out of
+        the archive, are recreated to the local python executable. Broken
+        archives are treated like missing ones.
+        """
+        os.makedirs(self.entries_dir, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(dir=self.entries_dir, prefix='.tmp')
+        try:
+            archive = os.path.join(tmp_dir, 'entry.tar.gz')
+            try:
+                if not self.remote.download(key, archive):
+                    return False
+            except (URLError, OSError, http.client.HTTPException) as e:
+                print("[WARNING] ament_virtualenv remote cache unavailable: {}".format(
+                    e), file=sys.stderr)
+                return False
+            print('Downloaded virtualenv {} from {}'.format(key, self.remote.url))
+            entry_dir = os.path.join(tmp_dir, 'entry')
+            try:
+                with tarfile.open(archive, 'r:gz') as tar:
+                    tar.extractall(entry_dir, filter='data')
+                with open(os.path.join(entry_dir, ENTRY_FILENAME), 'r') as f:
+                    interpreter_links = json.load(f)['interpreter_links']
+                for link in interpreter_links:
+                    if not _interpreter_link_regex.match(link):
+                        raise ValueError("Invalid interpreter link '{}'".format(link))
+                    os.symlink(python, os.path.join(entry_dir, VENV_DIRNAME, link))
+            except (tarfile.TarError, EOFError, zlib.error, OSError, KeyError,
+                    TypeError, ValueError) as e:
+                print("[WARNING] ament_virtualenv ignoring broken virtualenv {} from "
+                      "the remote cache: {}".format(key, e), file=sys.stderr)
+                return False
+            try:
+                os.rename(entry_dir, self.entry_dir(key))
+            except OSError as e:
+                if e.errno not in (errno.EEXIST, errno.ENOTEMPTY):
+                    raise
+        finally:
+            shutil.rmtree(tmp_dir)
+        return True
+
+    def upload_async(self, key):
+        """Upload an entry to the remote cache from a detached process."""
+        with open(os.devnull, 'r+') as devnull:
+            subprocess.Popen(
+                [sys.executable, os.path.abspath(__file__), 'upload',
+                 '--cache-dir', self.cache_dir, '--remote-cache', self.remote.url, key],
+                stdin=devnull, stdout=devnull, stderr=devnull,
+                start_new_session=True, close_fds=True
+            )
+
+    def upload(self, key):
+        fd, archive = tempfile.mkstemp(dir=self.cache_dir, suffix='.tar.gz')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                # Keep the entry from being evicted while it is packed
+                with self._locked(exclusive=False), \
+                        tarfile.open(fileobj=f, mode='w:gz') as tar:
+                    entry_dir = self.entry_dir(key)
+                    entry_filename = os.path.join(entry_dir, ENTRY_FILENAME)
+                    with open(entry_filename, 'r') as entry_file:
+                        interpreter_links = set(
+                            os.path.join(VENV_DIRNAME, link)
+                            for link in json.load(entry_file)['interpreter_links'])
+
+                    def leave_out_interpreter_links(tarinfo):
+                        # The machine fetching the entry links to its own interpreter
+                        return None if tarinfo.name in interpreter_links else tarinfo
+
+                    for name in sorted(os.listdir(entry_dir)):
+                        tar.add(os.path.join(entry_dir, name), arcname=name,
+                                filter=leave_out_interpreter_links)
+            self.remote.upload(key, archive)
+        finally:
+            os.unlink(archive)
+
+    def evict(self):
+        """Remove the least recently used entries until the cache fits its limit."""
+        with self._locked(exclusive=True):
+            entries = []
+            for name in os.listdir(self.entries_dir):
+                entry_file = os.path.join(self.entries_dir, name, ENTRY_FILENAME)
+                try:
+                    with open(entry_file, 'r') as f:
+                        size = json.load(f)['size']
+                    entries.append((os.stat(entry_file).st_mtime, size, name))
+                except (OSError, ValueError, KeyError):
+                    # Being stored right now, or broken
+                    continue
+            total = sum(size for _, size, _ in entries)
+            for _, size, name in sorted(entries):
+                if total <= self.max_size:
+                    break
+                print('Evicting virtualenv {} from the cache'.format(name))
+                shutil.rmtree(os.path.join(self.entries_dir, name))
+                total -= size
+
+
+def _store(root_dir, target_dir, keep_bytecode=False):
+    """
+    Copy a virtualenv into the cache.
+
+    Returns the paths, relative to root_dir, which embed root_dir and need
+    to be relocated when materializing the virtualenv elsewhere, those of
+    the absolute links to the interpreter, and the total size of the files.
+    Bytecode is left out, unless keep_bytecode, since it embeds absolute
+    paths, and binary files are not relocated, as the length of the paths
+    in them cannot change.
+    """
+    skipped_suffixes = () if keep_bytecode else ('.pyc', '.pyo')
+    old_root = os.fsencode(root_dir)
+    relocate = set()
+    interpreter_links = set()
+    size = 0
+    for dirpath, dirnames, filenames in os.walk(root_dir):
+        rel_dir = os.path.relpath(dirpath, root_dir)
+        os.makedirs(os.path.join(target_dir, rel_dir), exist_ok=True)
+        # os.walk lists symlinks to directories in dirnames, without descending into
+        # them
+        for name in dirnames + filenames:
+            path = os.path.join(dirpath, name)
+            rel_path = os.path.normpath(os.path.join(rel_dir, name))
+            target = os.path.join(target_dir, rel_path)
+            if os.path.islink(path):
+                link = os.readlink(path)
+                os.symlink(link, target)
+                if os.fsencode(link).startswith(old_root):
+                    relocate.add(rel_path)
+                elif os.path.isabs(link) and _interpreter_link_regex.match(rel_path):
+                    interpreter_links.add(rel_path)
+            elif os.path.isfile(path) and not name.endswith(skipped_suffixes):
+                with open(path, 'rb') as f:
+                    content = f.read()
+                with open(target, 'wb') as f:
+                    f.write(content)
+                shutil.copystat(path, target)
+                size += len(content)
+                if old_root in content and b'\0' not in content:
+                    relocate.add(rel_path)
+        shutil.copystat(dirpath, os.path.join(target_dir, rel_dir))
+    return relocate, interpreter_links, size
+
+
+def _materialize(source_dir, root_dir, old_root, new_root, relocate):
+    old_root, new_root = os.fsencode(old_root), os.fsencode(new_root)
+    for dirpath, dirnames, filenames in os.walk(source_dir):
+        rel_dir = os.path.relpath(dirpath, source_dir)
+        os.makedirs(os.path.join(root_dir, rel_dir), exist_ok=True)
+        for name in dirnames + filenames:
+            path = os.path.join(dirpath, name)
+            rel_path = os.path.normpath(os.path.join(rel_dir, name))
+            target = os.path.join(root_dir, rel_path)
+            if os.path.islink(path):
+                link = os.readlink(path)
+                if rel_path in relocate:
+                    link = os.fsdecode(os.fsencode(link).replace(old_root, new_root, 1))
+                os.symlink(link, target)
+            elif rel_path in relocate and old_root != new_root:
+                with open(path, 'rb') as f:
+                    content = f.read()
+                with open(target, 'wb') as f:
+                    f.write(content.replace(old_root, new_root))
+                shutil.copymode(path, target)
+            elif os.path.isfile(path):
+                _link_or_copy(path, target)
+        shutil.copystat(dirpath, os.path.join(root_dir, rel_dir))
+
+
+def main(argv=sys.argv[1:]):
+    parser = argparse.ArgumentParser(
+        description="Manage the cache of built virtualenvs.")
+    parser.add_argument('action', choices=['upload'])
+    parser.add_argument('key')
+    parser.add_argument('--cache-dir', required=True)
+    parser.add_argument('--remote-cache', required=True)
+    args = parser.parse_args(argv)
+
+    cache = VenvCache(args.cache_dir, remote_url=args.remote_cache)
+    if cache.remote is None:
+        return 1
+    if args.action == 'upload':
+        cache.upload(args.key)
+    return 0
+#
+
+
+if __name__ == "__main__":
+    sys.exit(main())
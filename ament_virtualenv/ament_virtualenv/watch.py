@@ -0,0 +1,232 @@
+#
+# Copyright 2026 ament_virtualenv contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# \file      watch.py
+# \authors   ament_virtualenv contributors
+# \copyright Copyright (c) (2026), ament_virtualenv contributors
+#
+"""
+Keep workspace indexes up to date with inotify.
+
+Without a watcher, a cached WorkspaceIndex is revalidated with one stat()
+per directory of the workspace. A watcher instead subscribes to changes of
+every indexed directory, and re-indexes only the directories in which a
+package.xml, an exported requirements file or a *_IGNORE marker was added,
+removed or renamed. Only changes to directory listings matter for the index:
+edited manifests are only reported, their content is tracked by the manifest
+cache.
+"""
+from __future__ import print_function
+
+import copy
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+
+try:
+    from ament_virtualenv import workspace_index
+except ImportError:
+    try:
+        import workspace_index
+    except ImportError:
+        from . import workspace_index
+
+# From <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = os.O_CLOEXEC
+
+_ENTRY_MASK = IN_CLOSE_WRITE | IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO
+WATCH_MASK = _ENTRY_MASK | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+
+_EVENT_HEADER = struct.Struct('iIII')
+_LIBC = None
+
+
+def _libc():
+    global _LIBC
+    if _LIBC is None:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            raise OSError(errno.ENOSYS, "inotify is not available on this platform")
+        libc.inotify_add_watch.argtypes = [
+            ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        _LIBC = libc
+    return _LIBC
+
+
+def _check(result):
+    if result < 0:
+        error = ctypes.get_errno()
+        raise OSError(error, os.strerror(error))
+    return result
+
+
+class IndexWatcher(object):
+    """
+    Apply inotify events of a workspace to its WorkspaceIndex.
+
+    Raises OSError if inotify is not available or the watch limit
+    (fs.inotify.max_user_watches) is too low for the workspace, in which
+    case the index keeps being revalidated by stat()ing its directories.
+    """
+
+    def __init__(self, index):
+        self.index = index
+        self.fd = _check(_libc().inotify_init1(IN_NONBLOCK | IN_CLOEXEC))
+        # watch descriptor -> directory, and back
+        self._directories = {}
+        self._descriptors = {}
+        try:
+            for d in list(index.directories):
+                self._add_watch(os.path.normpath(os.path.join(index.workspace, d)))
+        except OSError:
+            self.close()
+            raise
+        # Catch up with changes made between building the index and watching it
+        if not index.is_valid():
+            self._refresh(index.workspace, True)
+        index.watched = True
+
+    def fileno(self):
+        return self.fd
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+            self.index.watched = False
+
+    def _add_watch(self, directory):
+        try:
+            wd = _check(_libc().inotify_add_watch(
+                self.fd, os.fsencode(directory), WATCH_MASK))
+        except OSError as e:
+            if e.errno in (errno.ENOENT, errno.ENOTDIR):
+                # Removed since it was indexed, there will be an event for that
+                return
+            raise
+        self._directories[wd] = directory
+        self._descriptors[directory] = wd
+
+    def _remove_watch(self, directory):
+        wd = self._descriptors.pop(directory, None)
+        if wd is not None:
+            self._directories.pop(wd, None)
+            # Fails harmlessly if the directory is already gone
+            _libc().inotify_rm_watch(self.fd, wd)
+
+    def _refresh(self, path, recursive):
+        removed, added = self.index.refresh(path, recursive)
+        for directory in removed:
+            if directory not in added:
+                self._remove_watch(directory)
+        for directory in added:
+            if directory not in self._descriptors:
+                self._add_watch(directory)
+
+    def read_events(self):
+        """Read the pending events as a list of (directory, mask, name) tuples."""
+        events = []
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return events
+            offset = 0
+            while offset < len(data):
+                wd, mask, cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size
+                name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+                offset += length
+                events.append((self._directories.get(wd), mask, name))
+
+    def process_events(self):
+        """
+        Update the index from the pending events.
+
+        Returns True if any package was added, removed, or changed its files
+        or its manifest.
+        """
+        events = self.read_events()
+        if not events:
+            return False
+        packages = copy.deepcopy(self.index.packages)
+
+        # Coalesce the events, so every affected directory is re-indexed only once
+        subtrees = set()
+        directories = set()
+        manifest_written = False
+        for directory, mask, name in events:
+            if mask & IN_Q_OVERFLOW:
+                # Events were lost, start over
+                subtrees = set([self.index.workspace])
+                break
+            if directory is None or mask & IN_IGNORED:
+                continue
+            if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                subtrees.add(directory)
+                continue
+            if name == workspace_index.PACKAGE_MANIFEST_FILENAME:
+                manifest_written = True
+            if mask & IN_CLOSE_WRITE:
+                # Only the content changed, the directory listing did not
+                continue
+            if name in workspace_index.IGNORE_MARKERS:
+                # Ignores or un-ignores everything below the directory
+                subtrees.add(directory)
+            elif mask & IN_ISDIR:
+                subtrees.add(os.path.join(directory, name))
+            directories.add(directory)
+
+        def covered(path, include_self):
+            return any(
+                path.startswith(parent + os.sep) or include_self and path == parent
+                for parent in subtrees)
+
+        for path in sorted(subtrees):
+            if not covered(path, False):
+                self._refresh(path, True)
+        for path in sorted(directories):
+            if not covered(path, True):
+                self._refresh(path, False)
+
+        if self.index.packages != packages:
+            workspace_index.forget_missing()
+            return True
+        return manifest_written
+
+
+def wait(watchers, timeout=None):
+    """Wait until any of the watchers has pending events, and return those watchers."""
+    if not watchers:
+        return []
+    ready, _, _ = select.select(watchers, [], [], timeout)
+    return ready
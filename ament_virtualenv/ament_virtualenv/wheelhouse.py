@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+#
+# Copyright 2026 ament_virtualenv contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# \file      wheelhouse.py
+# \authors   ament_virtualenv contributors
+# \copyright Copyright (c) (2026), ament_virtualenv contributors
+#
+"""
+Shared wheelhouse for the virtualenvs of a workspace.
+
+`pip wheel` downloads the wheels of the requirements, and builds wheels
+from source distributions, into a wheelhouse directory per interpreter
+ABI. Virtualenvs are then installed from the wheelhouse alone, with
+`pip install --no-index --find-links`, so every source distribution is
+built once, instead of once per virtualenv, and builds can run offline.
+"""
+from __future__ import print_function
+
+import argparse
+import contextlib
+import fcntl
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+
+try:
+    from ament_virtualenv.interpreter import find_python, interpreter_abi
+except ImportError:
+    try:
+        from interpreter import find_python, interpreter_abi
+    except ImportError:
+        from .interpreter import find_python, interpreter_abi
+
+WHEELHOUSE_ENV_KEY = 'AMENT_VIRTUALENV_WHEELHOUSE'
+OFFLINE_ENV_KEY = 'AMENT_VIRTUALENV_OFFLINE'
+
+LOCK_FILENAME = '.lock'
+
+hash_option_regex = re.compile(r'\s+--hash=\S+')
+
+
+def abi_dir(wheelhouse, abi):
+    """Get the directory of a wheelhouse for the interpreter with the given ABI."""
+    digest = hashlib.sha256(json.dumps(abi, sort_keys=True).encode('utf-8')).hexdigest()
+    name = '{}-{}-{}'.format(abi['cache_tag'], abi['machine'], digest[:12])
+    return os.path.join(os.path.abspath(wheelhouse), name)
+
+
+def find_links_args(wheelhouse):
+    """Install from the wheelhouse alone."""
+    return ['--no-index', '--find-links', wheelhouse]
+
+
+def wheel_args(wheelhouse, wheel_dir=None):
+    """Fill the wheelhouse, or wheel_dir for it, reusing the wheels in it already."""
+    return ['--wheel-dir', wheel_dir or wheelhouse, '--find-links', wheelhouse]
+
+
+@contextlib.contextmanager
+def filling(wheelhouse):
+    """
+    Lock a wheelhouse for filling, and yield the directory to put new wheels in.
+
+    Builds filling the same wheelhouse wait for each other. The new wheels
+    are moved into the wheelhouse once they are complete, so builds
+    installing from it meanwhile never see partially written ones.
+    """
+    os.makedirs(wheelhouse, exist_ok=True)
+    with open(os.path.join(wheelhouse, LOCK_FILENAME), 'a') as lock:
+        fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+        staging_dir = tempfile.mkdtemp(dir=wheelhouse, prefix='.tmp')
+        try:
+            yield staging_dir
+            for name in sorted(os.listdir(staging_dir)):
+                target = os.path.join(wheelhouse, name)
+                # pip wheel copies the wheels it found in the wheelhouse, too
+                if name.endswith('.whl') and not os.path.exists(target):
+                    os.replace(os.path.join(staging_dir, name), target)
+        finally:
+            shutil.rmtree(staging_dir)
+            fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+
+def strip_hashes(requirements_filename, output_filename):
+    """
+    Copy a requirements file without its --hash options.
+
+    Wheels built from source distributions do not match the hashes of the
+    distributions locked, so the hashes can only be verified when filling
+    the wheelhouse.
+    """
+    with open(requirements_filename, 'r') as f:
+        lines = [hash_option_regex.sub('', line) for line in f]
+    with open(output_filename, 'w') as f:
+        f.writelines(lines)
+
+
+def prefetch(python_executable, wheelhouse, requirements_filenames, extra_pip_args=[]):
+    """Fill the wheelhouse from requirements files, resolving each one separately."""
+    for requirements_filename in requirements_filenames:
+        with filling(wheelhouse) as wheel_dir:
+            command = [python_executable, '-m', 'pip', 'wheel'] + \
+                wheel_args(wheelhouse, wheel_dir) + \
+                [arg for arg in extra_pip_args if arg] + ['-r', requirements_filename]
+            print(' '.join(command))
+            subprocess.check_call(command)
+
+
+def main(argv=sys.argv[1:]):
+    parser = argparse.ArgumentParser(
+        description="Fill the wheelhouse from the combined requirements of a workspace."
+    )
+    parser.add_argument(
+        '--requirements',
+        nargs='+',
+        required=True,
+        help="Combined requirements files, e.g. build/*/generated_requirements.txt"
+    )
+    parser.add_argument(
+        '--wheelhouse',
+        default=os.environ.get(WHEELHOUSE_ENV_KEY),
+        required=WHEELHOUSE_ENV_KEY not in os.environ,
+        help="The wheelhouse to fill (default: ${}).".format(WHEELHOUSE_ENV_KEY)
+    )
+    parser.add_argument(
+        '--python-version',
+        required=True,
+        help="Build the wheels for the python executable of this version."
+    )
+    parser.add_argument(
+        '--extra-pip-args',
+        default="",
+        help="Extra arguments for pip wheel."
+    )
+    args = parser.parse_args(argv)
+
+    python_executable = find_python(args.python_version)
+    wheelhouse = abi_dir(args.wheelhouse, interpreter_abi(python_executable))
+    prefetch(python_executable, wheelhouse, args.requirements,
+             args.extra_pip_args.split(' '))
+    print('Filled wheelhouse {}'.format(wheelhouse))
+    return 0
+#
+
+
+if __name__ == "__main__":
+    sys.exit(main())
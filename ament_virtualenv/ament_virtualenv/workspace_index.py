@@ -0,0 +1,314 @@
+#
+# Copyright 2026 ament_virtualenv contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# \file      workspace_index.py
+# \authors   ament_virtualenv contributors
+# \copyright Copyright (c) (2026), ament_virtualenv contributors
+#
+from __future__ import print_function
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+from ament_index_python.packages import get_packages_with_prefixes
+
+PACKAGE_MANIFEST_FILENAME = 'package.xml'
+IGNORE_MARKERS = ('CATKIN_IGNORE', 'COLCON_IGNORE', 'AMENT_IGNORE')
+
+# Process-wide cache of loaded indexes, keyed by workspace path
+_INDEXES = {}
+_INDEXES_LOCK = threading.Lock()
+# Package name -> prefix, from the ament resource index
+_AMENT_PACKAGES = None
+_AMENT_PACKAGES_STATE = None
+# Negative-result cache of (name, workspaces) lookups that found no package
+_MISSING = set()
+
+
+class WorkspaceIndex(object):
+    """
+    Index of the packages found below a workspace.
+
+    The index is built in a single walk of the workspace and maps each
+    directory name containing a package.xml to the files in that directory.
+    Unlike the walk it replaces, other directories named after a package are
+    not matched, so files are only found in the package itself. The mtime
+    of every visited directory is recorded, so that the index can be
+    revalidated with one stat() per directory instead of another walk.
+    """
+
+    VERSION = 1
+
+    def __init__(self, workspace, packages=None, directories=None):
+        self.workspace = workspace
+        # name -> [[package directory, [file, ...]], ...] in walk order
+        self.packages = packages if packages is not None else {}
+        # directory (relative to the workspace) -> st_mtime_ns
+        self.directories = directories if directories is not None else {}
+        # Set while a watch.IndexWatcher keeps the index up to date
+        self.watched = False
+        # Whether the index was built by walking the workspace, rather than loaded
+        self.walked = False
+
+    @classmethod
+    def build(cls, workspace):
+        index = cls(workspace)
+        index._walk(workspace)
+        index.walked = True
+        return index
+
+    def _walk(self, top, recursive=True):
+        # Same traversal as the original find_in_workspaces search. Since the
+        # workspace may point to the distro root which will contain ignore files
+        # we need to ignore that directory i.e. d != workspace.
+        added = []
+        for d, dirs, files in os.walk(top, topdown=True, followlinks=True):
+            try:
+                mtime = os.stat(d).st_mtime_ns
+            except OSError:
+                continue
+            self.directories[os.path.relpath(d, self.workspace)] = mtime
+            added.append(d)
+            if not recursive:
+                del dirs[:]
+            ignored = any(marker in files for marker in IGNORE_MARKERS)
+            if ignored and d != self.workspace:
+                del dirs[:]
+                continue
+            if PACKAGE_MANIFEST_FILENAME in files:
+                self.packages.setdefault(os.path.basename(d), []).append(
+                    [d, sorted(files)])
+        return added
+
+    @classmethod
+    def load(cls, filename):
+        with open(filename, 'r') as f:
+            data = json.load(f)
+        if data.get('version') != cls.VERSION:
+            raise ValueError("Unsupported workspace index version in " + filename)
+        return cls(data['workspace'], data['packages'], data['directories'])
+
+    def save(self, filename):
+        data = {
+            'version': self.VERSION,
+            'workspace': self.workspace,
+            'packages': self.packages,
+            'directories': self.directories,
+        }
+        directory = os.path.dirname(filename)
+        os.makedirs(directory, exist_ok=True)
+        # Write to a temporary file first so concurrent readers never see a partial
+        # index
+        fd, tmp_filename = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp_filename, filename)
+        except BaseException:
+            os.unlink(tmp_filename)
+            raise
+
+    def is_valid(self):
+        """Check that no directory was added, removed or modified since indexing."""
+        for d, mtime in self.directories.items():
+            try:
+                if os.stat(os.path.join(self.workspace, d)).st_mtime_ns != mtime:
+                    return False
+            except OSError:
+                return False
+        return True
+
+    def refresh(self, path, recursive=True):
+        """
+        Re-index one directory of the workspace, or the whole subtree below it.
+
+        Used to apply filesystem change notifications (see the watch module)
+        without walking the rest of the workspace. Returns the lists of
+        directories that were dropped from and (re-)added to the index.
+        """
+        path = os.path.normpath(os.path.join(self.workspace, path))
+        relpath = os.path.relpath(path, self.workspace)
+
+        def affected(d):
+            if not recursive:
+                return d == relpath
+            if relpath == os.curdir or d == relpath:
+                return True
+            return d.startswith(relpath + os.sep)
+
+        removed = [d for d in self.directories if affected(d)]
+        for d in removed:
+            del self.directories[d]
+        removed = set(
+            os.path.normpath(os.path.join(self.workspace, d)) for d in removed)
+        for name in list(self.packages):
+            entries = [
+                entry for entry in self.packages[name] if entry[0] not in removed]
+            if entries:
+                self.packages[name] = entries
+            else:
+                del self.packages[name]
+
+        added = []
+        if self._is_indexed(path):
+            added = self._walk(path, recursive)
+        return sorted(removed), added
+
+    def _is_indexed(self, path):
+        # A directory belongs in the index if its parent was indexed and is not ignored
+        if path == self.workspace:
+            return True
+        parent = os.path.dirname(path)
+        if os.path.relpath(parent, self.workspace) not in self.directories:
+            return False
+        return parent == self.workspace or not any(
+            os.path.exists(os.path.join(parent, marker)) for marker in IGNORE_MARKERS)
+
+    def find(self, project, file):
+        for package_dir, files in self.packages.get(project, []):
+            if file in files:
+                return os.path.join(package_dir, file)
+        return None
+
+
+def index_filename(cache_dir, workspace):
+    digest = hashlib.sha1(workspace.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(cache_dir, 'workspace_index', digest + '.json')
+
+
+def get_workspace_index(workspace, cache_dir=None):
+    """
+    Get the index of a workspace, building it if needed.
+
+    Indexes are kept in memory for the lifetime of the process. If a
+    cache_dir is given they are also persisted there, and reused by later
+    processes for as long as the recorded directory mtimes still match.
+    """
+    index = _INDEXES.get(workspace)
+    if index is not None:
+        return index
+
+    with _INDEXES_LOCK:
+        # Another thread may have built the index while we were waiting
+        index = _INDEXES.get(workspace)
+        if index is None:
+            index = _load_or_build_index(workspace, cache_dir)
+            _INDEXES[workspace] = index
+    return index
+
+
+def is_loaded(workspace):
+    """Check whether the index of a workspace is already in memory."""
+    return workspace in _INDEXES
+
+
+def _load_or_build_index(workspace, cache_dir):
+    index = None
+    filename = index_filename(cache_dir, workspace) if cache_dir else None
+    if filename and os.path.exists(filename):
+        try:
+            index = WorkspaceIndex.load(filename)
+        except (OSError, ValueError, KeyError):
+            index = None
+        if index is not None and (index.workspace != workspace or not index.is_valid()):
+            index = None
+
+    if index is None:
+        index = WorkspaceIndex.build(workspace)
+        if filename:
+            try:
+                index.save(filename)
+            except OSError:
+                # The index is only an optimization, never fail the build because of it
+                pass
+    return index
+
+
+def get_ament_packages():
+    """
+    Get all packages registered in the ament resource index.
+
+    The 'packages' resource marker files are listed once per prefix in
+    AMENT_PREFIX_PATH, after which membership checks are dictionary lookups.
+    """
+    global _AMENT_PACKAGES, _AMENT_PACKAGES_STATE
+    if _AMENT_PACKAGES is None:
+        _AMENT_PACKAGES_STATE = _ament_resource_index_state()
+        _AMENT_PACKAGES = get_packages_with_prefixes()
+    return _AMENT_PACKAGES
+
+
+def _ament_resource_index_state():
+    prefix_path = os.environ.get('AMENT_PREFIX_PATH', '')
+    mtimes = []
+    for prefix in prefix_path.split(os.pathsep):
+        marker_dir = os.path.join(
+            prefix, 'share', 'ament_index', 'resource_index', 'packages')
+        try:
+            mtimes.append(os.stat(marker_dir).st_mtime_ns)
+        except OSError:
+            mtimes.append(None)
+    return prefix_path, tuple(mtimes)
+
+
+def revalidate():
+    """
+    Drop cached lookups that have gone out of date.
+
+    Short-lived processes never need this, but long-running ones (see the
+    daemon module) call it before serving a request, since packages get
+    installed and source trees get edited in the meantime.
+    """
+    global _AMENT_PACKAGES
+    stale = False
+    if _AMENT_PACKAGES is not None and \
+            _ament_resource_index_state() != _AMENT_PACKAGES_STATE:
+        _AMENT_PACKAGES = None
+        stale = True
+    with _INDEXES_LOCK:
+        for workspace, index in list(_INDEXES.items()):
+            if not index.watched and not index.is_valid():
+                del _INDEXES[workspace]
+                stale = True
+    if stale:
+        _MISSING.clear()
+
+
+def forget_missing():
+    """Forget the packages that were not found, e.g. after packages were added."""
+    _MISSING.clear()
+
+
+def is_known_package(name, workspaces, cache_dir=None):
+    """
+    Check whether a name refers to an ament package or a package in the workspaces.
+
+    Dependencies that are rosdep keys (e.g. python3-numpy) are rejected
+    without touching the filesystem once the indexes have been loaded.
+    """
+    key = (name, tuple(workspaces))
+    if key in _MISSING:
+        return False
+    if name in get_ament_packages():
+        return True
+    for workspace in workspaces:
+        if name in get_workspace_index(workspace, cache_dir).packages:
+            return True
+    _MISSING.add(key)
+    return False
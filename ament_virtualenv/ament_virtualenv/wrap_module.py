@@ -61,7 +61,7 @@ def main(argv=sys.argv[1:]):
     parser = argparse.ArgumentParser()
     parser.add_argument('--module-path', required=True)
     parser.add_argument('--venv-install-dir', required=True)
-    args, unknown = parser.parse_known_args()
+    args, unknown = parser.parse_known_args(argv)
     return wrap_module(
         bin_path=args.module_path,
         venv_install_dir=args.venv_install_dir
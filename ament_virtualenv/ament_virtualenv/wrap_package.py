@@ -67,7 +67,7 @@ def main(argv=sys.argv[1:]):
     parser = argparse.ArgumentParser()
     parser.add_argument('--package-dir', required=True)
     parser.add_argument('--venv-install-dir', required=True)
-    args, unknown = parser.parse_known_args()
+    args, unknown = parser.parse_known_args(argv)
     return wrap_package(
         bin_dir=args.package_dir,
         venv_install_dir=args.venv_install_dir
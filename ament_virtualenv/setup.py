@@ -30,12 +30,15 @@ setup(
     tests_require=['pytest'],
     entry_points={
         'console_scripts': [
+            'ament_virtualenv_cache_server = ament_virtualenv.cache_server:main',
+            'ament_virtualenv_daemon = ament_virtualenv.daemon:main',
             'build_venv = ament_virtualenv.build_venv:main',
-            'combine_requirements = ament_virtualenv.combine_requirements:main',
-            'glob_requirements = ament_virtualenv.glob_requirements:main',
+            'combine_requirements = ament_virtualenv.client:combine_requirements',
+            'glob_requirements = ament_virtualenv.client:glob_requirements',
             'install_venv = ament_virtualenv.install:main',
-            'wrap_module = ament_virtualenv.wrap_module:main',
-            'wrap_package = ament_virtualenv.wrap_package:main',
+            'prefetch_wheels = ament_virtualenv.wheelhouse:main',
+            'wrap_module = ament_virtualenv.client:wrap_module',
+            'wrap_package = ament_virtualenv.client:wrap_package',
         ],
     },
 )
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+#
+# Copyright 2026 ament_virtualenv contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# \file      benchmark_combine_requirements.py
+# \authors   ament_virtualenv contributors
+# \copyright Copyright (c) (2026), ament_virtualenv contributors
+#
+"""
+Benchmark combine_requirements with and without the parsed-requirement cache.
+
+Generates a workspace in which every package combines a large common
+requirements file, a few shared ones and its own, as a colcon build does,
+then times combining the requirements of all packages:
+
+  uncached  every package parses every file, as before the cache
+  disk      every package runs in a fresh process, sharing the on-disk cache
+  memory    all packages run in one process, e.g. the ament_virtualenv daemon
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from ament_virtualenv import combine_requirements
+
+SHARED_FILES = 4
+
+
+def generate_workspace(root, packages, common_size):
+    common = os.path.join(root, 'common_requirements.txt')
+    with open(common, 'w') as f:
+        for i in range(common_size):
+            f.write(
+                'common-{0}>={0}.0,<{1}.0 ; python_version >= "3"  # pinned\n'.format(
+                    i, i + 1))
+    shared = []
+    for i in range(SHARED_FILES):
+        shared.append(os.path.join(root, 'shared_{}.txt'.format(i)))
+        with open(shared[-1], 'w') as f:
+            f.write(''.join(
+                'shared-{}-{}[extra]~=1.{}\n'.format(i, j, j) for j in range(20)))
+    package_files = []
+    for i in range(packages):
+        package_files.append(os.path.join(root, 'package_{}.txt'.format(i)))
+        with open(package_files[-1], 'w') as f:
+            f.write('own-{}==1.0\ncommon-0>=0.5\n'.format(i))
+    return [
+        [common] + shared[:1 + i % SHARED_FILES] + [package_file]
+        for i, package_file in enumerate(package_files)
+    ]
+
+
+def reset_caches():
+    combine_requirements._PARSED_FILES.clear()
+    combine_requirements.parse_requirement.cache_clear()
+    combine_requirements._specifier_set.cache_clear()
+    combine_requirements._marker.cache_clear()
+
+
+def combine(requirements_lists, output_dir, cache_dir, fresh_process):
+    start = time.perf_counter()
+    for i, requirements_list in enumerate(requirements_lists):
+        if fresh_process:
+            reset_caches()
+        files = [open(filename, 'r') for filename in requirements_list]
+        try:
+            combine_requirements.combine_requirements(
+                files, os.path.join(output_dir, 'generated_{}.txt'.format(i)),
+                cache_dir=cache_dir)
+        finally:
+            for f in files:
+                f.close()
+    return time.perf_counter() - start
+
+
+def main(argv=sys.argv[1:]):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--packages', type=int, nargs='+', default=[10, 50, 100, 200])
+    parser.add_argument('--common-size', type=int, default=300)
+    args = parser.parse_args(argv)
+
+    root = tempfile.mkdtemp(prefix='ament_virtualenv_benchmark_')
+    try:
+        print('{:>8} {:>12} {:>12} {:>12}   (ms per package)'.format(
+            'packages', 'uncached', 'disk', 'memory'))
+        for packages in args.packages:
+            workspace = os.path.join(root, str(packages))
+            os.makedirs(workspace)
+            requirements_lists = generate_workspace(
+                workspace, packages, args.common_size)
+
+            reset_caches()
+            uncached = combine(requirements_lists, workspace, None, True)
+            cache_dir = os.path.join(workspace, 'cache')
+            reset_caches()
+            disk = combine(requirements_lists, workspace, cache_dir, True)
+            reset_caches()
+            memory = combine(requirements_lists, workspace, None, False)
+            print('{:>8} {:>12.2f} {:>12.2f} {:>12.2f}'.format(
+                packages, 1e3 * uncached / packages, 1e3 * disk / packages,
+                1e3 * memory / packages))
+    finally:
+        shutil.rmtree(root)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+#
+# Copyright 2026 ament_virtualenv contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# \file      benchmark_glob_requirements.py
+# \authors   ament_virtualenv contributors
+# \copyright Copyright (c) (2026), ament_virtualenv contributors
+#
+"""
+Benchmark sequential against parallel glob_requirements traversal.
+
+Generates a synthetic workspace of `depth` layers of `width` packages, where
+every package depends on a few packages of the next layer and on some
+non-ament (rosdep) keys, then times glob_requirements for the root package.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from ament_virtualenv import glob_requirements, manifest, workspace_index
+
+PACKAGE_XML = """<?xml version="1.0"?>
+<package format="3">
+  <name>{name}</name>
+  <version>0.0.0</version>
+  <description>Generated for benchmarking</description>
+  <maintainer email="nobody@example.com">nobody</maintainer>
+  <license>GPL</license>
+{depends}
+  <export>
+    <pip_requirements>requirements.txt</pip_requirements>
+  </export>
+</package>
+"""
+
+
+def package_name(layer, index):
+    return 'pkg_{}_{}'.format(layer, index)
+
+
+def generate_workspace(root, depth, width, fanout):
+    for layer in range(depth):
+        for index in range(width):
+            name = package_name(layer, index)
+            depends = ['  <build_depend>python3-dep-{}</build_depend>'.format(index)]
+            if layer + 1 < depth:
+                depends += [
+                    '  <depend>{}</depend>'.format(
+                        package_name(layer + 1, (index + i) % width))
+                    for i in range(fanout)
+                ]
+            package_dir = os.path.join(root, name)
+            os.makedirs(package_dir)
+            with open(os.path.join(package_dir, 'package.xml'), 'w') as f:
+                f.write(PACKAGE_XML.format(name=name, depends='\n'.join(depends)))
+            with open(os.path.join(package_dir, 'requirements.txt'), 'w') as f:
+                f.write('requests\n')
+    # The root depends on every package of the first layer
+    os.makedirs(os.path.join(root, 'root'))
+    with open(os.path.join(root, 'root', 'package.xml'), 'w') as f:
+        f.write(PACKAGE_XML.format(name='root', depends='\n'.join(
+            '  <depend>{}</depend>'.format(package_name(0, i)) for i in range(width))))
+    with open(os.path.join(root, 'root', 'requirements.txt'), 'w') as f:
+        f.write('requests\n')
+
+
+def reset_caches():
+    workspace_index._INDEXES.clear()
+    workspace_index._MISSING.clear()
+    workspace_index._AMENT_PACKAGES = None
+    manifest._MANIFESTS.clear()
+
+
+def run(source_dir, jobs, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        reset_caches()
+        start = time.perf_counter()
+        result = glob_requirements.glob_requirements(
+            package_name='root', source_dir=source_dir, no_deps=False, jobs=jobs)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main(argv=sys.argv[1:]):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--depth', type=int, default=20)
+    parser.add_argument('--width', type=int, default=20)
+    parser.add_argument('--fanout', type=int, default=3)
+    parser.add_argument('--jobs', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    root = tempfile.mkdtemp(prefix='ament_virtualenv_benchmark_')
+    try:
+        generate_workspace(root, args.depth, args.width, args.fanout)
+        print('{} packages, depth {}, fanout {}'.format(
+            args.depth * args.width + 1, args.depth, args.fanout))
+        baseline_time, baseline = run(root, 1, args.repeat)
+        for jobs in args.jobs:
+            elapsed, result = run(root, jobs, args.repeat)
+            if result != baseline:
+                print('jobs={}: output differs from sequential traversal'.format(jobs))
+                return 1
+            print('jobs={:<3} {:8.3f}s  speedup {:.2f}x'.format(
+                jobs, elapsed, baseline_time / elapsed))
+    finally:
+        shutil.rmtree(root)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+#
+# Copyright 2026 ament_virtualenv contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# \file      benchmark_manifest_reader.py
+# \authors   ament_virtualenv contributors
+# \copyright Copyright (c) (2026), ament_virtualenv contributors
+#
+"""
+Benchmark the streaming manifest reader against parse_package.
+
+The corpus defaults to every package.xml installed in AMENT_PREFIX_PATH
+plus the ones in this repository; other files or directories can be
+passed on the command line.
+"""
+import argparse
+import os
+import sys
+import time
+
+from ament_virtualenv.manifest import manifest_from_package, parse_manifest_string
+from ament_virtualenv.package import InvalidPackage, parse_package_string
+
+
+def find_manifests(paths):
+    manifests = []
+    for path in paths:
+        if os.path.isfile(path):
+            manifests.append(path)
+            continue
+        for root, dirs, files in os.walk(path):
+            if 'package.xml' in files:
+                manifests.append(os.path.join(root, 'package.xml'))
+    return manifests
+
+
+def default_paths():
+    paths = [os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..')]
+    for prefix in os.environ.get('AMENT_PREFIX_PATH', '').split(os.pathsep):
+        if prefix:
+            paths.append(os.path.join(prefix, 'share'))
+    return paths
+
+
+def load_corpus(paths):
+    corpus = []
+    for filename in find_manifests(paths):
+        with open(filename, 'rb') as f:
+            data = f.read()
+        try:
+            parse_package_string(data.decode('utf-8'), filename, warnings=[])
+        except (InvalidPackage, AssertionError, ValueError):
+            # Only compare against manifests that parse_package accepts
+            continue
+        corpus.append((filename, data))
+    return corpus
+
+
+def time_reader(corpus, parse, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for filename, data in corpus:
+            parse(data, filename)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(argv=sys.argv[1:]):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('paths', nargs='*', help="package.xml files or directories")
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    corpus = load_corpus(args.paths or default_paths())
+    if not corpus:
+        print('No package.xml files found')
+        return 1
+
+    def parse_dom(data, filename):
+        return manifest_from_package(
+            parse_package_string(data.decode('utf-8'), filename, warnings=[]))
+
+    for filename, data in corpus:
+        if parse_dom(data, filename) != parse_manifest_string(data, filename):
+            print('{}: readers disagree'.format(filename))
+            return 1
+
+    dom_time = time_reader(corpus, parse_dom, args.repeat)
+    expat_time = time_reader(corpus, parse_manifest_string, args.repeat)
+    print('{} manifests'.format(len(corpus)))
+    print('parse_package          {:8.2f} us/manifest'.format(
+        1e6 * dom_time / len(corpus)))
+    print('parse_manifest_string  {:8.2f} us/manifest  speedup {:.1f}x'.format(
+        1e6 * expat_time / len(corpus), dom_time / expat_time))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
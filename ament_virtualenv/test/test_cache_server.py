@@ -0,0 +1,173 @@
+#
+# Copyright 2026 ament_virtualenv contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# \file      test_cache_server.py
+# \authors   ament_virtualenv contributors
+# \copyright Copyright (c) (2026), ament_virtualenv contributors
+#
+import http.client
+import io
+import json
+import os
+import tarfile
+import threading
+
+from ament_virtualenv.cache_server import CacheServer
+from ament_virtualenv.venv_cache import (
+    ENTRY_FILENAME, VENV_DIRNAME, RemoteCache, VenvCache)
+import pytest
+
+PYTHON = '/usr/bin/python3'
+
+
+@pytest.fixture
+def server(tmp_path):
+    server = CacheServer(('127.0.0.1', 0), str(tmp_path / 'server'), quiet=True)
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,))
+    thread.start()
+    yield server
+    server.shutdown()
+    thread.join()
+    server.server_close()
+
+
+@pytest.fixture
+def url(server):
+    return 'http://{}:{}'.format(*server.server_address[:2])
+
+
+def request(server, method, path, body=None):
+    connection = http.client.HTTPConnection(*server.server_address[:2], timeout=10)
+    try:
+        connection.request(method, path, body=body)
+        response = connection.getresponse()
+        return response.status, response.read()
+    finally:
+        connection.close()
+
+
+def test_put_get(tmp_path, server, url):
+    remote = RemoteCache(url)
+    artifact = tmp_path / 'artifact.tar.gz'
+    artifact.write_bytes(b'artifact')
+    downloaded = tmp_path / 'downloaded.tar.gz'
+
+    assert not remote.download('key', str(downloaded))
+    remote.upload('key', str(artifact))
+    assert remote.download('key', str(downloaded))
+
+    assert downloaded.read_bytes() == b'artifact'
+    assert (tmp_path / 'server' / 'venvs' / 'key.tar.gz').read_bytes() == b'artifact'
+    assert request(server, 'HEAD', '/venvs/key.tar.gz')[0] == 200
+
+
+@pytest.mark.parametrize('path', ['/', '/venvs/../escape', '/venvs//key', '/./key'])
+def test_invalid_paths(tmp_path, server, path):
+    assert request(server, 'PUT', path, b'escaped')[0] == 400
+    assert request(server, 'GET', path)[0] == 404
+    assert not (tmp_path / 'escape').exists()
+
+
+def test_fetch_remote(tmp_path, url):
+    root_dir = tmp_path / 'build' / 'venv'
+    (root_dir / 'bin').mkdir(parents=True)
+    (root_dir / 'bin' / 'foo').write_text('#!{}/bin/python\n'.format(root_dir))
+    os.symlink(PYTHON, str(root_dir / 'bin' / 'python3'))
+    os.symlink('python3', str(root_dir / 'bin' / 'python'))
+    # Stored without a remote cache, to upload synchronously
+    VenvCache(str(tmp_path / 'cache')).store('key', str(root_dir))
+    VenvCache(str(tmp_path / 'cache'), remote_url=url).upload('key')
+
+    other_cache = VenvCache(str(tmp_path / 'other_cache'), remote_url=url)
+    assert other_cache.fetch_remote('key', '/opt/python/bin/python3')
+
+    venv_dir = os.path.join(other_cache.entry_dir('key'), VENV_DIRNAME)
+    with open(os.path.join(venv_dir, 'bin', 'foo'), 'r') as f:
+        assert f.read() == '#!{}/bin/python\n'.format(root_dir)
+    # The interpreter links are recreated to the local interpreter
+    assert os.readlink(os.path.join(venv_dir, 'bin', 'python3')) == \
+        '/opt/python/bin/python3'
+    assert os.readlink(os.path.join(venv_dir, 'bin', 'python')) == 'python3'
+    assert not other_cache.fetch_remote('missing', PYTHON)
+
+
+def add_member(tar, name, content=b'', **attributes):
+    info = tarfile.TarInfo(name)
+    info.size = len(content)
+    for attribute, value in attributes.items():
+        setattr(info, attribute, value)
+    tar.addfile(info, io.BytesIO(content))
+
+
+@pytest.mark.parametrize('member', [
+    {'name': '../escape'},
+    {'name': 'venv/../../escape'},
+    {'name': 'venv/bin/python', 'type': tarfile.SYMTYPE, 'linkname': '/etc/passwd'},
+    {'name': 'venv/bin/python', 'type': tarfile.SYMTYPE,
+     'linkname': '../../../escape'},
+    {'name': 'venv/passwd', 'type': tarfile.LNKTYPE, 'linkname': '/etc/passwd'},
+    {'name': 'venv/null', 'type': tarfile.CHRTYPE, 'devmajor': 1, 'devminor': 3},
+])
+def test_fetch_remote_rejects_members(tmp_path, url, member):
+    archive = tmp_path / 'entry.tar.gz'
+    with tarfile.open(str(archive), 'w:gz') as tar:
+        add_member(tar, ENTRY_FILENAME, json.dumps({
+            'root_dir': '/build/venv', 'relocate': [], 'interpreter_links': [],
+            'size': 0, 'created': 0,
+        }).encode('utf-8'))
+        add_member(tar, **member)
+    RemoteCache(url).upload('key', str(archive))
+
+    cache = VenvCache(str(tmp_path / 'cache'), remote_url=url)
+    assert not cache.fetch_remote('key', PYTHON)
+
+    assert not os.path.exists(cache.entry_dir('key'))
+    assert not any(path.name == 'escape' for path in tmp_path.rglob('*'))
+
+
+def test_fetch_remote_absolute_member(tmp_path, url):
+    escape = tmp_path / 'escape'
+    archive = tmp_path / 'entry.tar.gz'
+    with tarfile.open(str(archive), 'w:gz') as tar:
+        add_member(tar, ENTRY_FILENAME, json.dumps({
+            'root_dir': '/build/venv', 'relocate': [], 'interpreter_links': [],
+            'size': 0, 'created': 0,
+        }).encode('utf-8'))
+        add_member(tar, str(escape), b'escaped')
+    RemoteCache(url).upload('key', str(archive))
+
+    cache = VenvCache(str(tmp_path / 'cache'), remote_url=url)
+    cache.fetch_remote('key', PYTHON)
+
+    # Extracted into the entry, if at all
+    assert not escape.exists()
+    assert all(str(path).startswith(cache.entries_dir) for path in tmp_path.rglob('*')
+               if path.name == 'escape')
+
+
+def test_fetch_remote_rejects_interpreter_links(tmp_path, url):
+    archive = tmp_path / 'entry.tar.gz'
+    with tarfile.open(str(archive), 'w:gz') as tar:
+        add_member(tar, ENTRY_FILENAME, json.dumps({
+            'root_dir': '/build/venv', 'relocate': [],
+            'interpreter_links': ['../escape'], 'size': 0, 'created': 0,
+        }).encode('utf-8'))
+        add_member(tar, 'venv/bin', type=tarfile.DIRTYPE, mode=0o755)
+    RemoteCache(url).upload('key', str(archive))
+
+    cache = VenvCache(str(tmp_path / 'cache'), remote_url=url)
+    assert not cache.fetch_remote('key', PYTHON)
+    assert not os.path.exists(cache.entry_dir('key'))
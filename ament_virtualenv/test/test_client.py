@@ -0,0 +1,92 @@
+#
+# Copyright 2026 ament_virtualenv contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# \file      test_client.py
+# \authors   ament_virtualenv contributors
+# \copyright Copyright (c) (2026), ament_virtualenv contributors
+#
+import socket
+import sys
+
+from ament_virtualenv import client, daemon
+import pytest
+
+
+def stale_socket(path):
+    # Left behind by a daemon which did not shut down cleanly
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.bind(path)
+
+
+@pytest.mark.parametrize('make_socket', [None, stale_socket])
+@pytest.mark.parametrize('requirements, returncode, lines', [
+    ('foo>=1\nbar\n', 0, ['bar', 'foo>=1']),
+    # Conflicting requirements fail
+    ('foo>=2\nfoo<1\n', 1, None),
+])
+def test_runs_in_process_without_daemon(
+        tmp_path, monkeypatch, make_socket, requirements, returncode, lines):
+    socket_path = str(tmp_path / 'daemon.sock')
+    if make_socket is not None:
+        make_socket(socket_path)
+    monkeypatch.setenv(daemon.SOCKET_ENV_KEY, socket_path)
+    monkeypatch.delenv(daemon.DISABLE_ENV_KEY, raising=False)
+    (tmp_path / 'requirements.txt').write_text(requirements)
+    output = tmp_path / 'combined.txt'
+    monkeypatch.setattr(sys, 'argv', [
+        'combine_requirements',
+        '--requirements-list', str(tmp_path / 'requirements.txt'),
+        '--output-file', str(output),
+    ])
+
+    assert daemon.run_command('combine_requirements', sys.argv[1:]) is None
+    assert client.combine_requirements() == returncode
+
+    if lines is None:
+        assert not output.exists()
+    else:
+        assert [line.split(' #')[0] for line in output.read_text().splitlines()[1:]] \
+            == lines
+
+
+def test_forwards_to_daemon(monkeypatch):
+    calls = []
+
+    def run_command(command, argv):
+        calls.append((command, argv))
+        return 3
+
+    monkeypatch.setattr(daemon, 'run_command', run_command)
+    monkeypatch.setattr(sys, 'argv', ['wrap_module', '--help'])
+
+    assert client.wrap_module() == 3
+    assert calls == [('wrap_module', ['--help'])]
+
+
+def test_watch_mode_runs_in_process(monkeypatch):
+    monkeypatch.setattr(daemon, 'run_command', lambda command, argv: pytest.fail(
+        "{} was forwarded to the daemon".format(command)))
+    monkeypatch.setattr(daemon, 'COMMANDS', dict(
+        daemon.COMMANDS, glob_requirements=__name__))
+    monkeypatch.setattr(sys, 'argv', ['glob_requirements', '--watch'])
+
+    assert client.glob_requirements() == 5
+
+
+# Stands in for glob_requirements, which needs a workspace to watch
+def main(argv):
+    assert argv == ['--watch']
+    return 5
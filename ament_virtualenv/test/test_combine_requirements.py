@@ -0,0 +1,275 @@
+#
+# Copyright 2026 ament_virtualenv contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# \file      test_combine_requirements.py
+# \authors   ament_virtualenv contributors
+# \copyright Copyright (c) (2026), ament_virtualenv contributors
+#
+import json
+import os
+
+from ament_virtualenv import combine_requirements as combine_requirements_module
+from ament_virtualenv.combine_requirements import (
+    SuppressedRequirement, _dump_requirement, _load_requirement, combine_requirements,
+    is_satisfiable, load_requirements_file, merge_requirements, parse_requirement,
+    write_requirements)
+from packaging.markers import default_environment
+from packaging.specifiers import SpecifierSet
+import pytest
+
+# A python 3.10 interpreter on linux
+ENVIRONMENT = dict(
+    default_environment(), python_version='3.10', python_full_version='3.10.12',
+    sys_platform='linux')
+
+
+def requirements(*entries):
+    return [
+        SuppressedRequirement(requirement=parse_requirement(requirement), source=source)
+        for requirement, source in entries
+    ]
+
+
+def test_merge_single_requirement():
+    entry, conflict = merge_requirements(requirements(('foo>=1', 'a.txt')), ENVIRONMENT)
+    assert str(entry.requirement) == 'foo>=1'
+    assert entry.source == 'a.txt'
+    assert not entry.suppressed_set
+    assert not conflict
+
+
+def test_merge_specifiers():
+    entry, conflict = merge_requirements(
+        requirements(('foo>=1', 'a.txt'), ('foo<3', 'b.txt'), ('foo!=2.1', 'a.txt')),
+        ENVIRONMENT)
+    assert entry.requirement.specifier == SpecifierSet('>=1,<3,!=2.1')
+    assert entry.source == 'a.txt, b.txt'
+    assert not entry.suppressed_set
+    assert not conflict
+
+
+def test_merge_extras():
+    entry, conflict = merge_requirements(
+        requirements(('foo[x]', 'a.txt'), ('foo[y,z]>=1', 'b.txt')), ENVIRONMENT)
+    assert entry.requirement.extras == {'x', 'y', 'z'}
+    assert entry.requirement.specifier == SpecifierSet('>=1')
+    assert not conflict
+
+
+def test_merge_unsatisfiable():
+    merged = requirements(('foo>=2', 'a.txt'), ('foo<1', 'b.txt'))
+    entry, conflict = merge_requirements(merged, ENVIRONMENT)
+    assert conflict
+    assert str(entry.requirement) == 'foo>=2'
+
+
+@pytest.mark.parametrize('specifier, satisfiable', [
+    ('', True),
+    ('>=1,<3', True),
+    ('>=1,<=1', True),
+    ('>1,<=1', False),
+    ('>=2,<1', False),
+    ('==1.0,!=1.0', False),
+    ('==1.0,>=1', True),
+    ('==1.0,==2.0', False),
+    ('==1.*,>=2', False),
+    ('~=1.4,>=1.5', True),
+    ('~=1.4,>=2', False),
+])
+def test_is_satisfiable(specifier, satisfiable):
+    assert is_satisfiable(SpecifierSet(specifier)) is satisfiable
+
+
+def test_merge_suppresses_inapplicable_markers():
+    merged = requirements(
+        ('foo<1; python_version < "3"', 'a.txt'), ('foo>=2', 'b.txt'))
+    entry, conflict = merge_requirements(merged, ENVIRONMENT)
+    # The requirement for python 2 does not conflict with the one for python 3
+    assert not conflict
+    assert str(entry.requirement) == 'foo>=2'
+    assert entry.source == 'b.txt'
+    assert entry.suppressed_set == {merged[0]}
+    assert not entry.skipped_set
+
+
+def test_merge_skips_inapplicable_markers():
+    merged = requirements(
+        ('foo<1; python_version < "3"', 'a.txt'), ('foo>=2', 'b.txt'))
+    entry, conflict = merge_requirements(merged, ENVIRONMENT, skip_inapplicable=True)
+    assert not conflict
+    assert str(entry.requirement) == 'foo>=2'
+    assert not entry.suppressed_set
+    assert entry.skipped_set == {merged[0]}
+
+
+def test_merge_skips_all_inapplicable():
+    merged = requirements(('foo; sys_platform == "win32"', 'a.txt'))
+    entry, conflict = merge_requirements(merged, ENVIRONMENT, skip_inapplicable=True)
+    assert entry.requirement is None
+    assert entry.skipped_set == set(merged)
+    assert not conflict
+
+
+def test_merge_drops_differing_markers():
+    entry, _ = merge_requirements(
+        requirements(('foo>=1; python_version >= "3"', 'a.txt'),
+                     ('foo<3; sys_platform == "linux"', 'b.txt')),
+        ENVIRONMENT)
+    # Both apply, so the merged requirement does too
+    assert entry.requirement.marker is None
+    assert entry.requirement.specifier == SpecifierSet('>=1,<3')
+
+
+def test_merge_vcs_first_wins():
+    merged = requirements(
+        ('git+https://github.com/org/foo@main#egg=foo', 'a.txt'), ('foo>=1', 'b.txt'))
+    entry, conflict = merge_requirements(merged, ENVIRONMENT)
+    assert entry.requirement is merged[0].requirement
+    assert entry.suppressed_set == {merged[1]}
+    assert not conflict
+
+
+def test_combine_requirements_fails_on_conflict(tmp_path, capsys):
+    a = tmp_path / 'a.txt'
+    a.write_text('foo>=2\nbar\n')
+    b = tmp_path / 'b.txt'
+    b.write_text('foo<1\n')
+    output = tmp_path / 'combined.txt'
+    with open(str(a)) as fa, open(str(b)) as fb:
+        assert combine_requirements([fa, fb], str(output)) == 1
+    assert not output.exists()
+    assert 'foo>=2 from {}, foo<1 from {}'.format(a, b) in capsys.readouterr().err
+
+
+def test_combine_requirements_merges(tmp_path):
+    a = tmp_path / 'a.txt'
+    a.write_text('foo>=1\nbar\n')
+    b = tmp_path / 'b.txt'
+    b.write_text('foo<3\n')
+    output = tmp_path / 'combined.txt'
+    with open(str(a)) as fa, open(str(b)) as fb:
+        assert combine_requirements([fa, fb], str(output)) == 0
+    lines = output.read_text().splitlines()[1:]
+    assert lines == [
+        'bar # from {}'.format(a),
+        'foo<3,>=1 # from {}, {}'.format(a, b),
+    ]
+
+
+@pytest.mark.parametrize('line', [
+    'foo',
+    'Foo_Bar[b,a]>=1.0,!=1.5.*,<2',
+    'foo==1.0; python_version < "3.8"',
+    'foo; sys_platform == "win32" or extra == "test"',
+    'foo @ https://example.com/foo-1.0.tar.gz ; python_version >= "3"',
+    'git+https://github.com/example/foo.git@v1.0#egg=foo',
+])
+def test_cached_requirement_round_trip(line):
+    requirement = parse_requirement(line)
+
+    loaded = _load_requirement(json.loads(json.dumps(_dump_requirement(requirement))))
+
+    assert type(loaded) is type(requirement)
+    assert str(loaded) == str(requirement)
+    if getattr(requirement, 'marker', None) is not None:
+        for environment in (ENVIRONMENT, dict(ENVIRONMENT, python_version='3.6'),
+                            dict(ENVIRONMENT, sys_platform='win32')):
+            environment = dict(environment, extra='')
+            assert loaded.marker.evaluate(environment) == \
+                requirement.marker.evaluate(environment)
+
+
+def test_load_requirements_file_from_disk_cache(tmp_path, monkeypatch):
+    requirements_file = tmp_path / 'requirements.txt'
+    requirements_file.write_text(
+        'foo[extra]>=1 ; python_version >= "3"  # pinned\n-c constraints.txt\n')
+    with open(str(requirements_file)) as f:
+        parsed = load_requirements_file(f, str(tmp_path / 'cache'))
+    # As in a new process
+    monkeypatch.setattr(combine_requirements_module, '_PARSED_FILES', {})
+
+    with open(str(requirements_file)) as f:
+        cached = load_requirements_file(f, str(tmp_path / 'cache'))
+
+    assert cached is not parsed
+    assert [str(r) for r in cached.requirements] == \
+        [str(r) for r in parsed.requirements]
+    assert cached.includes == parsed.includes == [('-c', 'constraints.txt')]
+    assert cached.sha256 == parsed.sha256
+
+
+def test_write_requirements_unchanged(tmp_path):
+    output = tmp_path / 'combined.txt'
+    write_requirements(str(output), ['foo  # from a.txt'], 'aaaa')
+    os.utime(str(output), ns=(0, 0))
+    inode = output.stat().st_ino
+
+    # Only the digest, which leaves out the comments, matters
+    write_requirements(str(output), ['foo  # from b.txt'], 'aaaa')
+    assert output.stat().st_mtime_ns == 0
+    assert output.stat().st_ino == inode
+    assert output.read_text().splitlines()[1:] == ['foo  # from a.txt']
+
+    write_requirements(str(output), ['foo>=1  # from a.txt'], 'bbbb')
+    assert output.stat().st_mtime_ns != 0
+    assert output.read_text().splitlines()[1:] == ['foo>=1  # from a.txt']
+
+
+def test_combine_requirements_unchanged(tmp_path):
+    a = tmp_path / 'a.txt'
+    a.write_text('foo>=1\n-r b.txt\n-c constraints.txt\n')
+    (tmp_path / 'b.txt').write_text('bar\n')
+    (tmp_path / 'constraints.txt').write_text('bar<2\n')
+    output = tmp_path / 'combined.txt'
+    with open(str(a)) as fa:
+        assert combine_requirements([fa], str(output)) == 0
+    os.utime(str(output), ns=(0, 0))
+    contents = output.read_text()
+
+    with open(str(a)) as fa:
+        assert combine_requirements([fa], str(output)) == 0
+
+    assert output.stat().st_mtime_ns == 0
+    assert output.read_text() == contents
+    # Unless a constraints file changes, which pip reads itself
+    (tmp_path / 'constraints.txt').write_text('bar<3\n')
+    with open(str(a)) as fa:
+        assert combine_requirements([fa], str(output)) == 0
+    assert output.stat().st_mtime_ns != 0
+
+
+@pytest.mark.parametrize('files, cycle', [
+    ({'a.txt': '-r a.txt\n'}, ['a.txt', 'a.txt']),
+    ({'a.txt': 'foo\n-r b.txt\n', 'b.txt': '-r ./a.txt\nbar\n'},
+     ['a.txt', 'b.txt', 'a.txt']),
+    ({'a.txt': '-r b.txt\n', 'b.txt': '--requirement c.txt\n', 'c.txt': '-r b.txt\n'},
+     ['b.txt', 'c.txt', 'b.txt']),
+    # Constraints files include each other, too
+    ({'a.txt': '-c b.txt\n', 'b.txt': '-c c.txt\n', 'c.txt': '-r b.txt\n'},
+     ['b.txt', 'c.txt', 'b.txt']),
+])
+def test_combine_requirements_include_cycle(tmp_path, files, cycle):
+    for name, content in files.items():
+        (tmp_path / name).write_text(content)
+    output = tmp_path / 'combined.txt'
+
+    with open(str(tmp_path / 'a.txt')) as fa:
+        with pytest.raises(RuntimeError) as e:
+            combine_requirements([fa], str(output))
+
+    assert str(e.value) == 'Cyclic include of requirements files: ' + ' -> '.join(
+        str(tmp_path / name) for name in cycle)
+    assert not output.exists()
@@ -0,0 +1,165 @@
+#
+# Copyright 2026 ament_virtualenv contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# \file      test_incremental.py
+# \authors   ament_virtualenv contributors
+# \copyright Copyright (c) (2026), ament_virtualenv contributors
+#
+import os
+
+from ament_virtualenv import incremental
+from ament_virtualenv.combine_requirements import parse_requirement
+from ament_virtualenv.incremental import (
+    Delta, _satisfied, diff, diff_installed, options_digest, update, write_state)
+import pytest
+
+ENVIRONMENT = {'abi': {'cache_tag': 'cpython-310'}}
+
+
+@pytest.mark.parametrize('installed_lines, lines, expected', [
+    # Unchanged
+    (['foo==1.0', 'bar==2.0'], ['bar==2.0', 'foo==1.0'], Delta([], [])),
+    # Changed lines are reinstalled, by project
+    (['foo==1.0', 'bar==2.0'], ['foo==1.1', 'bar==2.0'], Delta(['foo==1.1'], [])),
+    (['foo==1.0'], ['Foo_Bar==1.0', 'foo==1.0'], Delta(['Foo_Bar==1.0'], [])),
+    (['foo==1.0 --hash=sha256:aaaa'], ['foo==1.0 --hash=sha256:bbbb'],
+     Delta(['foo==1.0 --hash=sha256:bbbb'], [])),
+    # Projects no longer required are uninstalled, by canonical name
+    (['foo==1.0', 'Bar_Baz==2.0'], ['foo==1.0'], Delta([], ['bar-baz'])),
+    # But not those venv installs
+    (['foo==1.0', 'pip==23.0', 'setuptools==65.0'], ['foo==1.0'], Delta([], [])),
+    # Options are not projects
+    (['-c constraints.txt', 'foo==1.0'],
+     ['--index-url https://example.com', 'foo==1.0'], Delta([], [])),
+])
+def test_diff(installed_lines, lines, expected):
+    assert diff(installed_lines, lines) == expected
+
+
+@pytest.mark.parametrize('distributions, lines, locked, expected', [
+    # Satisfied by the installed versions
+    ([['foo', '1.0', True], ['bar', '2.0', False]], ['foo==1.0', 'bar>=2'], False,
+     Delta([], [])),
+    # Not installed, or not satisfied
+    ([['foo', '1.0', True]], ['foo>1.0', 'bar'], False, Delta(['foo>1.0', 'bar'], [])),
+    # Prereleases installed satisfy any requirement they match
+    ([['foo', '2.0rc1', True]], ['foo>=2.0rc1'], False, Delta([], [])),
+    # Hashes do not prevent the comparison
+    ([['foo', '1.0', True]], ['foo==1.0 --hash=sha256:aaaa'], True, Delta([], [])),
+    # Without a lockfile, only the distributions requested are uninstalled
+    ([['foo', '1.0', True], ['Old_Dep', '1.0', False], ['Old_Tool', '1.0', True]],
+     ['foo==1.0'], False, Delta([], ['old-tool'])),
+    # With one, any distribution not locked
+    ([['foo', '1.0', True], ['Old_Dep', '1.0', False], ['Old_Tool', '1.0', True]],
+     ['foo==1.0'], True, Delta([], ['old-dep', 'old-tool'])),
+    # Except those venv installs, with or without a lockfile
+    ([['foo', '1.0', True], ['pip', '23.0', True], ['setuptools', '65.0', False]],
+     ['foo==1.0'], True, Delta([], [])),
+    ([['foo', '1.0', True], ['pip', '23.0', True]], ['foo==1.0'], False, Delta([], [])),
+    # URL requirements are always installed, as their version cannot be compared
+    ([['foo', '1.0', True]], ['foo @ https://example.com/foo-1.0.tar.gz'], True,
+     Delta(['foo @ https://example.com/foo-1.0.tar.gz'], [])),
+])
+def test_diff_installed(distributions, lines, locked, expected):
+    assert diff_installed(distributions, lines, locked) == expected
+
+
+@pytest.mark.parametrize('requirement, version, expected', [
+    ('foo', '1.0', True),
+    ('foo==1.0', '1.0', True),
+    ('foo<1.0', '1.0', False),
+    ('foo', None, False),
+    ('foo @ https://example.com/foo-1.0.tar.gz', '1.0', False),
+    ('foo @ git+https://example.com/foo.git@v1.0', '1.0', False),
+    ('foo @ file:///src/foo', '1.0', False),
+])
+def test_satisfied(requirement, version, expected):
+    assert _satisfied(parse_requirement(requirement), version) is expected
+
+
+def test_options_digest(tmp_path):
+    constraints = tmp_path / 'constraints.txt'
+    constraints.write_text('foo<2\n')
+    lines = ['-c {}'.format(constraints), '--no-binary foo', 'foo==1.0']
+    digest = options_digest(lines)
+
+    # Only the options matter
+    assert options_digest(lines[:2] + ['foo==1.1', 'bar']) == digest
+    assert options_digest(lines[:1] + ['foo==1.0']) != digest
+    assert options_digest(lines + ['--pre']) != digest
+    # And the content of the constraints files
+    constraints.write_text('foo<3\n')
+    assert options_digest(lines) != digest
+
+
+class FakeDeployment(object):
+    lockfile = None
+    use_system_packages = False
+
+    def __init__(self, venv_dir):
+        self.venv_dir = venv_dir
+        self.uninstalled = []
+
+    def venv_bin(self, name):
+        return os.path.join(self.venv_dir, 'bin', name)
+
+    def uninstall(self, *projects):
+        self.uninstalled.extend(projects)
+
+
+@pytest.fixture
+def venv_dir(tmp_path, monkeypatch):
+    venv_dir = tmp_path / 'venv'
+    (venv_dir / 'bin').mkdir(parents=True)
+    (venv_dir / 'bin' / 'python').write_text('')
+    monkeypatch.setattr(incremental, 'installed_distributions', lambda python: {
+        'cache_tag': 'cpython-310',
+        'site_dirs': [str(venv_dir / 'lib' / 'python3.10' / 'site-packages')],
+        'distributions': [['foo', '1.0', True], ['bar', '1.0', True]],
+    })
+    return str(venv_dir)
+
+
+@pytest.mark.parametrize('installed_lines, lines, rebuilt', [
+    (['--no-binary foo', 'foo==1.0', 'bar==1.0'], ['--no-binary foo', 'foo==1.0'],
+     False),
+    (['foo==1.0', 'bar==1.0'], ['--no-binary foo', 'foo==1.0'], True),
+    (['--no-binary foo', 'foo==1.0', 'bar==1.0'], ['foo==1.0'], True),
+])
+def test_update_options_changed(venv_dir, tmp_path, installed_lines, lines, rebuilt):
+    write_state(venv_dir, ENVIRONMENT, installed_lines)
+    requirements_path = tmp_path / 'requirements.txt'
+    requirements_path.write_text(''.join(line + '\n' for line in lines))
+    deployment = FakeDeployment(venv_dir)
+
+    paths = update(deployment, venv_dir, ENVIRONMENT, str(requirements_path))
+
+    if rebuilt:
+        assert paths is None
+        assert deployment.uninstalled == []
+    else:
+        assert paths == []
+        assert deployment.uninstalled == ['bar']
+
+
+def test_update_environment_changed(venv_dir, tmp_path):
+    write_state(venv_dir, ENVIRONMENT, ['foo==1.0'])
+    requirements_path = tmp_path / 'requirements.txt'
+    requirements_path.write_text('foo==1.0\n')
+
+    environment = {'abi': {'cache_tag': 'cpython-311'}}
+    assert update(FakeDeployment(venv_dir), venv_dir, environment,
+                  str(requirements_path)) is None
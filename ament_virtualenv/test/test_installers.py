@@ -0,0 +1,188 @@
+#
+# Copyright 2026 ament_virtualenv contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# \file      test_installers.py
+# \authors   ament_virtualenv contributors
+# \copyright Copyright (c) (2026), ament_virtualenv contributors
+#
+import base64
+import csv
+import hashlib
+import os
+import zipfile
+
+from ament_virtualenv.installers import install_wheel
+import pytest
+
+PYTHON = '/opt/venv/bin/python'
+
+ENTRY_POINTS = """\
+[console_scripts]
+foo = foo.cli:main
+foo-sub = foo.cli:commands.run [extra]
+"""
+
+
+def make_wheel(directory, version='1.0', files=None, entry_points=ENTRY_POINTS):
+    """Write a wheel of the foo project, with a module, a script and entry points."""
+    dist_info = 'foo-{}.dist-info'.format(version)
+    data_dir = 'foo-{}.data'.format(version)
+    if files is None:
+        files = {
+            'foo/__init__.py': 'VERSION = {!r}\n'.format(version),
+            'foo/cli.py': 'def main():\n    pass\n',
+            data_dir + '/scripts/foo-tool': '#!python\nimport foo\n',
+            data_dir + '/data/share/foo/foo.conf': 'version = {}\n'.format(version),
+        }
+    files = dict(files)
+    files[dist_info + '/METADATA'] = (
+        'Metadata-Version: 2.1\nName: foo\nVersion: {}\n'.format(version))
+    files[dist_info + '/WHEEL'] = 'Wheel-Version: 1.0\nRoot-Is-Purelib: true\n'
+    if entry_points:
+        files[dist_info + '/entry_points.txt'] = entry_points
+    files[dist_info + '/RECORD'] = ''
+    wheel = os.path.join(str(directory), 'foo-{}-py3-none-any.whl'.format(version))
+    with zipfile.ZipFile(wheel, 'w') as archive:
+        for name, content in files.items():
+            archive.writestr(name, content)
+    return wheel
+
+
+@pytest.fixture
+def scheme(tmp_path):
+    venv_dir = tmp_path / 'venv'
+    site_packages = str(venv_dir / 'lib' / 'python3' / 'site-packages')
+    return {
+        'purelib': site_packages,
+        'platlib': site_packages,
+        'scripts': str(venv_dir / 'bin'),
+        'data': str(venv_dir),
+        'include': str(venv_dir / 'include'),
+    }
+
+
+def read_record(scheme, version='1.0'):
+    site_packages = scheme['purelib']
+    record = os.path.join(site_packages, 'foo-{}.dist-info'.format(version), 'RECORD')
+    with open(record, 'r', newline='') as f:
+        return {row[0]: row[1:] for row in csv.reader(f)}
+
+
+def test_install_wheel(tmp_path, scheme):
+    install_wheel(make_wheel(tmp_path), scheme, PYTHON, requested=True)
+
+    site_packages = scheme['purelib']
+    record = read_record(scheme)
+    assert record.pop('foo-1.0.dist-info/RECORD') == ['', '']
+    assert sorted(record) == sorted([
+        'foo/__init__.py',
+        'foo/cli.py',
+        'foo-1.0.dist-info/METADATA',
+        'foo-1.0.dist-info/WHEEL',
+        'foo-1.0.dist-info/entry_points.txt',
+        'foo-1.0.dist-info/INSTALLER',
+        'foo-1.0.dist-info/REQUESTED',
+        os.path.relpath(os.path.join(scheme['scripts'], 'foo-tool'), site_packages),
+        os.path.relpath(os.path.join(scheme['scripts'], 'foo'), site_packages),
+        os.path.relpath(os.path.join(scheme['scripts'], 'foo-sub'), site_packages),
+        os.path.relpath(
+            os.path.join(scheme['data'], 'share', 'foo', 'foo.conf'), site_packages),
+    ])
+    for path, (digest, size) in record.items():
+        with open(os.path.join(site_packages, path), 'rb') as f:
+            content = f.read()
+        assert digest == 'sha256=' + base64.urlsafe_b64encode(
+            hashlib.sha256(content).digest()).rstrip(b'=').decode('ascii')
+        assert size == str(len(content))
+
+    with open(os.path.join(site_packages, 'foo-1.0.dist-info', 'INSTALLER')) as f:
+        assert f.read() == 'ament_virtualenv\n'
+
+
+def test_install_wheel_not_requested(tmp_path, scheme):
+    install_wheel(make_wheel(tmp_path), scheme, PYTHON)
+
+    assert 'foo-1.0.dist-info/REQUESTED' not in read_record(scheme)
+    assert not os.path.exists(
+        os.path.join(scheme['purelib'], 'foo-1.0.dist-info', 'REQUESTED'))
+
+
+def test_install_wheel_scripts(tmp_path, scheme):
+    install_wheel(make_wheel(tmp_path), scheme, PYTHON)
+
+    script = os.path.join(scheme['scripts'], 'foo-tool')
+    with open(script, 'r') as f:
+        assert f.read() == '#!{}\nimport foo\n'.format(PYTHON)
+    assert os.stat(script).st_mode & 0o777 == 0o755
+
+    with open(os.path.join(scheme['scripts'], 'foo'), 'r') as f:
+        launcher = f.read()
+    assert launcher.startswith('#!{}\n'.format(PYTHON))
+    assert 'from foo.cli import main\n' in launcher
+    assert 'sys.exit(main())\n' in launcher
+    compile(launcher, 'foo', 'exec')
+
+    # The extras of an entry point are left out, and attributes are looked up on
+    # the imported name
+    with open(os.path.join(scheme['scripts'], 'foo-sub'), 'r') as f:
+        launcher = f.read()
+    assert 'from foo.cli import commands\n' in launcher
+    assert 'sys.exit(commands.run())\n' in launcher
+    assert os.stat(os.path.join(scheme['scripts'], 'foo-sub')).st_mode & 0o777 == 0o755
+
+
+@pytest.mark.parametrize('reference', ['foo.cli', 'foo.cli:', ':main'])
+def test_install_wheel_invalid_entry_point(tmp_path, scheme, reference):
+    wheel = make_wheel(
+        tmp_path, entry_points='[console_scripts]\nfoo = {}\n'.format(reference))
+
+    with pytest.raises(RuntimeError, match='Invalid script entry point'):
+        install_wheel(wheel, scheme, PYTHON)
+    assert not os.path.exists(scheme['purelib'])
+
+
+@pytest.mark.parametrize('name', [
+    '../escape.py',
+    'foo/../../escape.py',
+    '/tmp/escape.py',
+    'foo-1.0.data/data/../../escape.py',
+])
+def test_install_wheel_rejects_paths(tmp_path, scheme, name):
+    wheel = make_wheel(tmp_path, files={name: 'escaped = True\n'})
+
+    with pytest.raises(RuntimeError, match='Refusing to install'):
+        install_wheel(wheel, scheme, PYTHON)
+    assert not any(path.name == 'escape.py' for path in tmp_path.rglob('*'))
+
+
+def test_install_wheel_uninstalls_previous_version(tmp_path, scheme):
+    old_dir = tmp_path / 'old'
+    old_dir.mkdir()
+    install_wheel(make_wheel(old_dir, '1.0', files={
+        'foo/__init__.py': 'VERSION = 1\n',
+        'foo/removed.py': '',
+    }), scheme, PYTHON)
+
+    install_wheel(make_wheel(tmp_path, '2.0', files={
+        'foo/__init__.py': 'VERSION = 2\n',
+    }), scheme, PYTHON)
+
+    site_packages = scheme['purelib']
+    assert sorted(os.listdir(site_packages)) == ['foo', 'foo-2.0.dist-info']
+    assert os.listdir(os.path.join(site_packages, 'foo')) == ['__init__.py']
+    with open(os.path.join(site_packages, 'foo', '__init__.py')) as f:
+        assert f.read() == 'VERSION = 2\n'
+    assert 'foo/removed.py' not in read_record(scheme, '2.0')
@@ -0,0 +1,58 @@
+#
+# Copyright 2026 ament_virtualenv contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# \file      test_interpreter.py
+# \authors   ament_virtualenv contributors
+# \copyright Copyright (c) (2026), ament_virtualenv contributors
+#
+import os
+
+from ament_virtualenv.interpreter import marker_environment
+from packaging.markers import default_environment
+import pytest
+
+
+def fake_python(directory, python_version):
+    """Write a python3 executable printing a marker environment of a version."""
+    directory.mkdir()
+    python = directory / 'python3'
+    python.write_text(
+        "#!/bin/sh\necho '{{\"python_version\": \"{}\"}}'\n".format(python_version))
+    python.chmod(0o755)
+    return str(directory)
+
+
+def test_marker_environment_follows_path(tmp_path, monkeypatch):
+    old_dir = fake_python(tmp_path / 'old', '3.8')
+    new_dir = fake_python(tmp_path / 'new', '3.12')
+
+    monkeypatch.setenv('PATH', old_dir)
+    assert marker_environment('3') == {'python_version': '3.8'}
+    # e.g. the daemon, serving a client with another PATH
+    monkeypatch.setenv('PATH', os.pathsep.join([new_dir, old_dir]))
+    assert marker_environment('3') == {'python_version': '3.12'}
+    monkeypatch.setenv('PATH', old_dir)
+    assert marker_environment('3') == {'python_version': '3.8'}
+
+
+def test_marker_environment_missing(tmp_path, monkeypatch):
+    monkeypatch.setenv('PATH', str(tmp_path))
+    with pytest.raises(RuntimeError):
+        marker_environment('3')
+
+
+def test_marker_environment_running_interpreter():
+    assert marker_environment() == default_environment()
@@ -0,0 +1,182 @@
+#
+# Copyright 2026 ament_virtualenv contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# \file      test_lock.py
+# \authors   ament_virtualenv contributors
+# \copyright Copyright (c) (2026), ament_virtualenv contributors
+#
+import hashlib
+import json
+
+from ament_virtualenv.combine_requirements import write_requirements
+from ament_virtualenv.lock import (
+    is_current, is_hashed, locked_requirements, lockfile_path, write_lockfile)
+import pytest
+
+# Entries of the 'install' list of `pip install --dry-run --report`
+INDEX_WHEEL = {
+    'metadata': {'name': 'Foo_Bar', 'version': '1.2.0'},
+    'is_direct': False,
+    'download_info': {
+        'url': 'https://files.example.com/foo_bar-1.2.0-py3-none-any.whl',
+        'archive_info': {'hash': 'sha256=aaaa', 'hashes': {'sha256': 'aaaa'}},
+    },
+}
+# As reported before pip 23
+OLD_INDEX_WHEEL = {
+    'metadata': {'name': 'baz', 'version': '3.0'},
+    'download_info': {
+        'url': 'https://files.example.com/baz-3.0.tar.gz',
+        'archive_info': {'hash': 'sha256=bbbb'},
+    },
+}
+DIRECT_ARCHIVE = {
+    'metadata': {'name': 'archived', 'version': '0.1'},
+    'is_direct': True,
+    'download_info': {
+        'url': 'https://example.com/archived-0.1.tar.gz',
+        'archive_info': {'hashes': {'sha256': 'cccc'}},
+    },
+}
+VCS = {
+    'metadata': {'name': 'vcs-project', 'version': '2.0'},
+    'is_direct': True,
+    'download_info': {
+        'url': 'https://github.com/example/vcs-project.git',
+        'vcs_info': {
+            'vcs': 'git', 'requested_revision': 'main',
+            'commit_id': '0123456789abcdef0123456789abcdef01234567',
+        },
+    },
+}
+LOCAL_DIR = {
+    'metadata': {'name': 'local', 'version': '0.0.1'},
+    'is_direct': True,
+    'download_info': {'url': 'file:///src/local', 'dir_info': {}},
+}
+
+
+@pytest.mark.parametrize('install, lines, hashed', [
+    ([], [], True),
+    ([INDEX_WHEEL, OLD_INDEX_WHEEL, DIRECT_ARCHIVE], [
+        'archived @ https://example.com/archived-0.1.tar.gz --hash=sha256:cccc',
+        'baz==3.0 --hash=sha256:bbbb',
+        'Foo_Bar==1.2.0 --hash=sha256:aaaa',
+    ], True),
+    # pip requires a hash for every requirement, or none
+    ([INDEX_WHEEL, VCS], [
+        'Foo_Bar==1.2.0',
+        'vcs-project @ git+https://github.com/example/vcs-project.git'
+        '@0123456789abcdef0123456789abcdef01234567',
+    ], False),
+    ([LOCAL_DIR, OLD_INDEX_WHEEL], [
+        'baz==3.0',
+        'local @ file:///src/local',
+    ], False),
+    # An archive without a sha256 cannot be hashed either
+    ([INDEX_WHEEL, dict(OLD_INDEX_WHEEL, download_info={
+        'url': 'https://files.example.com/baz-3.0.tar.gz',
+        'archive_info': {'hash': 'md5=dddd'}})], [
+        'baz==3.0',
+        'Foo_Bar==1.2.0',
+    ], False),
+])
+def test_locked_requirements(install, lines, hashed):
+    assert locked_requirements({'version': '1', 'install': install}) == (lines, hashed)
+
+
+def write_report(tmp_path, install):
+    report = tmp_path / 'report.json'
+    report.write_text(json.dumps({'version': '1', 'install': install}))
+    return str(report)
+
+
+@pytest.mark.parametrize('install, hashed', [
+    ([INDEX_WHEEL, OLD_INDEX_WHEEL], True),
+    ([INDEX_WHEEL, VCS], False),
+    ([INDEX_WHEEL, LOCAL_DIR], False),
+])
+def test_write_lockfile(tmp_path, install, hashed):
+    requirements = tmp_path / 'requirements.txt'
+    requirements.write_text('foo-bar\nbaz\n')
+    lockfile = str(tmp_path / 'requirements.lock.txt')
+
+    write_lockfile(lockfile, write_report(tmp_path, install), str(requirements))
+
+    with open(lockfile, 'r') as f:
+        header = [f.readline() for _ in range(3)]
+    assert header[1] == '# locked requirements sha256:{}\n'.format(
+        hashlib.sha256(b'foo-bar\nbaz\n').hexdigest())
+    assert (header[2] == '# without hashes, because of VCS or local directory '
+                         'requirements\n') is not hashed
+    assert is_hashed(lockfile) is hashed
+    assert is_current(lockfile, str(requirements))
+
+
+def test_is_current(tmp_path):
+    requirements = tmp_path / 'requirements.txt'
+    requirements.write_text('foo-bar\n')
+    lockfile = str(tmp_path / 'requirements.lock.txt')
+    report = write_report(tmp_path, [INDEX_WHEEL])
+
+    assert not is_current(lockfile, str(requirements))
+    write_lockfile(lockfile, report, str(requirements))
+    assert is_current(lockfile, str(requirements))
+
+    requirements.write_text('foo-bar>=1.2\n')
+    assert not is_current(lockfile, str(requirements))
+    write_lockfile(lockfile, report, str(requirements))
+    assert is_current(lockfile, str(requirements))
+
+
+def test_is_current_combined(tmp_path):
+    # Combined requirements are identified by the digest in their header, which
+    # leaves out the comments
+    requirements = str(tmp_path / 'requirements.txt')
+    digest = hashlib.sha256(b'foo-bar').hexdigest()
+    write_requirements(requirements, ['foo-bar  # from my_package'], digest)
+    lockfile = str(tmp_path / 'requirements.lock.txt')
+    write_lockfile(lockfile, write_report(tmp_path, [INDEX_WHEEL]), requirements)
+
+    with open(lockfile, 'r') as f:
+        assert f.readlines()[1] == '# locked requirements sha256:{}\n'.format(digest)
+    write_requirements(requirements, ['foo-bar  # from other_package'], digest)
+    assert is_current(lockfile, requirements)
+    write_requirements(
+        requirements, ['foo-bar>=1.2'], hashlib.sha256(b'foo-bar>=1.2').hexdigest())
+    assert not is_current(lockfile, requirements)
+
+
+def test_write_lockfile_unchanged(tmp_path):
+    requirements = tmp_path / 'requirements.txt'
+    requirements.write_text('foo-bar\n')
+    lockfile = tmp_path / 'requirements.lock.txt'
+    report = write_report(tmp_path, [INDEX_WHEEL])
+    write_lockfile(str(lockfile), report, str(requirements))
+    inode = lockfile.stat().st_ino
+
+    write_lockfile(str(lockfile), report, str(requirements))
+
+    assert lockfile.stat().st_ino == inode
+
+
+@pytest.mark.parametrize('requirements_filename, lockfile', [
+    ('requirements.txt', 'requirements.lock.txt'),
+    ('build/requirements.in', 'build/requirements.lock.in'),
+    ('requirements', 'requirements.lock.txt'),
+])
+def test_lockfile_path(requirements_filename, lockfile):
+    assert lockfile_path(requirements_filename) == lockfile
@@ -0,0 +1,122 @@
+#
+# Copyright 2026 ament_virtualenv contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# \file      test_manifest.py
+# \authors   ament_virtualenv contributors
+# \copyright Copyright (c) (2026), ament_virtualenv contributors
+#
+from ament_virtualenv.manifest import (
+    Dependency, Export, evaluate_condition, load_manifest, parse_manifest_string)
+import pytest
+
+MANIFEST = """<?xml version="1.0"?>
+<package format="3">
+  <name>my_package</name>
+  <version>1.0.0</version>
+  <depend>common</depend>
+  <build_depend condition="$ROS_VERSION == 2">ros2_only</build_depend>
+  <test_depend condition="$ROS_PYTHON_VERSION == 3">pytest_dep</test_depend>
+  <export>
+    <pip_requirements>requirements.txt</pip_requirements>
+    <pip_requirements condition="$ROS_DISTRO != humble">
+      requirements-new.txt
+    </pip_requirements>
+  </export>
+</package>
+"""
+
+
+@pytest.mark.parametrize('condition, expected', [
+    # 'and' binds tighter than 'or'
+    ('$A == 1 or $B == 1 and $C == 1', True),
+    ('$B == 1 and $C == 1 or $A == 1', True),
+    ('$B == 1 or $A == 1 and $C == 1', False),
+    # Parentheses override it
+    ('($A == 1 or $B == 1) and $C == 1', False),
+    ('$A == 1 and ($B == 1 or $C == 0)', True),
+    ('(($A == 1))', True),
+    ('($A == 1 and ($B == 0 or $C == 1)) or $D == 1', True),
+])
+def test_evaluate_condition_precedence(condition, expected):
+    assert evaluate_condition(condition, {'A': '1', 'B': '0', 'C': '0'}) is expected
+
+
+@pytest.mark.parametrize('condition, expected', [
+    ('$ROS_VERSION == 2', True),
+    ('$ROS_VERSION != 2', False),
+    ('$ROS_DISTRO == "humble"', True),
+    ("$ROS_DISTRO == 'humble'", True),
+    ('$ROS_DISTRO >= foxy', True),
+    ('$ROS_DISTRO < foxy', False),
+    ('$ROS_PYTHON_VERSION == 3', True),
+    ('$ROS_PYTHON_VERSION == 2', False),
+    # Unset variables are empty strings
+    ('$UNSET == ""', True),
+    ('$UNSET == 2', False),
+    (None, True),
+    ('', True),
+])
+def test_evaluate_condition_variables(condition, expected):
+    context = {'ROS_VERSION': '2', 'ROS_DISTRO': 'humble', 'ROS_PYTHON_VERSION': '3'}
+    assert evaluate_condition(condition, context) is expected
+
+
+@pytest.mark.parametrize('condition', [
+    '($A == 1',
+    '$A == 1)',
+    '$A == 1 and',
+    '$A ~ 1',
+])
+def test_evaluate_condition_invalid(condition):
+    with pytest.raises(ValueError):
+        evaluate_condition(condition, {'A': '1'})
+
+
+def test_parse_manifest_string():
+    manifest = parse_manifest_string(MANIFEST)
+    assert manifest.name == 'my_package'
+    assert manifest.build_depends == (
+        Dependency('ros2_only', '$ROS_VERSION == 2'), Dependency('common', None))
+    assert manifest.test_depends == (
+        Dependency('pytest_dep', '$ROS_PYTHON_VERSION == 3'),)
+    assert manifest.exports == (
+        Export('pip_requirements', 'requirements.txt', None),
+        Export('pip_requirements', 'requirements-new.txt', '$ROS_DISTRO != humble'),
+    )
+
+
+@pytest.mark.parametrize('environment, build_depends, test_depends, requirements', [
+    ({'ROS_VERSION': '2', 'ROS_DISTRO': 'humble', 'ROS_PYTHON_VERSION': '3'},
+     ['ros2_only', 'common'], ['pytest_dep'], ['requirements.txt']),
+    ({'ROS_VERSION': '1', 'ROS_DISTRO': 'noetic', 'ROS_PYTHON_VERSION': '3'},
+     ['common'], ['pytest_dep'], ['requirements.txt', 'requirements-new.txt']),
+    ({'ROS_VERSION': '1', 'ROS_DISTRO': 'melodic', 'ROS_PYTHON_VERSION': '2'},
+     ['common'], [], ['requirements.txt', 'requirements-new.txt']),
+    ({}, ['common'], [], ['requirements.txt', 'requirements-new.txt']),
+])
+def test_load_manifest_substitutes_variables(
+        tmp_path, monkeypatch, environment, build_depends, test_depends, requirements):
+    path = tmp_path / 'package.xml'
+    path.write_text(MANIFEST)
+    for name in ('ROS_VERSION', 'ROS_DISTRO', 'ROS_PYTHON_VERSION'):
+        monkeypatch.delenv(name, raising=False)
+    for name, value in environment.items():
+        monkeypatch.setenv(name, value)
+
+    manifest = load_manifest(str(path), reader='expat')
+    assert [d.name for d in manifest.build_depends] == build_depends
+    assert [d.name for d in manifest.test_depends] == test_depends
+    assert [e.content for e in manifest.exports] == requirements
@@ -0,0 +1,165 @@
+#
+# Copyright 2026 ament_virtualenv contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# \file      test_relocate.py
+# \authors   ament_virtualenv contributors
+# \copyright Copyright (c) (2026), ament_virtualenv contributors
+#
+import os
+
+from ament_virtualenv.relocate import RULES, Relocator
+import pytest
+
+INSTALL_DIR = '/opt/ros/share/my_package/venv'
+SITE_PACKAGES = os.path.join('lib', 'python3.10', 'site-packages')
+BYTECODE = os.path.join(SITE_PACKAGES, '__pycache__', 'module.cpython-310.pyc')
+
+
+def write(venv_dir, relative_path, content, mode=0o644):
+    path = os.path.join(venv_dir, relative_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(content.encode('utf-8') if isinstance(content, str) else content)
+    os.chmod(path, mode)
+    return path
+
+
+def read(venv_dir, relative_path):
+    with open(os.path.join(venv_dir, relative_path), 'r') as f:
+        return f.read()
+
+
+@pytest.fixture
+def venv_dir(tmp_path):
+    """Lay out a virtualenv as built in a build directory."""
+    venv_dir = str((tmp_path / 'build' / 'venv').resolve())
+    write(venv_dir, 'bin/tool',
+          '#!{}/bin/python3\nimport tool\n'.format(venv_dir), 0o755)
+    write(venv_dir, 'bin/long_tool', (
+        "#!/bin/sh\n"
+        "'''exec' \"{}/bin/python\" \"$0\" \"$@\"\n"
+        "' '''\nimport tool\n").format(venv_dir), 0o755)
+    write(venv_dir, 'bin/env_tool', '#!/usr/bin/env python\nimport tool\n', 0o755)
+    write(venv_dir, 'bin/compiled', b'\x7fELF\0\0#!/build/bin/python\n', 0o755)
+    write(venv_dir, 'bin/activate',
+          'deactivate () {{\n}}\nVIRTUAL_ENV="{}"\nexport VIRTUAL_ENV\n'.format(
+              venv_dir))
+    write(venv_dir, 'bin/activate.csh',
+          'setenv VIRTUAL_ENV "{}"\nset _OLD_VIRTUAL_PATH="$PATH"\n'.format(venv_dir))
+    write(venv_dir, 'bin/activate.fish',
+          'set -gx VIRTUAL_ENV "{}"\nset -gx PATH "$VIRTUAL_ENV/bin" $PATH\n'.format(
+              venv_dir))
+    write(venv_dir, 'pyvenv.cfg',
+          'home = /usr/bin\ninclude-system-site-packages = false\n'
+          'command = /usr/bin/python3 -m venv {}\n'.format(venv_dir))
+    write(venv_dir, os.path.join(SITE_PACKAGES, 'develop.pth'),
+          '{}/src/develop\n'.format(venv_dir))
+    write(venv_dir, os.path.join(SITE_PACKAGES, 'plain.pth'), './plain\n')
+    write(venv_dir, os.path.join(SITE_PACKAGES, 'module.py'), 'VALUE = 1\n')
+    write(venv_dir, BYTECODE, b'\0\0\0\0')
+    os.symlink(os.path.join(venv_dir, 'lib'), os.path.join(venv_dir, 'lib64'))
+    os.symlink('/usr/bin/python3', os.path.join(venv_dir, 'bin', 'python3'))
+    return venv_dir
+
+
+def test_relocate(venv_dir):
+    counts = Relocator(venv_dir, INSTALL_DIR).relocate()
+
+    assert counts == {
+        'shebang': 2, 'trampoline': 1, 'activate': 3, 'pyvenv.cfg': 1, 'pth': 1,
+        'symlink': 1, 'bytecode': 1,
+    }
+    python = INSTALL_DIR + '/bin/python'
+    assert read(venv_dir, 'bin/tool') == '#!{}3\nimport tool\n'.format(python)
+    assert read(venv_dir, 'bin/long_tool') == (
+        "#!/bin/sh\n'''exec' \"{}\" \"$0\" \"$@\"\n' '''\nimport tool\n".format(python))
+    assert read(venv_dir, 'bin/env_tool') == '#!{}\nimport tool\n'.format(python)
+    assert os.stat(os.path.join(venv_dir, 'bin/tool')).st_mode & 0o777 == 0o755
+
+    assert 'VIRTUAL_ENV="{}"\n'.format(INSTALL_DIR) in read(venv_dir, 'bin/activate')
+    assert read(venv_dir, 'bin/activate.csh').startswith(
+        'setenv VIRTUAL_ENV "{}"\n'.format(INSTALL_DIR))
+    assert read(venv_dir, 'bin/activate.fish').startswith(
+        'set -gx VIRTUAL_ENV "{}"\n'.format(INSTALL_DIR))
+
+    assert read(venv_dir, 'pyvenv.cfg').endswith(
+        'command = /usr/bin/python3 -m venv {}\n'.format(INSTALL_DIR))
+    assert read(venv_dir, os.path.join(SITE_PACKAGES, 'develop.pth')) == \
+        '{}/src/develop\n'.format(INSTALL_DIR)
+    assert read(venv_dir, os.path.join(SITE_PACKAGES, 'plain.pth')) == './plain\n'
+
+    assert os.readlink(os.path.join(venv_dir, 'lib64')) == 'lib'
+    assert os.readlink(os.path.join(venv_dir, 'bin', 'python3')) == '/usr/bin/python3'
+    assert not os.path.exists(os.path.join(venv_dir, BYTECODE))
+
+
+def test_relocate_skips_binaries(venv_dir):
+    Relocator(venv_dir, INSTALL_DIR).relocate()
+
+    with open(os.path.join(venv_dir, 'bin/compiled'), 'rb') as f:
+        assert f.read() == b'\x7fELF\0\0#!/build/bin/python\n'
+
+
+def test_relocate_keeps_bytecode(venv_dir):
+    counts = Relocator(venv_dir, INSTALL_DIR, keep_bytecode=True).relocate()
+
+    assert counts['bytecode'] == 0
+    assert os.path.exists(os.path.join(venv_dir, BYTECODE))
+
+
+def test_relocate_in_place(venv_dir):
+    counts = Relocator(venv_dir).relocate()
+
+    # Only the paths which do not depend on the install directory change
+    assert counts['pyvenv.cfg'] == counts['pth'] == 0
+    assert counts['symlink'] == 1
+    assert read(venv_dir, 'bin/tool') == \
+        '#!{}/bin/python3\nimport tool\n'.format(venv_dir)
+
+
+def test_relocate_replaces_hardlinked_files(venv_dir, tmp_path):
+    # As materialized from the virtualenv cache
+    cached = tmp_path / 'cache' / 'tool'
+    cached.parent.mkdir()
+    tool = os.path.join(venv_dir, 'bin/tool')
+    os.link(tool, str(cached))
+    content = cached.read_text()
+    inode = os.stat(tool).st_ino
+
+    Relocator(venv_dir, INSTALL_DIR).relocate()
+
+    assert cached.read_text() == content
+    assert os.stat(tool).st_ino != inode
+    assert os.stat(str(cached)).st_nlink == 1
+    assert read(venv_dir, 'bin/tool').startswith('#!' + INSTALL_DIR)
+
+
+def test_relocate_paths(venv_dir):
+    paths = [
+        'bin/tool',
+        'bin/activate',
+        os.path.join(SITE_PACKAGES, 'develop.pth'),
+        os.path.join(SITE_PACKAGES, 'module.py'),
+        'bin/missing',
+    ]
+    counts = Relocator(venv_dir, INSTALL_DIR).relocate(paths)
+
+    assert counts == dict({rule: 0 for rule in RULES}, shebang=1, activate=1, pth=1)
+    # The other files are left alone
+    assert read(venv_dir, 'bin/long_tool').startswith(
+        "#!/bin/sh\n'''exec' \"" + venv_dir)
+    assert 'VIRTUAL_ENV "{}"'.format(venv_dir) in read(venv_dir, 'bin/activate.csh')
+    assert os.path.isabs(os.readlink(os.path.join(venv_dir, 'lib64')))
@@ -0,0 +1,164 @@
+#
+# Copyright 2026 ament_virtualenv contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# \file      test_venv_cache.py
+# \authors   ament_virtualenv contributors
+# \copyright Copyright (c) (2026), ament_virtualenv contributors
+#
+import json
+import os
+
+from ament_virtualenv.relocate import Relocator
+from ament_virtualenv.venv_cache import ENTRY_FILENAME, VENV_DIRNAME, VenvCache
+import pytest
+
+INSTALL_DIR = '/opt/ros/share/my_package/venv'
+MODULE = os.path.join('lib', 'python3.10', 'site-packages', 'foo', '__init__.py')
+
+
+def build_venv(root_dir):
+    """Lay out a virtualenv, with files embedding its root directory."""
+    os.makedirs(os.path.join(root_dir, 'bin'))
+    os.makedirs(os.path.dirname(os.path.join(root_dir, MODULE)))
+    with open(os.path.join(root_dir, 'bin', 'foo'), 'w') as f:
+        f.write('#!{}/bin/python\nimport foo\n'.format(root_dir))
+    os.chmod(os.path.join(root_dir, 'bin', 'foo'), 0o755)
+    with open(os.path.join(root_dir, 'bin', 'bar'), 'w') as f:
+        f.write('#!/usr/bin/env python\nimport bar\n')
+    os.chmod(os.path.join(root_dir, 'bin', 'bar'), 0o755)
+    with open(os.path.join(root_dir, 'pyvenv.cfg'), 'w') as f:
+        f.write('home = /usr/bin\ncommand = /usr/bin/python3 -m venv {}\n'.format(
+            root_dir))
+    with open(os.path.join(root_dir, MODULE), 'w') as f:
+        f.write('VERSION = 1\n')
+    with open(os.path.join(root_dir, MODULE + 'c'), 'wb') as f:
+        f.write(b'\0\0\0\0')
+    os.symlink('/usr/bin/python3', os.path.join(root_dir, 'bin', 'python3'))
+    os.symlink(os.path.join(root_dir, 'bin', 'python3'),
+               os.path.join(root_dir, 'bin', 'python'))
+
+
+def read(*path):
+    with open(os.path.join(*path), 'r') as f:
+        return f.read()
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return VenvCache(str(tmp_path / 'cache'))
+
+
+@pytest.fixture
+def stored(tmp_path, cache):
+    """Store a virtualenv built in the build directory, with a lockfile."""
+    root_dir = str(tmp_path / 'build' / 'venv')
+    build_venv(root_dir)
+    lockfile = tmp_path / 'build' / 'requirements.lock'
+    lockfile.write_text('foo==1.0\n')
+    cache.store('key', root_dir, str(lockfile))
+    return root_dir
+
+
+def test_store_fetch(tmp_path, cache, stored):
+    with open(os.path.join(cache.entry_dir('key'), ENTRY_FILENAME), 'r') as f:
+        entry = json.load(f)
+    assert entry['root_dir'] == stored
+    assert entry['relocate'] == ['bin/foo', 'bin/python', 'pyvenv.cfg']
+    assert entry['interpreter_links'] == ['bin/python3']
+    # Bytecode is left out
+    assert not os.path.exists(
+        os.path.join(cache.entry_dir('key'), VENV_DIRNAME, MODULE + 'c'))
+
+    root_dir = str(tmp_path / 'other' / 'venv')
+    lockfile = str(tmp_path / 'other' / 'requirements.lock')
+    assert cache.fetch('key', root_dir, lockfile)
+
+    assert read(root_dir, MODULE) == 'VERSION = 1\n'
+    assert read(lockfile) == 'foo==1.0\n'
+    assert not os.path.exists(os.path.join(root_dir, MODULE + 'c'))
+    assert os.stat(os.path.join(root_dir, 'bin', 'foo')).st_mode & 0o777 == 0o755
+
+
+def test_fetch_missing(tmp_path, cache):
+    root_dir = tmp_path / 'venv'
+    root_dir.mkdir()
+
+    assert not cache.fetch('key', str(root_dir))
+    assert root_dir.exists()
+
+
+def test_fetch_relocates(tmp_path, cache, stored):
+    root_dir = str(tmp_path / 'other' / 'venv')
+    cache.fetch('key', root_dir)
+
+    assert read(root_dir, 'bin', 'foo') == '#!{}/bin/python\nimport foo\n'.format(
+        root_dir)
+    assert read(root_dir, 'pyvenv.cfg').endswith('-m venv {}\n'.format(root_dir))
+    assert os.readlink(os.path.join(root_dir, 'bin', 'python')) == \
+        os.path.join(root_dir, 'bin', 'python3')
+    assert os.readlink(os.path.join(root_dir, 'bin', 'python3')) == '/usr/bin/python3'
+    # The files embedding the root directory are new files
+    cached_script = os.path.join(cache.entry_dir('key'), VENV_DIRNAME, 'bin', 'foo')
+    assert not os.path.samefile(os.path.join(root_dir, 'bin', 'foo'), cached_script)
+    assert read(cached_script) == '#!{}/bin/python\nimport foo\n'.format(stored)
+
+
+def test_fetch_links_cached_files(tmp_path, cache, stored):
+    root_dir = str(tmp_path / 'other' / 'venv')
+    cache.fetch('key', root_dir)
+    entry_venv_dir = os.path.join(cache.entry_dir('key'), VENV_DIRNAME)
+    # Only the files embedding the root directory are not linked
+    for name in ('bin/bar', MODULE):
+        assert os.path.samefile(
+            os.path.join(root_dir, name), os.path.join(entry_venv_dir, name))
+    cached = {
+        name: read(entry_venv_dir, name)
+        for name in ('bin/foo', 'bin/bar', 'pyvenv.cfg', MODULE)}
+
+    Relocator(root_dir, INSTALL_DIR).relocate()
+
+    assert read(root_dir, 'bin', 'foo').startswith('#!' + INSTALL_DIR)
+    assert read(root_dir, 'bin', 'bar').startswith('#!' + INSTALL_DIR)
+    assert not os.path.samefile(
+        os.path.join(root_dir, 'bin', 'bar'), os.path.join(entry_venv_dir, 'bin/bar'))
+    assert read(root_dir, 'pyvenv.cfg').endswith('-m venv {}\n'.format(INSTALL_DIR))
+    # Files which are not rewritten stay linked, and the cache is untouched
+    assert os.path.samefile(
+        os.path.join(root_dir, MODULE), os.path.join(entry_venv_dir, MODULE))
+    assert {name: read(entry_venv_dir, name) for name in cached} == cached
+
+
+def test_evict(tmp_path):
+    cache = VenvCache(str(tmp_path / 'cache'), max_size='1G')
+    for index, key in enumerate(['old', 'used', 'new']):
+        root_dir = str(tmp_path / key / 'venv')
+        build_venv(root_dir)
+        cache.store(key, root_dir)
+        os.utime(os.path.join(cache.entry_dir(key), ENTRY_FILENAME), (index, index))
+    # Fetching an entry makes it the most recently used
+    cache.fetch('used', str(tmp_path / 'fetched'))
+    sizes = {}
+    for key in ['old', 'used', 'new']:
+        with open(os.path.join(cache.entry_dir(key), ENTRY_FILENAME), 'r') as f:
+            sizes[key] = json.load(f)['size']
+
+    cache.max_size = sizes['used'] + sizes['new']
+    cache.evict()
+
+    assert sorted(os.listdir(cache.entries_dir)) == ['new', 'used']
+    cache.max_size = sizes['used']
+    cache.evict()
+    assert os.listdir(cache.entries_dir) == ['used']
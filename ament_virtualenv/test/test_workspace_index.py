@@ -0,0 +1,130 @@
+#
+# Copyright 2026 ament_virtualenv contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# \file      test_workspace_index.py
+# \authors   ament_virtualenv contributors
+# \copyright Copyright (c) (2026), ament_virtualenv contributors
+#
+import os
+
+from ament_virtualenv import workspace_index
+from ament_virtualenv.workspace_index import (
+    WorkspaceIndex, get_workspace_index, index_filename)
+import pytest
+
+
+def add_package(directory, *files):
+    os.makedirs(str(directory))
+    for name in ('package.xml',) + files:
+        with open(os.path.join(str(directory), name), 'w'):
+            pass
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    """A workspace with two packages, an ignored one, and a module named like one."""
+    monkeypatch.setattr(workspace_index, '_INDEXES', {})
+    workspace = tmp_path / 'src'
+    add_package(workspace / 'foo', 'requirements.txt')
+    add_package(workspace / 'group' / 'bar', 'requirements.txt', 'dev.txt')
+    add_package(workspace / 'ignored' / 'baz', 'requirements.txt')
+    (workspace / 'ignored' / 'COLCON_IGNORE').write_text('')
+    # Not a package, only named like one
+    (workspace / 'group' / 'bar' / 'foo').mkdir()
+    (workspace / 'group' / 'bar' / 'foo' / 'extra.txt').write_text('')
+    return str(workspace)
+
+
+def test_find(workspace):
+    index = WorkspaceIndex.build(workspace)
+
+    assert sorted(index.packages) == ['bar', 'foo']
+    assert index.find('foo', 'requirements.txt') == \
+        os.path.join(workspace, 'foo', 'requirements.txt')
+    assert index.find('bar', 'dev.txt') == \
+        os.path.join(workspace, 'group', 'bar', 'dev.txt')
+    assert index.find('foo', 'missing.txt') is None
+    assert index.find('foo', 'extra.txt') is None
+    assert index.find('baz', 'requirements.txt') is None
+    assert index.find('missing', 'package.xml') is None
+
+
+def test_find_duplicate_packages(workspace):
+    # The first package in walk order wins, as with the walk the index replaces
+    add_package(os.path.join(workspace, 'group', 'bar', 'nested', 'foo'), 'other.txt')
+    index = WorkspaceIndex.build(workspace)
+
+    assert index.find('foo', 'requirements.txt') == \
+        os.path.join(workspace, 'foo', 'requirements.txt')
+    assert index.find('foo', 'other.txt') == \
+        os.path.join(workspace, 'group', 'bar', 'nested', 'foo', 'other.txt')
+
+
+def test_is_valid(workspace):
+    index = WorkspaceIndex.build(workspace)
+    assert index.is_valid()
+
+    # Only the directory listings matter, not the content of the files
+    with open(os.path.join(workspace, 'foo', 'requirements.txt'), 'w') as f:
+        f.write('numpy\n')
+    assert index.is_valid()
+
+    os.mkdir(os.path.join(workspace, 'group', 'qux'))
+    assert not index.is_valid()
+
+
+@pytest.mark.parametrize('change', [
+    lambda workspace: add_package(workspace / 'group' / 'qux', 'requirements.txt'),
+    lambda workspace: (workspace / 'foo' / 'requirements.txt').unlink(),
+    lambda workspace: (workspace / 'ignored' / 'COLCON_IGNORE').unlink(),
+    lambda workspace: (workspace / 'group' / 'COLCON_IGNORE').write_text(''),
+])
+def test_get_workspace_index_revalidates(workspace, tmp_path, monkeypatch, change):
+    cache_dir = str(tmp_path / 'cache')
+    index = get_workspace_index(workspace, cache_dir)
+    assert index.walked
+    assert os.path.exists(index_filename(cache_dir, workspace))
+    packages = index.packages
+
+    # A later process loads the persisted index while it is valid
+    monkeypatch.setattr(workspace_index, '_INDEXES', {})
+    index = get_workspace_index(workspace, cache_dir)
+    assert not index.walked
+    assert index.packages == packages
+
+    change(tmp_path / 'src')
+    monkeypatch.setattr(workspace_index, '_INDEXES', {})
+    index = get_workspace_index(workspace, cache_dir)
+    assert index.walked
+    assert index.packages == WorkspaceIndex.build(workspace).packages
+    assert index.packages != packages
+
+
+def test_refresh(workspace):
+    index = WorkspaceIndex.build(workspace)
+    add_package(os.path.join(workspace, 'group', 'qux'), 'requirements.txt')
+    os.unlink(os.path.join(workspace, 'foo', 'requirements.txt'))
+
+    index.refresh('group', recursive=False)
+    assert index.find('qux', 'requirements.txt') is None
+    index.refresh(os.path.join('group', 'qux'))
+    index.refresh('foo', recursive=False)
+
+    assert index.find('qux', 'requirements.txt') == \
+        os.path.join(workspace, 'group', 'qux', 'requirements.txt')
+    assert index.find('foo', 'requirements.txt') is None
+    assert index.packages == WorkspaceIndex.build(workspace).packages
+    assert index.is_valid()